@@ -0,0 +1,86 @@
+"""
+Startup budget check for quick local commands.
+
+Usage (from repository root):
+    python -m benchmarks.import_time --budget 0.5
+
+Runs each command in a fresh interpreter several times and checks that the median wall time
+fits the budget and that none of the heavy modules were imported on the way.
+Exits with code 1 when a command is over budget or imports a forbidden module.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that only the network and merge paths need
+HEAVY_MODULES = ['googleapiclient', 'google_auth_oauthlib', 'docxcompose']
+
+# Python snippet: run main.py with given arguments, then report which heavy modules got imported
+PROBE = """
+import sys
+sys.argv = ['main.py'] + {argv!r}
+import main
+try:
+    main.main()
+except SystemExit:
+    pass
+print('LOADED:' + ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+COMMANDS = {
+    'import main': None,
+    'main.py --help': ['--help'],
+    'main.py validate': ['validate'],
+}
+
+
+def measure(argv, repeat):
+    """
+    Returns (median seconds, heavy modules loaded) for running main.py with argv in a new interpreter
+    """
+    if argv is None:
+        code = f"import sys, main\nprint('LOADED:' + ','.join(n for n in {HEAVY_MODULES!r} if n in sys.modules))"
+    else:
+        code = PROBE.format(argv=argv, heavy=HEAVY_MODULES)
+
+    timings = []
+    loaded = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        timings.append(time.perf_counter() - started)
+        marker = [line for line in output.splitlines() if line.startswith('LOADED:')]
+        loaded = [name for name in marker[-1][len('LOADED:'):].split(',') if name] if marker else []
+    return statistics.median(timings), loaded
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Check startup time of quick local commands")
+    parser.add_argument('--budget', type=float, default=0.5, help="Allowed median seconds per command")
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    failed = False
+    for name, command_argv in COMMANDS.items():
+        seconds, loaded = measure(command_argv, args.repeat)
+        status = 'ok'
+        if seconds > args.budget:
+            status = 'OVER BUDGET'
+        if loaded:
+            status = f"imports {', '.join(loaded)}"
+        failed = failed or status != 'ok'
+        print(f"{name:20} {seconds * 1000:8.1f} ms  {status}")
+
+    if failed:
+        print(f"Startup budget of {args.budget:.2f}s exceeded or heavy modules imported")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
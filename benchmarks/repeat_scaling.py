@@ -0,0 +1,111 @@
+"""
+Scaling check for {{#name}}...{{/name}} repeat blocks.
+
+Usage (from repository root):
+    python -m benchmarks.repeat_scaling --sizes 10 100 1000 --max-ratio 2.0
+    python -m benchmarks.repeat_scaling --legacy
+
+Fills the directive projects template with N synthetic projects and reports time to compile
+the template, fill time and time per item for each N. With --legacy the placeholder template filled by
+the per-field code is timed at the same sizes. Exits with code 1 when time per item at the
+largest size is more than --max-ratio times the time per item at the smallest one.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from docx import Document
+
+from benchmarks.synthetic import generate_candidate, generate_directive_projects_template, generate_templates
+from src.core.repeat_blocks import RepeatBlockCompiler
+from src.core.template_processor import TemplateProcessor
+
+
+def time_compile(template_path):
+    """
+    Returns seconds spent compiling directives of the projects table
+    """
+    table = Document(template_path).tables[0]._tbl
+    started = time.perf_counter()
+    RepeatBlockCompiler().compile(table)
+    return time.perf_counter() - started
+
+
+def time_fill(template_path, template_data, repeat, legacy=False):
+    """
+    Returns median seconds of filling projects template with template_data, program compiled beforehand
+    """
+    processor = TemplateProcessor()
+    project_texts = [processor.project_texts(project) for project in template_data['projects']]
+    timings = []
+    for _ in range(repeat):
+        doc = Document(template_path)
+        table = doc.tables[0]._tbl
+        program = processor.repeat_blocks.compile(table)
+        started = time.perf_counter()
+        if legacy:
+            processor.process_projects_template(doc, template_data, project_texts)
+        else:
+            program.run(table, {'projects': project_texts})
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Check that repeat blocks fill in linear time")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help="Numbers of projects")
+    parser.add_argument('--responsibilities', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true', help="Also time the per-field projects code")
+    parser.add_argument('--max-ratio', type=float, default=2.0, help="Allowed growth of time per item from smallest to largest size")
+    parser.add_argument('--output', default=os.path.join('temp_docs', 'repeat_scaling.json'), help="Where to write results JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = sorted(args.sizes)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        legacy_template = generate_templates(os.path.join(tmp, 'templates'))['projects_template']
+        directive_template = generate_directive_projects_template(os.path.join(tmp, 'directive_projects.docx'))
+        for size in sizes:
+            template_data = generate_candidate(projects=size, responsibilities=args.responsibilities)
+            compile_seconds = time_compile(directive_template)
+            fill_seconds = time_fill(directive_template, template_data, args.repeat)
+            result = {
+                'items': size,
+                'compile': compile_seconds,
+                'fill': fill_seconds,
+                'per_item': fill_seconds / size
+            }
+            if args.legacy:
+                result['legacy'] = time_fill(legacy_template, template_data, args.repeat, legacy=True)
+            results.append(result)
+
+            line = (f"{size:>6} items  compile {compile_seconds * 1000:7.2f} ms  fill {fill_seconds * 1000:9.1f} ms  "
+                    f"{result['per_item'] * 1e6:8.1f} us/item")
+            if args.legacy:
+                line += f"  legacy {result['legacy'] * 1000:9.1f} ms"
+            print(line)
+
+    ratio = results[-1]['per_item'] / results[0]['per_item']
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'sizes': results, 'per_item_ratio': ratio}, f, indent=2)
+    print(f"Time per item at {sizes[-1]} vs {sizes[0]} items: x{ratio:.2f}")
+    print(f"Results saved to {args.output}")
+
+    if ratio > args.max_ratio:
+        print(f"Fill time grows faster than linear (allowed x{args.max_ratio:.2f})")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Stage benchmarks for the local rendering path.
+
+Usage (from repository root):
+    python -m benchmarks.run_benchmarks --projects 10 --repeat 5 --output baseline.json
+    python -m benchmarks.run_benchmarks --projects 10 --baseline baseline.json --threshold 0.2
+
+Exits with code 1 when any stage median is slower than the baseline by more than threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_candidate, generate_templates
+from src.core.document_processor import DocumentProcessor
+from src.utils.tracing import Tracer
+
+STAGES = ['prepare', 'skills_matrix', 'projects_table', 'maininfo', 'splice', 'merge', 'dedupe_media', 'save']
+
+
+def run_once(processor, template_paths, template_data, skills_formats, work_dir):
+    """
+    Renders one CV through the same section methods render_docx uses and returns seconds spent in each stage
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    prepared = processor.prepare_candidate(template_data)
+    timings['prepare'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    skills_matrix_xml = processor.render_skills_matrix_section(template_paths, prepared, work_dir)
+    timings['skills_matrix'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    projects_section = processor.render_projects_section(template_paths, prepared)
+    timings['projects_table'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    maininfo_docx = processor.render_maininfo_section(template_paths, prepared, work_dir, skills_formats)
+    timings['maininfo'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor.splice_sections(maininfo_docx, maininfo_docx, projects_section, skills_matrix_xml)
+    timings['splice'] = time.perf_counter() - started
+
+    # Composing with listpage, media dedupe and saving, as merge_docx_files does them in production.
+    # Dedupe and save are taken from their spans, merge keeps the rest
+    processor.tracer.drain()
+    started = time.perf_counter()
+    listpage_docx = os.path.join(work_dir, 'listpage.docx')
+    processor.materialize_template(template_paths['listpage'], listpage_docx)
+    if not processor.merge_docx_files(listpage_docx, maininfo_docx, os.path.join(work_dir, 'merged.docx')):
+        raise RuntimeError("merge stage failed")
+    merge_seconds = time.perf_counter() - started
+    spans = {span['name']: span['duration'] for span in processor.tracer.drain()}
+    timings['dedupe_media'] = spans['dedupe_media']
+    timings['save'] = spans['save']
+    timings['merge'] = merge_seconds - timings['dedupe_media'] - timings['save']
+
+    return timings
+
+
+def summarize(runs):
+    """
+    Aggregates per-stage timings of all runs
+    """
+    summary = {}
+    for stage in STAGES:
+        values = [run[stage] for run in runs]
+        summary[stage] = {
+            'median': statistics.median(values),
+            'min': min(values),
+            'mean': statistics.mean(values),
+            'runs': len(values)
+        }
+    summary['total'] = {'median': sum(summary[stage]['median'] for stage in STAGES)}
+    return summary
+
+
+def find_regressions(stages, baseline_stages, threshold):
+    """
+    Returns list of (stage, baseline, current) for stages slower than baseline by more than threshold
+    """
+    regressions = []
+    for stage, values in stages.items():
+        base = baseline_stages.get(stage)
+        if not base:
+            continue
+        if values['median'] > base['median'] * (1 + threshold):
+            regressions.append((stage, base['median'], values['median']))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark rendering stages on synthetic candidates")
+    parser.add_argument('--projects', type=int, default=5)
+    parser.add_argument('--responsibilities', type=int, default=10)
+    parser.add_argument('--skills', type=int, default=8, help="Skills per category")
+    parser.add_argument('--categories', type=int, default=7)
+    parser.add_argument('--environment', type=int, default=12, help="Technologies per project environment")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--output', default=os.path.join('temp_docs', 'benchmark.json'), help="Where to write results JSON")
+    parser.add_argument('--baseline', help="Results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown relative to baseline (0.2 = 20%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    params = {
+        'projects': args.projects,
+        'responsibilities': args.responsibilities,
+        'skills_per_category': args.skills,
+        'categories': args.categories,
+        'environment_size': args.environment
+    }
+    template_data = generate_candidate(**params)
+
+    # Tracing gives merge_docx_files its dedupe_media and save timings
+    processor = DocumentProcessor(Tracer(enabled=True))
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        template_paths = generate_templates(os.path.join(tmp, 'templates'))
+        skills_formats = processor.load_skills_formats(template_paths['skills_template'])
+        for i in range(args.warmup + args.repeat):
+            work_dir = os.path.join(tmp, f'run_{i}')
+            os.makedirs(work_dir)
+            timings = run_once(processor, template_paths, template_data, skills_formats, work_dir)
+            if i >= args.warmup:
+                runs.append(timings)
+
+    formatting_utils = processor.template_processor.formatting_utils
+    results = {
+        'params': params,
+        'python': platform.python_version(),
+        'stages': summarize(runs),
+        'format_prototype_hit_rate': formatting_utils.prototype_hit_rate()
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for stage, values in results['stages'].items():
+        print(f"{stage:<16} {values['median'] * 1000:9.1f} ms")
+    print(f"Formatting prototype hit rate: {results['format_prototype_hit_rate']:.1%}")
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results['stages'], baseline['stages'], args.threshold)
+        for stage, base, current in regressions:
+            print(f"REGRESSION {stage}: {base * 1000:.1f} ms -> {current * 1000:.1f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import os
+import random
+
+from docx import Document
+from docx.shared import Pt, RGBColor
+
+# Pool of technologies shared by skills and project environments,
+# so the skills matrix finds real matches
+TECH_POOL = [
+    'Python', 'Django', 'FastAPI', 'Flask', 'SQLAlchemy', 'Celery', 'Pytest', 'Pydantic',
+    'PostgreSQL', 'MySQL', 'Redis', 'MongoDB', 'DynamoDB', 'Elasticsearch', 'Kafka', 'RabbitMQ',
+    'Docker', 'Kubernetes', 'Terraform', 'Jenkins', 'GitHub Actions', 'GitLab CI/CD', 'Git',
+    'AWS', 'Azure', 'GCP', 'Lambda', 'S3', 'EC2', 'React', 'TypeScript', 'Node.js', 'GraphQL',
+    'gRPC', 'Nginx', 'Linux', 'Airflow', 'Spark', 'Pandas', 'NumPy'
+]
+
+CATEGORIES = [
+    'programming_languages', 'backend', 'frontend', 'databases', 'message_brokers',
+    'cloud', 'devops', 'source_control', 'data_engineering', 'testing'
+]
+
+TEMPLATE_NAMES = ['listpage', 'maininfo', 'skills_template', 'projects_template', 'skills_matrix_template']
+
+
+def _sentence(rng, words):
+    """
+    Builds pseudo-random sentence of given word count
+    """
+    vocabulary = ['designed', 'implemented', 'scalable', 'services', 'platform', 'data', 'pipelines',
+                  'integration', 'performance', 'architecture', 'secure', 'users', 'reporting', 'API']
+    return ' '.join(rng.choice(vocabulary) for _ in range(words)).capitalize()
+
+
+def generate_candidate(projects=3, responsibilities=8, skills_per_category=6, categories=7,
+                       environment_size=10, seed=0):
+    """
+    Generates synthetic candidate in template.json format
+    """
+    rng = random.Random(seed)
+
+    skills = {}
+    for category in CATEGORIES[:categories]:
+        skills[category] = rng.sample(TECH_POOL, min(skills_per_category, len(TECH_POOL)))
+
+    project_list = []
+    year = 2024
+    for i in range(projects):
+        start_year = year - rng.randint(1, 3)
+        project_list.append({
+            'name': f'SYNTHETIC PROJECT {i + 1}',
+            'description': _sentence(rng, 40) + '.',
+            'role': 'Software Engineer',
+            'period': {
+                'start': f'{rng.randint(1, 12):02d}.{start_year}',
+                'end': 'present' if i == 0 else f'{rng.randint(1, 12):02d}.{year}'
+            },
+            'responsibilities': [_sentence(rng, 12) for _ in range(responsibilities)],
+            'environment': rng.sample(TECH_POOL, min(environment_size, len(TECH_POOL)))
+        })
+        year = start_year
+
+    return {
+        'personal_info': {
+            'name': f'Candidate {seed}',
+            'title': 'SOFTWARE ENGINEER'
+        },
+        'skills': {
+            'basic_information': {
+                'education': 'Computer Science and Software Engineering',
+                'languages': ['English — B2'],
+                'domains': ['FinTech', 'Management', 'Social']
+            },
+            'introduction': 'Software Engineer with 5.5 years of experience. ' + _sentence(rng, 60) + '.',
+            'skills': skills
+        },
+        'projects': project_list
+    }
+
+
+def generate_templates(output_dir):
+    """
+    Generates .docx templates with the placeholders expected by the processors.
+    Returns mapping of template name to path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Cover page
+    doc = Document()
+    doc.add_paragraph('{{NAME}}')
+    doc.add_paragraph('{{TITLE}}')
+    doc.save(os.path.join(output_dir, 'listpage.docx'))
+
+    # Main info with intro/skills table and section markers
+    doc = Document()
+    doc.add_paragraph('{{NAME}}')
+    doc.add_paragraph('{{TITLE}}')
+    doc.add_paragraph('Tab 1')
+    table = doc.add_table(rows=1, cols=2)
+    intro_cell, skills_cell = table.rows[0].cells
+    intro_cell.paragraphs[0].add_run('{{INTRO_PART_1}}').bold = True
+    for placeholder in ['{{INTRO_PART_2}}', '{{EDUCATION_TEMPLATE}}', '{{LANGUAGES}}', '{{DOMAINS_TEMPLATE}}']:
+        intro_cell.add_paragraph(placeholder)
+    skills_cell.paragraphs[0].text = 'Skills'
+    skills_cell.add_paragraph('{{SKILLS_FABRYC}}')
+    doc.add_paragraph('{{PROFESSIONAL_SKILLS}}')
+    doc.add_paragraph('{{PROJECTS_TEMPLATE}}')
+    doc.save(os.path.join(output_dir, 'maininfo.docx'))
+
+    # Skills key/value formatting
+    doc = Document()
+    key_run = doc.add_paragraph().add_run('{{SKILLS_KEY}}')
+    key_run.bold = True
+    key_run.font.size = Pt(11)
+    doc.add_paragraph().add_run('{{SKILLS_VALUE}}').font.size = Pt(10)
+    doc.save(os.path.join(output_dir, 'skills_template.docx'))
+
+    # Projects table with one template row
+    doc = Document()
+    table = doc.add_table(rows=1, cols=2)
+    left, right = table.rows[0].cells
+    left.paragraphs[0].add_run('{{PROJECT_NAME}}').bold = True
+    left.add_paragraph('{{PROJECT_DESCRIPTION}}')
+    right.paragraphs[0].add_run('Project roles').bold = True
+    for text in ['{{PROJECT_ROLES}}', 'Period', '{{PROJECT_PERIOD}}', 'Responsibilities']:
+        right.add_paragraph(text)
+    bullet_run = right.add_paragraph(style='List Bullet').add_run('{{PROJECT_RESPONSIBILITIES}}')
+    bullet_run.font.color.rgb = RGBColor(0xC6, 0x30, 0x31)
+    right.add_paragraph('Environment')
+    right.add_paragraph('{{PROJECT_ENVIROMENT}}')
+    doc.save(os.path.join(output_dir, 'projects_template.docx'))
+
+    # Skills matrix with header and template row
+    doc = Document()
+    table = doc.add_table(rows=2, cols=4)
+    for idx, header in enumerate(['Category', 'Skill', 'Experience, years', 'Last used']):
+        table.rows[0].cells[idx].text = header
+        table.rows[1].cells[idx].text = '-'
+    doc.save(os.path.join(output_dir, 'skills_matrix_template.docx'))
+
+    return {name: os.path.join(output_dir, f'{name}.docx') for name in TEMPLATE_NAMES}
+
+
+def generate_directive_projects_template(path):
+    """
+    Generates projects template where {{#projects}}...{{/projects}} repeats the row
+    and {{#responsibilities}} the bullet paragraph, instead of fixed placeholders
+    """
+    doc = Document()
+    table = doc.add_table(rows=1, cols=2)
+    left, right = table.rows[0].cells
+    left.paragraphs[0].add_run('{{#projects}}')
+    left.add_paragraph().add_run('{{name}}').bold = True
+    left.add_paragraph('{{description}}')
+    right.paragraphs[0].add_run('Project roles').bold = True
+    for text in ['{{role}}', 'Period', '{{period}}', 'Responsibilities']:
+        right.add_paragraph(text)
+    bullet_run = right.add_paragraph(style='List Bullet').add_run('{{#responsibilities}}{{.}}{{/responsibilities}}')
+    bullet_run.font.color.rgb = RGBColor(0xC6, 0x30, 0x31)
+    right.add_paragraph('Environment')
+    right.add_paragraph('{{environment}}')
+    right.add_paragraph('{{/projects}}')
+    doc.save(path)
+    return path
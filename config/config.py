@@ -8,12 +8,28 @@ class Config:
     INPUT_SKILLS_DOC_ID = '1cQI3Ve289uae_EYFmiz6AEgZDHz1UqBehs4hGTsyXyE'
     OUTPUT_SKILLS_DOCX = 'temp_docs/updated_skills_matrix.docx'
     TEMPLATE_JSON = 'data/template.json'
+    FRAGMENT_CACHE_DIR = 'temp_docs/fragments'
+    DOC_REGISTRY_JSON = 'state/doc_registry.json'  # состояние запусков, не хранится в git
+    OUTPUT_CACHE_DIR = 'temp_docs/output_cache'
+    TEMPLATES_DIR = 'temp_docs/templates'
+    TEMPLATE_CHANGES_JSON = 'temp_docs/templates/changes.json'  # токен ленты изменений Drive
+    WORKSPACE_DIR = 'temp_docs/jobs'
+    QUEUE_DB = 'temp_docs/queue.db'  # общая очередь кандидатов для нескольких машин
+
+    # --- Очередь пакетной генерации ---
+    QUEUE_LEASE_SECONDS = 600  # через сколько секунд без продления задача возвращается в очередь
+    QUEUE_MAX_ATTEMPTS = 3  # попыток до пометки задачи как failed
     
     # --- Учетные данные API ---
     CREDENTIALS_JSON = 'creds/credentials.json'
     TOKEN_PICKLE = 'creds/token.pickle'
     SCOPES = ['https://www.googleapis.com/auth/documents', 'https://www.googleapis.com/auth/drive']
     
+    # --- Повторные запросы к Google API ---
+    API_MAX_RETRIES = 3
+    API_RETRY_BACKOFF = 1.0  # секунды, удваивается с каждой попыткой
+    API_BATCH_UPDATE_CHUNK = 100  # запросов в одном batchUpdate
+
     # --- Настройки форматирования таблицы в матрице ---
     BORDER_COLOR = "C63031"
     BORDER_SIZE = "4"
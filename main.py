@@ -1,21 +1,839 @@
+import argparse
+import json
+import os
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from config.config import Config
-from src.core.document_processor import DocumentProcessor
+# Rendering and Google API modules are heavy, they are imported only by the commands that use them
+from src.core.output_cache import OutputCache
+from src.services.doc_registry import DocRegistry
+from src.utils.profiling import Profiler
+from src.utils.tracing import Tracer
 
 
-def main():
+def render_single(args):
+    from src.core.document_processor import DocumentProcessor
+    from src.core.render_cache import FragmentCache
+
     listpage_url = Config.LISTPAGE_TEMPLATE_URL
-    maininfo_url = Config.MAIN_INFO_TEMPLATE_URL 
-    template_path = 'data/template.json'
-    
-    doc_processor = DocumentProcessor()
-    output_title = "Combined Document"
-    result_url = doc_processor.merge_google_docs(listpage_url, maininfo_url, output_title, template_path)
-    
+    maininfo_url = Config.MAIN_INFO_TEMPLATE_URL
+    template_path = args.template
+
+    tracer = Tracer(enabled=bool(args.trace), metrics=build_metrics(args))
+    fragment_cache = FragmentCache(Config.FRAGMENT_CACHE_DIR) if args.incremental else None
+    doc_processor = DocumentProcessor(
+        tracer, fragment_cache, build_registry(args), build_output_cache(args), build_workspace_options(args),
+        slim_output=args.slim
+    )
+    doc_processor.template_prefetcher = build_template_prefetcher(args, doc_processor)
+    output_title = args.title
+    doc_processor.section_pool = build_section_pool(args, doc_processor)
+    try:
+        with build_profiler(args, tracer, 'render'):
+            result_url = doc_processor.merge_google_docs(
+                listpage_url, maininfo_url, output_title, template_path, args.candidate_id
+            )
+    finally:
+        shutdown_section_pool(doc_processor)
+    save_trace(tracer, args)
+    save_metrics(tracer, args)
+
     if result_url:
         print(f"You can access the new document here: {result_url}")
+        if fragment_cache is not None:
+            print(f"Reused {fragment_cache.hits} of {fragment_cache.hits + fragment_cache.misses} rendered sections")
     else:
         print("\nFailed to merge documents. Please check the error messages above.")
 
 
+def render_batch(args):
+    from src.core.document_processor import DocumentProcessor
+
+    # Tracing is on by default in batch mode, spans are written as they finish so long inputs do not pile them up
+    if args.trace is None and not args.no_trace:
+        args.trace = os.path.join(args.output_dir, 'trace.json' if args.trace_format == 'chrome' else 'trace.jsonl')
+    tracer = Tracer(enabled=bool(args.trace) and not args.no_trace, metrics=build_metrics(args))
+    if tracer.enabled:
+        tracer.stream(args.trace, args.trace_format)
+    doc_processor = DocumentProcessor(
+        tracer,
+        doc_registry=build_registry(args),
+        output_cache=build_output_cache(args),
+        workspace_options=build_workspace_options(args),
+        slim_output=args.slim
+    )
+    doc_processor.template_prefetcher = build_template_prefetcher(args, doc_processor)
+
+    # Workers profile each candidate, the parent profiles fetch and upload
+    profiler = build_profiler(args, tracer, 'parent')
+    profile_options = profiler.options() if profiler.active else None
+
+    with profiler:
+        if args.input:
+            run_stream(args, doc_processor, profile_options)
+        else:
+            run_batch(args, doc_processor, profile_options)
+    if profiler.cpu:
+        profiler.merge_worker_profiles()
+    save_trace(tracer, args)
+    save_metrics(tracer, args)
+
+
+def run_batch(args, doc_processor, profile_options):
+    from src.core.batch_renderer import BatchRenderer
+    from src.core.pipeline import RenderPipeline
+
+    tracer = doc_processor.tracer
+    google_service = doc_processor.google_service
+
+    if args.pipeline:
+        pipeline = RenderPipeline(
+            doc_processor,
+            Config.LISTPAGE_TEMPLATE_URL,
+            Config.MAIN_INFO_TEMPLATE_URL,
+            args.title,
+            args.output_dir,
+            render_workers=args.workers or 1,
+            profile_options=profile_options,
+            fragment_cache_dir=Config.FRAGMENT_CACHE_DIR if args.incremental else None,
+            max_tasks_per_child=args.recycle_workers
+        )
+        for path, result in zip(args.candidates, pipeline.run(args.candidates)):
+            print(f"{path}: {result.get('url') or 'FAILED'}")
+        return
+
+    # Candidates are validated while Drive client authenticates, invalid ones are never rendered
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        validation = executor.submit(doc_processor.validate_candidates, args.candidates)
+        drive_service = google_service.get_drive_service()
+        validated = validation.result()
+
+    paths = []
+    candidates = []
+    registry_keys = {}
+    for path, (data, errors) in zip(args.candidates, validated):
+        if not errors and doc_processor.doc_registry is not None:
+            errors = registry_key_errors(data, path, registry_keys)
+        if errors:
+            print(f"{path}: REJECTED")
+            for error in errors:
+                print(f"  {error}")
+        else:
+            paths.append(path)
+            candidates.append(data)
+    if not candidates:
+        return
+
+    template_ids = doc_processor.get_template_ids(Config.LISTPAGE_TEMPLATE_URL, Config.MAIN_INFO_TEMPLATE_URL)
+    titles = [f"{args.title} - {data['personal_info']['name']}" for data in candidates]
+
+    # Candidates already rendered against the same template revisions are not rendered again
+    revisions = None
+    cache_keys = None
+    urls = [None] * len(candidates)
+    pending = list(range(len(candidates)))
+    output_cache = doc_processor.output_cache
+    if output_cache is not None and not args.no_upload:
+        revisions = doc_processor.current_template_revisions(drive_service, template_ids)
+        cache_keys = [
+            output_cache.make_key(data, revisions, title, doc_processor.slim_output)
+            for data, title in zip(candidates, titles)
+        ]
+        pending = []
+        for index, key in enumerate(cache_keys):
+            cached = output_cache.get(key)
+            tracer.count('cache_requests', cache='output', result='hit' if cached and cached.get('doc_id') else 'miss')
+            if cached and cached.get('doc_id'):
+                urls[index] = f"https://docs.google.com/document/d/{cached['doc_id']}/edit"
+            else:
+                pending.append(index)
+        print(f"Output cache: {len(candidates) - len(pending)} of {len(candidates)} candidates reused")
+
+    if pending:
+        # Templates are exported once and shared by all workers
+        template_paths = doc_processor.prepare_templates(drive_service, template_ids, revisions)
+        renderer = BatchRenderer(
+            template_paths,
+            workers=args.workers,
+            tracer=tracer,
+            profile_options=profile_options,
+            fragment_cache_dir=Config.FRAGMENT_CACHE_DIR if args.incremental else None,
+            memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+            max_tasks_per_child=args.recycle_workers,
+            workspace_options=doc_processor.workspace_options,
+            slim_output=doc_processor.slim_output
+        )
+        results = renderer.render([candidates[index] for index in pending], args.output_dir)
+
+        if not args.no_upload:
+            candidate_keys = None
+            if doc_processor.doc_registry is not None:
+                candidate_keys = [doc_processor.doc_registry.candidate_key(candidates[index]) for index in pending]
+            rendered_urls = renderer.upload_results(
+                doc_processor,
+                drive_service,
+                results,
+                [titles[index] for index in pending],
+                candidate_keys,
+                [cache_keys[index] for index in pending] if cache_keys else None
+            )
+            for index, url in zip(pending, rendered_urls):
+                urls[index] = url
+
+    if not args.no_upload:
+        for path, url in zip(paths, urls):
+            print(f"{path}: {url if url else 'FAILED'}")
+
+
+def run_stream(args, doc_processor, profile_options):
+    from src.core.batch_renderer import BatchRenderer
+    from src.core.candidate_reader import CandidateReader
+
+    # Position in the input is saved after every candidate, --resume continues from it
+    checkpoint_path = os.path.join(args.output_dir, 'checkpoint.json')
+    checkpoint = {'input': os.path.abspath(args.input), 'offset': 0, 'next_index': 0}
+    if args.resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r') as f:
+            saved = json.load(f)
+        if saved.get('input') == checkpoint['input']:
+            checkpoint = saved
+            print(f"Resuming {args.input} from byte {checkpoint['offset']} (record {checkpoint['next_index']})")
+    reader = CandidateReader(args.input, checkpoint['offset'])
+
+    google_service = doc_processor.google_service
+    drive_service = google_service.get_drive_service()
+    template_ids = doc_processor.get_template_ids(Config.LISTPAGE_TEMPLATE_URL, Config.MAIN_INFO_TEMPLATE_URL)
+    template_paths = doc_processor.prepare_templates(drive_service, template_ids)
+
+    # Only candidates in flight are kept: resume offset, title and registry key per index
+    in_flight = {}
+    state = {'next_index': checkpoint['next_index']}
+    registry_keys = {}
+
+    def valid_candidates():
+        for offset, template_data in reader:
+            index = state['next_index']
+            state['next_index'] += 1
+            errors = doc_processor.validator.validate(template_data)
+            if not errors and doc_processor.doc_registry is not None:
+                errors = registry_key_errors(template_data, f"record {index}", registry_keys)
+            if errors:
+                print(f"record {index}: REJECTED")
+                for error in errors:
+                    print(f"  {error}")
+                continue
+            in_flight[index] = (
+                offset,
+                f"{args.title} - {template_data['personal_info']['name']}",
+                doc_processor.doc_registry.candidate_key(template_data) if doc_processor.doc_registry else None
+            )
+            yield index, template_data
+
+    renderer = BatchRenderer(
+        template_paths,
+        workers=args.workers,
+        tracer=doc_processor.tracer,
+        profile_options=profile_options,
+        fragment_cache_dir=Config.FRAGMENT_CACHE_DIR if args.incremental else None,
+        memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+        max_tasks_per_child=args.recycle_workers,
+        workspace_options=doc_processor.workspace_options,
+        slim_output=doc_processor.slim_output
+    )
+    for result in renderer.render_stream(valid_candidates(), args.output_dir):
+        offset, title, candidate_key = in_flight.pop(result['index'])
+        if not result['error'] and not args.no_upload:
+            doc_id = doc_processor.publish_document(
+                drive_service, result['output_path'], title, result['bullet_color'], candidate_key
+            )
+            url = f"https://docs.google.com/document/d/{doc_id}/edit" if doc_id else None
+            print(f"record {result['index']}: {url if url else 'FAILED'}")
+        checkpoint.update(offset=offset, next_index=result['index'] + 1)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    checkpoint.update(offset=reader.offset, next_index=state['next_index'])
+    save_checkpoint(checkpoint_path, checkpoint)
+    if reader.skipped:
+        print(f"Skipped {reader.skipped} malformed records")
+
+
+def manage_queue(args):
+    from src.services.work_queue import WorkQueue
+
+    queue = WorkQueue(args.db, args.lease, args.max_attempts)
+    if args.queue_command == 'enqueue':
+        return enqueue_candidates(args, queue)
+    if args.queue_command == 'work':
+        return run_queue_worker(args, queue)
+    if args.queue_command == 'retry':
+        print(f"Requeued {queue.retry_failed()} failed jobs")
+        return True
+    print_queue_status(args, queue)
+    return True
+
+
+def enqueue_candidates(args, queue):
+    from src.core.schema_validator import SchemaValidator
+
+    validator = SchemaValidator()
+    rejected = []
+
+    def valid_jobs():
+        records = []
+        if args.input:
+            from src.core.candidate_reader import CandidateReader
+
+            reader = CandidateReader(args.input)
+            records = ((f"record {index}", data) for index, (offset, data) in enumerate(reader))
+        for name, template_data in itertools.chain(records, load_candidate_files(args.candidates, rejected)):
+            errors = validator.validate(template_data)
+            if errors:
+                rejected.append(name)
+                print_errors(name, errors)
+                continue
+            yield (
+                template_data,
+                f"{args.title} - {template_data['personal_info']['name']}",
+                DocRegistry.candidate_key(template_data)
+            )
+
+    added, duplicates, conflicts = queue.enqueue(valid_jobs())
+    for title, candidate_key in conflicts:
+        print_errors(title, [f"id: registry key '{candidate_key}' belongs to another queued candidate, give each candidate its own id"])
+    print(f"Enqueued {added} candidates, {duplicates} already queued, {len(rejected) + len(conflicts)} rejected")
+    return not rejected and not conflicts
+
+
+def registry_key_errors(template_data, name, registry_keys):
+    """
+    Returns errors for a record whose registry key is taken by an earlier record of this run,
+    otherwise remembers the key. Two records with one key would overwrite each other's document.
+    """
+    key = DocRegistry.candidate_key(template_data)
+    if key in registry_keys:
+        return [f"id: same registry key '{key}' as {registry_keys[key]}, give each candidate its own id"]
+    registry_keys[key] = name
+    return []
+
+
+def load_candidate_files(paths, rejected):
+    """
+    Yields (path, template data) of candidate files, unreadable ones are reported and added to rejected
+    """
+    for path in paths:
+        try:
+            with open(path, 'r') as f:
+                yield path, json.load(f)
+        except (OSError, ValueError) as e:
+            rejected.append(path)
+            print_errors(path, [f"<file>: {str(e)}"])
+
+
+def run_queue_worker(args, queue):
+    from src.core.batch_renderer import BatchRenderer
+    from src.core.document_processor import DocumentProcessor
+    from src.services.work_queue import default_worker_id
+
+    worker = default_worker_id()
+    tracer = Tracer(enabled=bool(args.trace), metrics=build_metrics(args))
+    doc_processor = DocumentProcessor(
+        tracer, doc_registry=build_registry(args), workspace_options=build_workspace_options(args), slim_output=args.slim
+    )
+    doc_processor.template_prefetcher = build_template_prefetcher(args, doc_processor)
+    drive_service = doc_processor.google_service.get_drive_service()
+    template_ids = doc_processor.get_template_ids(Config.LISTPAGE_TEMPLATE_URL, Config.MAIN_INFO_TEMPLATE_URL)
+    template_paths = doc_processor.prepare_templates(drive_service, template_ids)
+
+    # Leases of jobs in flight are renewed from a background thread while they render
+    held = {}
+    in_flight = {}
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def renew_leases():
+        while not stopped.wait(queue.lease_seconds / 3):
+            with lock:
+                leases = dict(held)
+            try:
+                queue.renew(leases)
+            except Exception as e:
+                print(f"Failed to renew leases: {str(e)}")
+
+    def claimed_jobs(jobs):
+        # One job is claimed per free slot, so workers on other machines share what is left
+        while jobs:
+            job = jobs.pop()
+            with lock:
+                held[job['id']] = job['lease']
+            in_flight[job['id']] = job
+            yield job['id'], job.pop('data')
+            jobs = queue.claim(worker)
+
+    renderer = BatchRenderer(
+        template_paths,
+        workers=args.workers,
+        tracer=tracer,
+        fragment_cache_dir=Config.FRAGMENT_CACHE_DIR if args.incremental else None,
+        memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+        max_tasks_per_child=args.recycle_workers,
+        workspace_options=doc_processor.workspace_options,
+        slim_output=doc_processor.slim_output
+    )
+    heartbeat = threading.Thread(target=renew_leases, daemon=True)
+    heartbeat.start()
+    print(f"Worker {worker} processing {args.db}")
+    try:
+        while True:
+            jobs = queue.claim(worker)
+            if not jobs:
+                counts = queue.counts()
+                # Jobs leased by other workers come back if those workers die before finishing them
+                if args.no_wait or not (counts['leased'] or counts['expired']):
+                    break
+                stopped.wait(args.poll)
+                continue
+
+            for result in renderer.render_stream(claimed_jobs(jobs), args.output_dir):
+                job = in_flight.pop(result['index'])
+                finish_queue_job(args, queue, doc_processor, drive_service, job, result)
+                with lock:
+                    held.pop(job['id'], None)
+    finally:
+        stopped.set()
+    save_trace(tracer, args)
+    save_metrics(tracer, args)
+    counts = queue.counts()
+    print(f"Queue: {counts['done']} done, {counts['failed']} failed, "
+          f"{counts['pending'] + counts['expired']} pending, {counts['leased']} in progress")
+    return True
+
+
+def finish_queue_job(args, queue, doc_processor, drive_service, job, result):
+    """
+    Uploads rendered job and records its result, unless the lease was lost meanwhile
+    """
+    timings = {'render': result['seconds']}
+    if result['error']:
+        queue.fail(job['id'], job['lease'], result['error'], timings)
+        return
+    # Renewing right before upload makes sure no other worker took the job over
+    if not queue.renew({job['id']: job['lease']}):
+        print(f"job {job['id']}: lease expired, result dropped")
+        return
+
+    doc_id = None
+    if not args.no_upload:
+        started = time.perf_counter()
+        with doc_processor.tracer.span('upload', candidate=job['id']):
+            doc_id = doc_processor.publish_document(
+                drive_service, result['output_path'], job['title'], result['bullet_color'],
+                job['candidate_key'] if doc_processor.doc_registry is not None else None
+            )
+        timings['upload'] = time.perf_counter() - started
+        if not doc_id:
+            queue.fail(job['id'], job['lease'], "Upload failed", timings)
+            print(f"job {job['id']}: FAILED")
+            return
+        print(f"job {job['id']}: https://docs.google.com/document/d/{doc_id}/edit")
+    queue.complete(job['id'], job['lease'], doc_id, result['output_path'], timings)
+
+
+def print_queue_status(args, queue):
+    counts = queue.counts()
+    print(f"{sum(counts.values())} jobs: {counts['pending']} pending, {counts['leased']} leased, "
+          f"{counts['expired']} with expired lease, {counts['done']} done, {counts['failed']} failed")
+    for name, worker in sorted(queue.worker_stats().items()):
+        finished = worker['done'] + worker['failed']
+        print(f"  {name}: {worker['done']} done, {worker['failed']} failed, "
+              f"{worker['render_seconds'] / finished:.2f}s render, {worker['upload_seconds'] / finished:.2f}s upload avg")
+    if args.list:
+        for job in queue.jobs(args.status):
+            result = f"https://docs.google.com/document/d/{job['doc_id']}/edit" if job['doc_id'] else job['error'] or ''
+            print(f"{job['id']:>6}  {job['status']:<7} {job['attempts']}  {job['title']}  {result}")
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def serve(args):
+    from src.core.document_processor import DocumentProcessor
+    from src.services.render_server import RenderServer
+
+    tracer = Tracer(enabled=False, metrics=build_metrics(args))
+    doc_processor = DocumentProcessor(
+        tracer, doc_registry=build_registry(args), workspace_options=build_workspace_options(args), slim_output=args.slim
+    )
+    doc_processor.template_prefetcher = build_template_prefetcher(args, doc_processor)
+    server = RenderServer(
+        doc_processor,
+        Config.LISTPAGE_TEMPLATE_URL,
+        Config.MAIN_INFO_TEMPLATE_URL,
+        offline=args.offline,
+        reload_interval=args.reload_interval
+    )
+    # Section workers start with the warm fragment cache settings, before the server spawns its threads
+    doc_processor.section_pool = build_section_pool(args, doc_processor)
+    try:
+        server.serve(args.host, args.port, args.socket)
+    finally:
+        shutdown_section_pool(doc_processor)
+        save_metrics(tracer, args)
+
+
+def prefetch(args):
+    from src.core.document_processor import DocumentProcessor
+
+    doc_processor = DocumentProcessor(Tracer(enabled=False))
+    prefetcher = build_template_prefetcher(args, doc_processor, force=True)
+    try:
+        drive_service = doc_processor.google_service.get_drive_service()
+        if args.once:
+            changed = prefetcher.sync(drive_service)
+            print(f"Templates updated: {', '.join(changed)}" if changed else "Templates are current")
+            return True
+        print(f"Following Drive changes every {args.interval:g}s, press Ctrl+C to stop")
+        prefetcher.run(drive_service, args.interval)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Template prefetch failed: {str(e)}")
+        return False
+    return True
+
+
+def render_local(args):
+    from src.core.document_processor import DocumentProcessor
+    from src.core.render_cache import FragmentCache
+
+    tracer = Tracer(enabled=bool(args.trace), metrics=build_metrics(args))
+    fragment_cache = FragmentCache(Config.FRAGMENT_CACHE_DIR) if args.incremental else None
+    doc_processor = DocumentProcessor(
+        tracer, fragment_cache, workspace_options=build_workspace_options(args), slim_output=args.slim
+    )
+    try:
+        template_paths = doc_processor.find_local_templates(args.templates_dir)
+        template_data = doc_processor.load_candidate(args.template)
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        doc_processor.section_pool = build_section_pool(args, doc_processor)
+        with build_profiler(args, tracer, 'render_local'), doc_processor.create_workspace() as workspace:
+            if args.variants:
+                # Candidate data is prepared once and rendered into every variant
+                with open(args.variants, 'r') as f:
+                    variants = json.load(f)
+                results = doc_processor.render_variants(
+                    template_paths, variants, template_data, workspace.path, args.output_dir
+                )
+            else:
+                doc_processor.render_docx(template_paths, template_data, workspace.path, args.output)
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        return False
+    finally:
+        shutdown_section_pool(doc_processor)
+    save_trace(tracer, args)
+    save_metrics(tracer, args)
+    if args.variants:
+        for name, (path, bullet_color) in results.items():
+            print(f"Saved {name}: {path} (bullet color {bullet_color})")
+    else:
+        print(f"Saved {args.output}")
+    return True
+
+
+def matrix_only(args):
+    from src.core.schema_validator import SchemaValidator
+    from src.core.skills_matrix_processor import SkillsMatrixProcessor
+
+    with open(args.template, 'r') as f:
+        template_data = json.load(f)
+    errors = SchemaValidator().validate(template_data)
+    if errors:
+        print_errors(args.template, errors)
+        return False
+
+    template = os.path.join(args.templates_dir, 'skills_matrix_template.docx')
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    if not SkillsMatrixProcessor().create_skills_matrix(template, args.output, template_data):
+        return False
+    print(f"Saved {args.output}")
+    return True
+
+
+def validate(args):
+    from src.core.schema_validator import SchemaValidator
+
+    validator = SchemaValidator()
+    invalid = 0
+    if args.input:
+        from src.core.candidate_reader import CandidateReader
+
+        reader = CandidateReader(args.input)
+        for index, (offset, template_data) in enumerate(reader):
+            errors = validator.validate(template_data)
+            if errors:
+                invalid += 1
+                print_errors(f"record {index}", errors)
+        invalid += reader.skipped
+        print(f"{invalid} invalid records in {args.input}")
+
+    for path in args.files or ([] if args.input else [args.template]):
+        try:
+            with open(path, 'r') as f:
+                errors = validator.validate(json.load(f))
+        except (OSError, ValueError) as e:
+            errors = [f"<file>: {str(e)}"]
+        if errors:
+            invalid += 1
+            print_errors(path, errors)
+        else:
+            print(f"{path}: OK")
+    return invalid == 0
+
+
+def print_errors(name, errors):
+    print(f"{name}: INVALID")
+    for error in errors:
+        print(f"  {error}")
+
+
+def manage_cache(args):
+    output_cache = OutputCache(Config.OUTPUT_CACHE_DIR)
+    if args.cache_command == 'list':
+        entries = output_cache.entries()
+        for meta in entries:
+            print(f"{meta['key'][:12]}  {meta['created']}  hits={meta.get('hits', 0):<4} "
+                  f"{meta['size'] // 1024:>6} KB  {meta['doc_id']}  {meta['title']}")
+        print(f"{len(entries)} entries")
+    elif args.cache_command == 'evict':
+        if args.all:
+            removed = output_cache.clear()
+        elif args.older_than is not None:
+            removed = output_cache.evict_older_than(args.older_than)
+        else:
+            removed = 0
+            for key in args.keys:
+                if output_cache.evict(key):
+                    removed += 1
+                else:
+                    print(f"No unique entry for {key}")
+        print(f"Removed {removed} entries")
+
+
+def build_registry(args):
+    return DocRegistry(Config.DOC_REGISTRY_JSON) if args.update else None
+
+
+def build_output_cache(args):
+    return OutputCache(Config.OUTPUT_CACHE_DIR) if args.cache else None
+
+
+def build_workspace_options(args):
+    return {'tmpfs': args.tmpfs, 'keep_on_failure': args.keep_failed}
+
+
+def build_template_prefetcher(args, doc_processor, force=False):
+    """
+    Returns prefetcher of templates kept current by the prefetch command, or None
+    """
+    if not (args.prefetched or force):
+        return None
+    from src.services.template_prefetcher import TemplatePrefetcher
+    template_ids = doc_processor.get_template_ids(Config.LISTPAGE_TEMPLATE_URL, Config.MAIN_INFO_TEMPLATE_URL)
+    return TemplatePrefetcher(doc_processor, template_ids)
+
+
+def build_section_pool(args, doc_processor):
+    """
+    Returns process pool rendering sections of one CV concurrently, or None
+    """
+    if not args.parallel_sections:
+        return None
+    if (os.cpu_count() or 1) < 2:
+        print("Only one CPU available, rendering sections sequentially")
+        return None
+    from src.core.section_graph import create_section_pool
+    return create_section_pool(doc_processor)
+
+
+def shutdown_section_pool(doc_processor):
+    if doc_processor.section_pool is not None:
+        doc_processor.section_pool.shutdown()
+        doc_processor.section_pool = None
+
+
+def build_profiler(args, tracer, name):
+    return Profiler(
+        args.profile_dir,
+        cpu=args.profile_cpu,
+        memory=args.profile_memory,
+        collapsed=args.profile_collapsed,
+        top=args.profile_top,
+        tracer=tracer,
+        name=name
+    )
+
+
+def save_trace(tracer, args):
+    if tracer.enabled and args.trace:
+        print(f"Trace saved to {tracer.save(args.trace, args.trace_format)}")
+
+
+def build_metrics(args):
+    if not args.metrics and not args.metrics_port:
+        return None
+    from src.utils.metrics import MetricsRegistry
+    metrics = MetricsRegistry()
+    if args.metrics_port:
+        port = metrics.serve(args.metrics_port)
+        print(f"Metrics available at http://127.0.0.1:{port}/metrics")
+    return metrics
+
+
+def save_metrics(tracer, args):
+    if tracer.metrics is None:
+        return
+    if args.metrics:
+        print(f"Metrics saved to {tracer.metrics.save(args.metrics, args.metrics_format)}")
+    tracer.metrics.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="CV generator based on Google Docs templates")
+    parser.add_argument('--template', default=Config.TEMPLATE_JSON, help="Path to template.json")
+    parser.add_argument('--title', default="Combined Document", help="Title of the created document")
+    parser.add_argument('--trace', default=None, help="Write per-stage trace to this file (default in batch mode: <output-dir>/trace.jsonl)")
+    parser.add_argument('--trace-format', choices=['jsonl', 'chrome'], default='jsonl', help="JSON lines or Chrome trace-event format")
+    parser.add_argument('--no-trace', action='store_true', help="Disable tracing in batch mode")
+    parser.add_argument('--metrics', default=None, help="Write run metrics (stage latencies, API calls, errors, bytes, cache hits) to this file")
+    parser.add_argument('--metrics-format', choices=['openmetrics', 'json'], default='openmetrics', help="OpenMetrics text or JSON summary")
+    parser.add_argument('--metrics-port', type=int, default=None, help="Serve live metrics on this local port (/metrics, /metrics.json)")
+    parser.add_argument('--update', action='store_true', help="Update candidate's existing Google Doc instead of creating a new one")
+    parser.add_argument('--candidate-id', default=None, help="Registry key of the candidate (default: its 'id' field, otherwise name and title)")
+    parser.add_argument('--cache', action='store_true', help="Return previously uploaded document when candidate and templates are unchanged")
+    parser.add_argument('--incremental', action='store_true', help="Reuse unchanged projects, skills rows and sections from previous renders")
+    parser.add_argument('--tmpfs', action='store_true', help="Keep intermediate files of each job in /dev/shm")
+    parser.add_argument('--keep-failed', action='store_true', help="Keep workspace of failed jobs for inspection")
+    parser.add_argument('--slim', action='store_true', help="Remove unused styles and numbering, rsids, proofing marks and redundant runs before upload")
+    parser.add_argument('--prefetched', action='store_true', help="Use templates kept current by the prefetch command, without template calls to Drive")
+    parser.add_argument('--parallel-sections', action='store_true', help="Render skills matrix, projects and main info of a single CV in parallel processes")
+    parser.add_argument('--profile-cpu', action='store_true', help="Run under cProfile and write .pstats reports")
+    parser.add_argument('--profile-collapsed', action='store_true', help="Also write collapsed stacks for flame graphs")
+    parser.add_argument('--profile-memory', action='store_true', help="Run under tracemalloc with per-stage allocation report")
+    parser.add_argument('--profile-top', type=int, default=20, help="Number of entries in profiling reports")
+    parser.add_argument('--profile-dir', default=os.path.join('temp_docs', 'profile'), help="Directory for profiling reports")
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch = subparsers.add_parser('batch', help="Render many candidates on a process pool")
+    batch.add_argument('candidates', nargs='*', help="Paths to candidate template.json files")
+    batch.add_argument('--input', default=None, help="Stream candidates from a JSON Lines file or a JSON array")
+    batch.add_argument('--resume', action='store_true', help="Continue --input from the last saved position")
+    batch.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    batch.add_argument('--output-dir', default=os.path.join('temp_docs', 'batch'), help="Directory for rendered .docx files")
+    batch.add_argument('--memory-limit', type=int, default=None, help="Pause intake while parent and workers use more than this many MB")
+    batch.add_argument('--recycle-workers', type=int, default=None, help="Restart each worker process after this many candidates")
+    batch.add_argument('--no-upload', action='store_true', help="Only render, do not upload to Google Drive")
+    batch.add_argument('--pipeline', action='store_true', help="Overlap fetch, render, upload and post-processing of consecutive candidates")
+
+    render_local_parser = subparsers.add_parser('render-local', help="Render --template with already exported templates, without network")
+    render_local_parser.add_argument('--templates-dir', default=Config.TEMPLATES_DIR, help="Directory with exported template .docx files")
+    render_local_parser.add_argument('--output', default=os.path.join('temp_docs', 'cv.docx'), help="Where to save rendered .docx")
+    render_local_parser.add_argument('--variants', default=None, help="JSON mapping variant name to replaced templates and optional bullet_color")
+    render_local_parser.add_argument('--output-dir', default=os.path.join('temp_docs', 'variants'), help="Where to save <variant>.docx files with --variants")
+
+    matrix = subparsers.add_parser('matrix-only', help="Build only the skills matrix for --template")
+    matrix.add_argument('--templates-dir', default=Config.TEMPLATES_DIR, help="Directory with exported template .docx files")
+    matrix.add_argument('--output', default=Config.OUTPUT_SKILLS_DOCX, help="Where to save skills matrix .docx")
+
+    validate_parser = subparsers.add_parser('validate', help="Check candidate files against template.json schema")
+    validate_parser.add_argument('files', nargs='*', help="Candidate files (default: --template)")
+    validate_parser.add_argument('--input', default=None, help="Also check every record of a JSON Lines file or JSON array")
+
+    serve_parser = subparsers.add_parser('serve', help="Keep templates and clients warm and render over local HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    serve_parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    serve_parser.add_argument('--socket', default=None, help="Listen on this Unix socket instead of TCP")
+    serve_parser.add_argument('--offline', action='store_true', help="Use already exported templates, never contact Google")
+    serve_parser.add_argument('--reload-interval', type=float, default=300, help="Seconds between template revision checks (0 disables)")
+
+    prefetch_parser = subparsers.add_parser('prefetch', help="Follow Drive changes and keep exported templates current")
+    prefetch_parser.add_argument('--interval', type=float, default=60, help="Seconds between changes feed polls")
+    prefetch_parser.add_argument('--once', action='store_true', help="Sync templates once and exit")
+
+    queue = subparsers.add_parser('queue', help="Share one batch between workers on several machines through a SQLite queue")
+    queue.add_argument('--db', default=Config.QUEUE_DB, help="Queue database file, shared by all workers")
+    queue.add_argument('--lease', type=float, default=Config.QUEUE_LEASE_SECONDS, help="Seconds a claimed job stays with a worker without renewal")
+    queue.add_argument('--max-attempts', type=int, default=Config.QUEUE_MAX_ATTEMPTS, help="Failed renders or uploads before a job is given up")
+    queue_commands = queue.add_subparsers(dest='queue_command', required=True)
+    enqueue = queue_commands.add_parser('enqueue', help="Validate candidates and add them to the queue")
+    enqueue.add_argument('candidates', nargs='*', help="Paths to candidate template.json files")
+    enqueue.add_argument('--input', default=None, help="Also enqueue every record of a JSON Lines file or JSON array")
+    work = queue_commands.add_parser('work', help="Render and upload queued candidates until the queue is drained")
+    work.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count)")
+    work.add_argument('--output-dir', default=os.path.join('temp_docs', 'queue'), help="Directory for rendered .docx files")
+    work.add_argument('--memory-limit', type=int, default=None, help="Pause intake while parent and workers use more than this many MB")
+    work.add_argument('--recycle-workers', type=int, default=None, help="Restart each worker process after this many candidates")
+    work.add_argument('--no-upload', action='store_true', help="Only render, do not upload to Google Drive")
+    work.add_argument('--no-wait', action='store_true', help="Exit when nothing is left to claim, without waiting for jobs leased by others")
+    work.add_argument('--poll', type=float, default=10, help="Seconds between checks while other workers hold the remaining jobs")
+    queue_commands.add_parser('retry', help="Put failed jobs back to the queue")
+    status = queue_commands.add_parser('status', help="Show job counts and per-worker throughput")
+    status.add_argument('--list', action='store_true', help="Also list jobs with their documents or errors")
+    status.add_argument('--status', choices=['pending', 'leased', 'done', 'failed'], default=None, help="List only jobs with this status")
+
+    cache = subparsers.add_parser('cache', help="Inspect and evict output cache entries")
+    cache_commands = cache.add_subparsers(dest='cache_command', required=True)
+    cache_commands.add_parser('list', help="List cached documents")
+    evict = cache_commands.add_parser('evict', help="Remove cached documents")
+    evict.add_argument('keys', nargs='*', help="Entry keys or unique key prefixes")
+    evict.add_argument('--all', action='store_true', help="Remove all entries")
+    evict.add_argument('--older-than', type=float, default=None, help="Remove entries older than this many days")
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command == 'batch' and not args.candidates and not args.input:
+        parser.error("batch needs candidate files or --input")
+    if args.command == 'batch' and args.pipeline:
+        # Pipeline stages take candidates one by one and always upload, these need the whole batch up front
+        unsupported = [flag for flag, value in (
+            ('--input', args.input),
+            ('--cache', args.cache),
+            ('--memory-limit', args.memory_limit),
+            ('--no-upload', args.no_upload)
+        ) if value]
+        if unsupported:
+            parser.error(f"--pipeline cannot be combined with {', '.join(unsupported)}")
+    if args.command == 'batch':
+        render_batch(args)
+    elif args.command == 'render-local':
+        sys.exit(0 if render_local(args) else 1)
+    elif args.command == 'matrix-only':
+        sys.exit(0 if matrix_only(args) else 1)
+    elif args.command == 'validate':
+        sys.exit(0 if validate(args) else 1)
+    elif args.command == 'serve':
+        serve(args)
+    elif args.command == 'prefetch':
+        sys.exit(0 if prefetch(args) else 1)
+    elif args.command == 'queue':
+        if args.queue_command == 'enqueue' and not args.candidates and not args.input:
+            parser.error("queue enqueue needs candidate files or --input")
+        sys.exit(0 if manage_queue(args) else 1)
+    elif args.command == 'cache':
+        manage_cache(args)
+    else:
+        render_single(args)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,280 @@
+import gc
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.core.document_processor import DocumentProcessor
+from src.core.render_cache import FragmentCache
+from src.utils.memory import current_rss, format_bytes, peak_rss
+from src.utils.profiling import Profiler
+from src.utils.tracing import Tracer
+
+# Per-process state filled once by the pool initializer
+_worker_state = {}
+
+
+def _init_worker(template_paths, trace_enabled=False, profile_options=None, fragment_cache_dir=None,
+                 workspace_options=None, slim_output=False):
+    """
+    Pool initializer: loads templates into memory and parses skills formatting once per worker
+    """
+    fragment_cache = FragmentCache(fragment_cache_dir) if fragment_cache_dir else None
+    processor = DocumentProcessor(
+        Tracer(enabled=trace_enabled), fragment_cache, workspace_options=workspace_options, slim_output=slim_output
+    )
+    templates = {}
+    for name, path in template_paths.items():
+        with open(path, 'rb') as f:
+            templates[name] = f.read()
+
+    _worker_state['processor'] = processor
+    _worker_state['templates'] = templates
+    _worker_state['skills_formats'] = processor.load_skills_formats(templates['skills_template'])
+    _worker_state['profile_options'] = profile_options or {'output_dir': None}
+
+
+def _render_candidate(index, template_data, output_dir, return_bytes):
+    """
+    Renders one candidate inside a worker process.
+    Returns result dict with output path or .docx bytes.
+    """
+    started = time.perf_counter()
+    result = {
+        'index': index,
+        'worker': os.getpid(),
+        'output_path': None,
+        'docx_bytes': None,
+        'bullet_color': None,
+        'error': None,
+        'spans': []
+    }
+    processor = _worker_state['processor']
+    rss_before = current_rss()
+    profiler = Profiler(tracer=processor.tracer, name=f'candidate_{index:05d}', **_worker_state['profile_options'])
+    try:
+        with processor.create_workspace(f'render_{index:05d}_') as workspace:
+            if output_dir:
+                output_path = os.path.join(output_dir, f'candidate_{index:05d}.docx')
+            else:
+                output_path = workspace.file('merged.docx')
+
+            with profiler:
+                result['bullet_color'] = processor.render_docx(
+                    _worker_state['templates'],
+                    template_data,
+                    workspace.path,
+                    output_path,
+                    _worker_state['skills_formats']
+                )
+
+            if return_bytes:
+                with open(output_path, 'rb') as f:
+                    result['docx_bytes'] = f.read()
+            if output_dir:
+                result['output_path'] = output_path
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    # python-docx trees are full of reference cycles, free them before the next candidate
+    gc.collect()
+    result['rss'] = current_rss()
+    result['rss_delta'] = result['rss'] - rss_before
+    result['peak_rss'] = peak_rss()
+
+    # Spans travel back to the parent together with the result
+    for span in processor.tracer.drain():
+        span['attrs'].setdefault('candidate', index)
+        result['spans'].append(span)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+class BatchRenderer:
+    """
+    Renders many candidates in parallel on a process pool.
+    Every worker keeps the templates preloaded, uploads are left to the caller.
+    """
+
+    def __init__(self, template_paths, workers=None, return_bytes=False, tracer=None, profile_options=None,
+                 fragment_cache_dir=None, memory_limit=None, max_tasks_per_child=None, workspace_options=None,
+                 slim_output=False):
+        self.template_paths = template_paths
+        self.workers = workers or os.cpu_count() or 1
+        self.return_bytes = return_bytes
+        self.tracer = tracer or Tracer()
+        self.profile_options = profile_options
+        self.fragment_cache_dir = fragment_cache_dir
+        self.memory_limit = memory_limit
+        self.max_tasks_per_child = max_tasks_per_child
+        self.workspace_options = workspace_options
+        self.slim_output = slim_output
+        self.stats = {}
+        self.worker_rss = {}
+        self.pauses = 0
+
+    def create_pool(self):
+        """
+        Creates process pool whose workers preload the templates
+        """
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(
+                self.template_paths,
+                self.tracer.recording,
+                self.profile_options,
+                self.fragment_cache_dir,
+                self.workspace_options,
+                self.slim_output
+            ),
+            max_tasks_per_child=self.max_tasks_per_child
+        )
+
+    def submit(self, pool, index, template_data, output_dir=None):
+        """
+        Schedules rendering of one candidate on pool, returns future with result dict
+        """
+        return pool.submit(_render_candidate, index, template_data, output_dir, self.return_bytes)
+
+    def render(self, candidates, output_dir=None):
+        """
+        Renders iterable of template data dicts.
+        Returns list of result dicts ordered by candidate index.
+        """
+        return list(self.render_stream(enumerate(candidates), output_dir))
+
+    def render_stream(self, candidates, output_dir=None, max_pending=None):
+        """
+        Renders iterable of (index, template data) pairs, keeping at most max_pending candidates in flight.
+        Intake also pauses while parent and workers together use more than memory_limit.
+        Yields result dicts in input order, so memory stays constant for arbitrarily long inputs.
+        """
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        max_pending = max_pending or self.workers * 2
+
+        started = time.perf_counter()
+        self.stats = {}
+        self.worker_rss = {}
+        self.pauses = 0
+        pending = deque()
+        candidates = iter(candidates)
+        with self.create_pool() as pool:
+            held = None
+            paused = False
+            while True:
+                while len(pending) < max_pending:
+                    if held is None:
+                        held = next(candidates, None)
+                        if held is None:
+                            break
+                    # Over the memory limit the candidate waits until finished ones bring usage down;
+                    # with nothing in flight it goes anyway, otherwise intake would stall for good
+                    if self.memory_limit and pending and self.memory_in_use() > self.memory_limit:
+                        if not paused:
+                            self.pauses += 1
+                            paused = True
+                        break
+                    paused = False
+                    index, template_data = held
+                    held = None
+                    pending.append(self.submit(pool, index, template_data, output_dir))
+                if not pending:
+                    break
+
+                result = pending.popleft().result()
+                self.tracer.extend(result.pop('spans'))
+                if result['error']:
+                    print(f"Candidate {result['index']} failed: {result['error']}")
+                self.record(result)
+                yield result
+
+        self.print_summary(time.perf_counter() - started)
+
+    def memory_in_use(self):
+        """
+        Returns RSS of parent process plus last reported RSS of every worker
+        """
+        return current_rss() + sum(self.worker_rss.values())
+
+    def record(self, result):
+        """
+        Adds finished candidate to per-worker counters
+        """
+        worker = self.stats.setdefault(result['worker'], {
+            'rendered': 0,
+            'failed': 0,
+            'busy_seconds': 0.0,
+            'peak_rss': 0,
+            'max_rss_delta': 0,
+            'total_rss_delta': 0
+        })
+        worker['failed' if result['error'] else 'rendered'] += 1
+        worker['busy_seconds'] += result['seconds']
+        worker['peak_rss'] = max(worker['peak_rss'], result['peak_rss'])
+        worker['max_rss_delta'] = max(worker['max_rss_delta'], result['rss_delta'])
+        worker['total_rss_delta'] += result['rss_delta']
+        # Recycled workers get new PIDs, only the most recent `workers` processes are alive
+        self.worker_rss.pop(result['worker'], None)
+        self.worker_rss[result['worker']] = result['rss']
+        while len(self.worker_rss) > self.workers:
+            del self.worker_rss[next(iter(self.worker_rss))]
+
+    def worker_stats(self, wall_seconds):
+        """
+        Aggregates renders, busy time, throughput and memory per worker process
+        """
+        for worker in self.stats.values():
+            done = worker['rendered'] + worker['failed']
+            worker['per_minute'] = done / wall_seconds * 60 if wall_seconds else 0.0
+            worker['avg_seconds'] = worker['busy_seconds'] / done if done else 0.0
+            worker['avg_rss_delta'] = worker['total_rss_delta'] / done if done else 0
+        return self.stats
+
+    def print_summary(self, wall_seconds):
+        """
+        Prints overall and per-worker throughput and memory
+        """
+        stats = self.worker_stats(wall_seconds)
+        total = sum(worker['rendered'] + worker['failed'] for worker in stats.values())
+        failed = sum(worker['failed'] for worker in stats.values())
+        rate = total / wall_seconds * 60 if wall_seconds else 0.0
+        print(f"Rendered {total - failed}/{total} candidates in {wall_seconds:.2f}s "
+              f"({rate:.1f} CV/min, {self.workers} workers)")
+        for pid, worker in sorted(stats.items()):
+            print(f"  worker {pid}: {worker['rendered']} ok, {worker['failed']} failed, "
+                  f"{worker['per_minute']:.1f} CV/min, {worker['avg_seconds']:.2f}s avg, "
+                  f"peak RSS {format_bytes(worker['peak_rss'])}, "
+                  f"per-candidate delta {format_bytes(worker['avg_rss_delta'])} avg / "
+                  f"{format_bytes(worker['max_rss_delta'])} max")
+        print(f"  parent peak RSS {format_bytes(peak_rss())}")
+        if self.memory_limit:
+            print(f"  intake paused {self.pauses} times at memory limit {format_bytes(self.memory_limit)}")
+
+    def upload_results(self, doc_processor, drive_service, results, titles, candidate_keys=None, cache_keys=None):
+        """
+        Uploads rendered files from the parent process, storing them in the output cache when keys are given.
+        Returns list of document URLs (None for failed candidates).
+        """
+        urls = []
+        for result in results:
+            url = None
+            if not result['error'] and result['output_path']:
+                with self.tracer.span('upload', candidate=result['index']):
+                    doc_id = doc_processor.publish_document(
+                        drive_service,
+                        result['output_path'],
+                        titles[result['index']],
+                        result['bullet_color'],
+                        candidate_keys[result['index']] if candidate_keys else None
+                    )
+                if doc_id:
+                    url = f"https://docs.google.com/document/d/{doc_id}/edit"
+                    if cache_keys and doc_processor.output_cache is not None:
+                        doc_processor.output_cache.put(
+                            cache_keys[result['index']], result['output_path'], doc_id, titles[result['index']]
+                        )
+            urls.append(url)
+        return urls
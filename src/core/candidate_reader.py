@@ -0,0 +1,126 @@
+import json
+import re
+
+# Structural characters outside strings and the characters that end or escape a string
+_TOKEN_RE = re.compile(rb'[\[\]{},"]')
+_STRING_END_RE = re.compile(rb'["\\]')
+
+
+class CandidateReader:
+    """
+    Streams candidates one at a time from a JSON Lines file or a large JSON array,
+    so memory does not grow with the size of the input. Every record comes with the byte
+    offset to resume from after it; malformed records are reported and skipped.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+        self.skipped = 0
+        self.format = self.detect_format()
+
+    def detect_format(self):
+        """
+        Returns 'array' when file holds a JSON array, otherwise 'jsonl'
+        """
+        with open(self.path, 'rb') as f:
+            head = f.read(1024).lstrip(b'\xef\xbb\xbf \t\r\n')
+        return 'array' if head.startswith(b'[') else 'jsonl'
+
+    def __iter__(self):
+        """
+        Yields (resume_offset, template_data) pairs
+        """
+        records = self._read_array() if self.format == 'array' else self._read_lines()
+        for offset, raw in records:
+            record_offset = self.offset
+            self.offset = offset
+            try:
+                data = json.loads(raw)
+            except ValueError as e:
+                self.report(record_offset, str(e))
+                continue
+            if not isinstance(data, dict):
+                self.report(record_offset, f"expected object, got {type(data).__name__}")
+                continue
+            yield offset, data
+
+    def report(self, offset, message):
+        self.skipped += 1
+        print(f"Skipping malformed record at byte {offset} of {self.path}: {message}")
+
+    def _read_lines(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            position = self.offset
+            for line in f:
+                position += len(line)
+                # UTF-8 BOM can only appear on the first line
+                line = line.strip().lstrip(b'\xef\xbb\xbf')
+                if line:
+                    yield position, line
+
+    def _read_array(self):
+        """
+        Splits top-level array into raw elements without parsing the whole file.
+        Resume offsets point at the delimiter that follows an element.
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            buf = b''
+            base = self.offset
+            pos = 0
+            depth = 0
+            in_string = False
+            # A resumed offset is already inside the array, right after an element
+            opened = self.offset > 0
+            start = 0 if opened else None
+
+            while True:
+                pattern = _STRING_END_RE if in_string else _TOKEN_RE
+                match = pattern.search(buf, pos)
+                if match is None or (in_string and match.group() == b'\\' and match.end() >= len(buf)):
+                    chunk = f.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    # Drop consumed bytes, keeping the element being collected
+                    resume = match.start() if match else len(buf)
+                    keep = start if start is not None else resume
+                    buf = buf[keep:] + chunk
+                    base += keep
+                    pos = resume - keep
+                    if start is not None:
+                        start = 0
+                    continue
+
+                token = match.group()
+                pos = match.end()
+                if in_string:
+                    if token == b'\\':
+                        pos += 1
+                    else:
+                        in_string = False
+                elif token == b'"':
+                    in_string = True
+                elif token in (b'{', b'['):
+                    if not opened:
+                        opened = True
+                        start = pos
+                    else:
+                        depth += 1
+                elif depth > 0:
+                    if token in (b'}', b']'):
+                        depth -= 1
+                elif token in (b',', b']'):
+                    element = buf[start:match.start()]
+                    if element.strip():
+                        yield base + match.start(), element
+                    if token == b']':
+                        self.offset = base + pos
+                        return
+                    start = pos
+
+            if start is not None and buf[start:].strip():
+                self.report(base + start, "unterminated array")
@@ -1,234 +1,578 @@
 from docx import Document
-from docxcompose.composer import Composer
-from src.services.google_service import GoogleServiceManager
+from docx.oxml import parse_xml
+from lxml import etree
 from src.core.template_processor import TemplateProcessor
+from src.core.prepared_candidate import PreparedCandidate
 from src.utils.formatting_utils import FormattingUtils
+from src.utils.docx_slimmer import DocxSlimmer
+from src.utils.media import find_duplicate_media, relink_media
 from src.core.skills_matrix_processor import SkillsMatrixProcessor
+from src.core.schema_validator import SchemaValidator
+from src.core.section_graph import SectionGraph
+from src.utils.tracing import Tracer
+from src.utils.workspace import Workspace
 from config.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import io
+import json
 import os
+import shutil
+import threading
 
 class DocumentProcessor:
-    def __init__(self):
-        self.google_service = GoogleServiceManager()
-        self.template_processor = TemplateProcessor()
+    # Google Docs templates that are not configured through URLs
+    SKILLS_TEMPLATE_ID = "1Xfhp1A7C4OZNxRn1QETSlXR0vj5FcHimJE6TZkQlLJs"
+    PROJECTS_TEMPLATE_ID = "1uJUVwNLWG9j_L2HxObvECXhpEAUQ0RRSwTZlJUjh9FA"
+    TEMPLATE_NAMES = ('listpage', 'maininfo', 'skills_template', 'projects_template', 'skills_matrix_template')
+
+    def __init__(self, tracer=None, fragment_cache=None, doc_registry=None, output_cache=None, workspace_options=None,
+                 section_pool=None, slim_output=False, template_prefetcher=None):
+        self.tracer = tracer or Tracer()
+        self.workspace_options = workspace_options or {}
+        self.fragment_cache = fragment_cache
+        self.doc_registry = doc_registry
+        self.output_cache = output_cache
+        # Process pool rendering sections of one CV concurrently, see section_graph
+        self.section_pool = section_pool
+        self.slim_output = slim_output
+        # Keeps local templates current from the Drive changes feed, see template_prefetcher
+        self.template_prefetcher = template_prefetcher
+        self._google_service = None
+        self.template_processor = TemplateProcessor(fragment_cache)
         self.formatting_utils = FormattingUtils()
-        self.skills_matrix_processor = SkillsMatrixProcessor()
-        
-    def merge_google_docs(self, listpage_url, maininfo_url, output_title, template_path=None):
+        self.skills_matrix_processor = SkillsMatrixProcessor(fragment_cache)
+        self.validator = SchemaValidator()
+
+    @property
+    def google_service(self):
+        """
+        Google API client manager, imported on first use so offline paths never load googleapiclient
+        """
+        if self._google_service is None:
+            from src.services.google_service import GoogleServiceManager
+            self._google_service = GoogleServiceManager(self.tracer)
+        return self._google_service
+
+    def create_workspace(self, prefix='job_'):
+        """
+        Returns new per-job workspace for intermediate files
+        """
+        return Workspace(Config.WORKSPACE_DIR, prefix, **self.workspace_options)
+
+    @contextmanager
+    def candidate_scope(self):
+        """
+        Releases formatting prototypes when the candidate is done,
+        they point into its trees and would keep every render in memory
+        """
+        try:
+            yield
+        finally:
+            self.template_processor.formatting_utils.release_prototypes()
+
+    def load_candidate(self, template_path):
+        """
+        Loads candidate data and raises CandidateValidationError if it does not match the schema
+        """
+        with self.tracer.span('validate', path=template_path):
+            template_data = self.template_processor.load_template_data(template_path)
+            return self.validator.ensure_valid(template_data)
+
+    def validate_candidates(self, template_paths):
+        """
+        Loads and validates many candidates.
+        Returns list of (template_data, errors) in input order, template_data is None for invalid ones.
+        """
+        results = []
+        with self.tracer.span('validate', candidates=len(template_paths)) as span:
+            for path in template_paths:
+                try:
+                    template_data = self.template_processor.load_template_data(path)
+                except (OSError, ValueError) as e:
+                    results.append((None, [f"<file>: {str(e)}"]))
+                    continue
+                errors = self.validator.validate(template_data)
+                results.append((None if errors else template_data, errors))
+            span.set('rejected', sum(1 for data, _ in results if data is None))
+        return results
+
+    def get_template_ids(self, listpage_url, maininfo_url):
+        """
+        Returns mapping of template name to Google Doc ID
+        """
+        return {
+            'listpage': self.google_service.get_document_id_from_url(listpage_url),
+            'maininfo': self.google_service.get_document_id_from_url(maininfo_url),
+            'skills_template': self.SKILLS_TEMPLATE_ID,
+            'projects_template': self.PROJECTS_TEMPLATE_ID,
+            'skills_matrix_template': Config.INPUT_SKILLS_DOC_ID
+        }
+
+    def find_local_templates(self, templates_dir):
+        """
+        Returns mapping of template name to already exported .docx in templates_dir
+        """
+        template_paths = {name: os.path.join(templates_dir, f'{name}.docx') for name in self.TEMPLATE_NAMES}
+        missing = [name for name, path in template_paths.items() if not os.path.exists(path)]
+        if missing:
+            raise Exception(f"Templates not found in {templates_dir}: {', '.join(missing)}")
+        return template_paths
+
+    def get_template_revisions(self, drive_service, template_ids):
+        """
+        Returns mapping of template name to its current Drive version
+        """
+        with self.tracer.span('template_revisions', templates=len(template_ids)):
+            return {
+                name: self.google_service.get_file_revision(drive_service, doc_id)
+                for name, doc_id in template_ids.items()
+            }
+
+    def export_templates(self, drive_service, template_ids, templates_dir, revisions=None):
+        """
+        Exports all templates to .docx files in templates_dir.
+        With known revisions, templates whose local copy has the same revision are not exported again.
+        Returns mapping of template name to local path.
+        """
+        os.makedirs(templates_dir, exist_ok=True)
+        revisions_path = os.path.join(templates_dir, 'revisions.json')
+        local_revisions = {}
+        if revisions and os.path.exists(revisions_path):
+            with open(revisions_path, 'r') as f:
+                local_revisions = json.load(f)
+
+        template_paths = {}
+        with self.tracer.span('export_templates', templates=len(template_ids)) as span:
+            for name, doc_id in template_ids.items():
+                path = os.path.join(templates_dir, f'{name}.docx')
+                template_paths[name] = path
+                cached = local_revisions.get(name)
+                if revisions and cached == {'doc_id': doc_id, 'version': revisions.get(name)} and os.path.exists(path):
+                    span.add('reused', 1)
+                    self.tracer.count('cache_requests', cache='template', result='hit')
+                    continue
+                if revisions:
+                    self.tracer.count('cache_requests', cache='template', result='miss')
+                # Templates are shared by concurrent jobs, so they are replaced atomically
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                if not self.google_service.export_to_docx(drive_service, doc_id, tmp_path):
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise Exception(f"Failed to export {name} document")
+                os.replace(tmp_path, path)
+                local_revisions[name] = {'doc_id': doc_id, 'version': revisions.get(name) if revisions else None}
+
+        if revisions:
+            tmp_path = f'{revisions_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(local_revisions, f, indent=2)
+            os.replace(tmp_path, revisions_path)
+        return template_paths
+
+    def current_template_revisions(self, drive_service, template_ids):
+        """
+        Returns template revisions, from local state without Drive calls when templates are prefetched
+        """
+        if self.template_prefetcher is not None:
+            return self.template_prefetcher.revisions()
+        return self.get_template_revisions(drive_service, template_ids)
+
+    def prepare_templates(self, drive_service, template_ids, revisions=None):
+        """
+        Returns mapping of template name to local .docx, exporting templates unless they are prefetched
+        """
+        if self.template_prefetcher is not None:
+            return self.template_prefetcher.template_paths()
+        return self.export_templates(drive_service, template_ids, Config.TEMPLATES_DIR, revisions)
+
+    def template_source_key(self, source):
+        """
+        Returns key telling templates given as file paths or .docx bytes apart
+        """
+        if isinstance(source, bytes):
+            return 'sha1:' + hashlib.sha1(source).hexdigest()
+        return os.path.abspath(source)
+
+    def open_template(self, source):
+        """
+        Opens template given either as a file path or as .docx bytes
+        """
+        if isinstance(source, bytes):
+            return Document(io.BytesIO(source))
+        return Document(source)
+
+    def materialize_template(self, source, output_path):
+        """
+        Writes template given as a file path or .docx bytes to output_path
+        """
+        if isinstance(source, bytes):
+            data = source
+        else:
+            with open(source, 'rb') as f:
+                data = f.read()
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        return output_path
+
+    def load_skills_formats(self, skills_template):
+        """
+        Reads key/value formatting from skills template
+        """
+        skills_doc = self.open_template(skills_template)
+        key_para, value_para, key_format, value_format = self.template_processor.find_skills_block_template(skills_doc)
+
+        if not (key_format and value_format):
+            print("Warning: Could not find formatting in skills template, using default formatting")
+
+        return key_format, value_format
+
+    def merge_google_docs(self, listpage_url, maininfo_url, output_title, template_path=None, candidate_key=None):
         """
         Main function for merging two Google Docs
         """
         try:
             # Get document IDs
-            listpage_id = self.google_service.get_document_id_from_url(listpage_url)
-            maininfo_id = self.google_service.get_document_id_from_url(maininfo_url)
-            
-            # Get services
-            drive_service = self.google_service.get_drive_service()
-            
-            # Create temp directory
-            temp_dir = 'temp_docs'
-            os.makedirs(temp_dir, exist_ok=True)
-            
-            # Paths for temporary files
-            listpage_docx = os.path.join(temp_dir, 'listpage.docx')
-            maininfo_docx = os.path.join(temp_dir, 'maininfo.docx')
-            skills_template_docx = os.path.join(temp_dir, 'skills_template.docx')
-            projects_template_docx = os.path.join(temp_dir, 'projects_template.docx')
-            skills_matrix_template_docx = os.path.join(temp_dir, 'skills_matrix_template.docx')
-            skills_matrix_docx = os.path.join(temp_dir, 'skills_matrix.docx')
-            merged_docx = os.path.join(temp_dir, 'merged.docx')
-            
-            # Export documents to .docx
-            if not self.google_service.export_to_docx(drive_service, listpage_id, listpage_docx):
-                raise Exception("Failed to export LISTPAGE document")
-            
-            if not self.google_service.export_to_docx(drive_service, maininfo_id, maininfo_docx):
-                raise Exception("Failed to export MAIN_INFO document")
-            
-            # Download skills template
-            skills_template_id = "1Xfhp1A7C4OZNxRn1QETSlXR0vj5FcHimJE6TZkQlLJs"
-            if not self.google_service.export_to_docx(drive_service, skills_template_id, skills_template_docx):
-                raise Exception("Failed to export skills template document")
-            
-            # Download projects template
-            projects_template_id = "1uJUVwNLWG9j_L2HxObvECXhpEAUQ0RRSwTZlJUjh9FA"
-            if not self.google_service.export_to_docx(drive_service, projects_template_id, projects_template_docx):
-                raise Exception("Failed to export projects template document")
-
-            # Download skills matrix template
-            skills_matrix_template_id = Config.INPUT_SKILLS_DOC_ID
-            if not self.google_service.export_to_docx(drive_service, skills_matrix_template_id, skills_matrix_template_docx):
-                raise Exception("Failed to export skills matrix template document")
-            
-            # Get formatting from skills template
-            skills_doc = Document(skills_template_docx)
-            key_para, value_para, key_format, value_format = self.template_processor.find_skills_block_template(skills_doc)
-            
-            if not (key_format and value_format):
-                print("Warning: Could not find formatting in skills template, using default formatting")
-            
-            if template_path:
-                template_data = self.template_processor.load_template_data(template_path)
-                
-                # Create skills matrix document
-                if not self.skills_matrix_processor.create_skills_matrix(
-                    skills_matrix_template_docx, 
-                    skills_matrix_docx, 
-                    template_data
-                ):
-                    raise Exception("Failed to create skills matrix document")
-                
-                # First fill projects template with data
-                projects_doc = Document(projects_template_docx)
-                
-                success, bullet_color = self.template_processor.process_projects_template(projects_doc, template_data)
-                if not success:
-                    raise Exception("Failed to process projects template")
-                projects_doc.save(projects_template_docx)
-                
-                # Process maininfo document
-                if not self.template_processor.process_document_with_template(maininfo_docx, template_data, key_format, value_format):
-                    raise Exception("Failed to process document with template")
-                
-                # Find place to insert projects in maininfo
-                maininfo_doc = Document(maininfo_docx)
-                
-                # Remove Tab 1 from main document
-                for i, para in enumerate(maininfo_doc.paragraphs):
-                    if para.text.strip() == 'Tab 1':
-                        p = para._element
-                        p.getparent().remove(p)
-                        break
-                
-                # Process projects template marker
-                projects_found = False
-                # First search in paragraphs
-                for para in maininfo_doc.paragraphs:
-                    if '{{PROJECTS_TEMPLATE}}' in para.text:
-                        projects_found = True
-                        
-                        # Get parent element
-                        parent = para._element.getparent()
-                        
-                        # Get table from projects_doc
-                        for table in projects_doc.tables:
-                            # Create deep copy of table
-                            table_copy = self.formatting_utils.deepcopy(table._element)
-                            # Insert table after paragraph
-                            para._element.addnext(table_copy)
-                            break
-                        
-                        # Remove paragraph with marker
-                        parent.remove(para._element)
-                        break
-                
-                # If not found in paragraphs, search in tables
-                if not projects_found:
-                    for table in maininfo_doc.tables:
-                        for row in table.rows:
-                            for cell in row.cells:
-                                for para in cell.paragraphs:
-                                    if '{{PROJECTS_TEMPLATE}}' in para.text:
-                                        projects_found = True
-                                        
-                                        # Get parent element
-                                        parent = para._element.getparent()
-                                        
-                                        # Get table from projects_doc
-                                        for proj_table in projects_doc.tables:
-                                            # Create deep copy of table
-                                            table_copy = self.formatting_utils.deepcopy(proj_table._element)
-                                            # Insert table after paragraph
-                                            para._element.addnext(table_copy)
-                                            break
-                                        
-                                        # Remove paragraph with marker
-                                        parent.remove(para._element)
-                                        break
-                            if projects_found:
-                                break
-                        if projects_found:
-                            break
-                
-                if not projects_found:
-                    raise Exception("Could not find {{PROJECTS_TEMPLATE}} in main_info document")
-
-                # Process skills matrix marker
-                skills_matrix_found = False
-                
-                # First search in paragraphs
-                for para in maininfo_doc.paragraphs:
-                    if '{{PROFESSIONAL_SKILLS}}' in para.text:
-                        skills_matrix_found = True
-                        
-                        # Get parent element
-                        parent = para._element.getparent()
-                        
-                        # Get table from skills matrix doc
-                        skills_matrix_doc = Document(skills_matrix_docx)
-                        for table in skills_matrix_doc.tables:
-                            # Create deep copy of table
-                            table_copy = self.formatting_utils.deepcopy(table._element)
-                            # Insert table after paragraph
-                            para._element.addnext(table_copy)
-                            break
-                        
-                        # Remove paragraph with marker
-                        parent.remove(para._element)
-                        break
-                
-                # If not found in paragraphs, search in tables
-                if not skills_matrix_found:
-                    for table in maininfo_doc.tables:
-                        for row in table.rows:
-                            for cell in row.cells:
-                                for para in cell.paragraphs:
-                                    if '{{PROFESSIONAL_SKILLS}}' in para.text:
-                                        skills_matrix_found = True
-                                        
-                                        # Get parent element
-                                        parent = para._element.getparent()
-                                        
-                                        # Get table from skills matrix doc
-                                        skills_matrix_doc = Document(skills_matrix_docx)
-                                        for matrix_table in skills_matrix_doc.tables:
-                                            # Create deep copy of table
-                                            table_copy = self.formatting_utils.deepcopy(matrix_table._element)
-                                            # Insert table after paragraph
-                                            para._element.addnext(table_copy)
-                                            break
-                                        
-                                        # Remove paragraph with marker
-                                        parent.remove(para._element)
-                                        break
-                            if skills_matrix_found:
-                                break
-                        if skills_matrix_found:
-                            break
-                
-                if not skills_matrix_found:
-                    print("Warning: Could not find {{PROFESSIONAL_SKILLS}} in main_info document")
-                
-                maininfo_doc.save(maininfo_docx)
-            
-            # Merge .docx files
-            if not self.merge_docx_files(listpage_docx, maininfo_docx, merged_docx):
-                raise Exception("Failed to merge documents")
-            
-            # Upload result back to Google Drive with saved bullet points color
-            new_doc_id = self.google_service.upload_to_drive(drive_service, merged_docx, output_title, bullet_color)
-            if not new_doc_id:
-                raise Exception("Failed to upload merged document")
-            
+            template_ids = self.get_template_ids(listpage_url, maininfo_url)
+
+            # Candidate is validated while Drive client authenticates, invalid data fails before any export
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                candidate = executor.submit(self.load_candidate, template_path) if template_path else None
+                drive_service = self.google_service.get_drive_service()
+                template_data = candidate.result() if candidate else None
+
+            if template_data is not None and candidate_key is None and self.doc_registry is not None:
+                candidate_key = self.doc_registry.candidate_key(template_data)
+
+            # Same candidate with unchanged templates is served from the output cache
+            revisions = None
+            cache_key = None
+            if self.output_cache is not None and template_data is not None:
+                revisions = self.current_template_revisions(drive_service, template_ids)
+                cache_key = self.output_cache.make_key(template_data, revisions, output_title, self.slim_output)
+                cached = self.output_cache.get(cache_key)
+                self.tracer.count('cache_requests', cache='output', result='hit' if cached and cached.get('doc_id') else 'miss')
+                if cached and cached.get('doc_id'):
+                    print(f"Output cache hit {cache_key[:12]}")
+                    return f"https://docs.google.com/document/d/{cached['doc_id']}/edit"
+
+            # Export documents to .docx, exported templates are shared by all jobs
+            template_paths = self.prepare_templates(drive_service, template_ids, revisions)
+
+            # Intermediate files live in a private workspace, so renders can run concurrently
+            with self.create_workspace() as workspace:
+                merged_docx = workspace.file('merged.docx')
+
+                bullet_color = None
+                if template_data is not None:
+                    bullet_color = self.render_docx(template_paths, template_data, workspace.path, merged_docx)
+                elif not self.merge_docx_files(template_paths['listpage'], template_paths['maininfo'], merged_docx):
+                    raise Exception("Failed to merge documents")
+
+                # Upload result back to Google Drive with saved bullet points color
+                with self.tracer.span('upload', bytes_up=os.path.getsize(merged_docx)):
+                    new_doc_id = self.publish_document(drive_service, merged_docx, output_title, bullet_color, candidate_key)
+                if not new_doc_id:
+                    raise Exception("Failed to upload merged document")
+
+                if cache_key is not None:
+                    self.output_cache.put(cache_key, merged_docx, new_doc_id, output_title)
+
             # Form and return URL of new document
             new_doc_url = f"https://docs.google.com/document/d/{new_doc_id}/edit"
             return new_doc_url
-        
+
         except Exception as e:
             print(f"An error occurred: {str(e)}")
             return None
 
+    def publish_document(self, drive_service, docx_path, title, bullet_color=None, candidate_key=None):
+        """
+        Uploads rendered document. With a registry and candidate key the candidate's
+        existing Google Doc is updated in place, and left untouched when content is unchanged.
+        Returns document ID.
+        """
+        if self.doc_registry is None or not candidate_key:
+            return self.google_service.upload_to_drive(drive_service, docx_path, title, bullet_color)
+
+        content_hash = self.doc_registry.content_hash(docx_path)
+        entry = self.doc_registry.get(candidate_key)
+        if entry:
+            self.tracer.count('cache_requests', cache='registry', result='hit' if entry['content_hash'] == content_hash else 'miss')
+            if entry['content_hash'] == content_hash:
+                print(f"Document for {candidate_key} is up to date, skipping upload")
+                return entry['doc_id']
+
+            # Update replaces content, so bullets have to be applied again
+            if self.google_service.update_document(drive_service, entry['doc_id'], docx_path):
+                self.google_service.apply_bullet_formatting(drive_service, entry['doc_id'], bullet_color)
+                self.doc_registry.set(candidate_key, entry['doc_id'], content_hash, title)
+                return entry['doc_id']
+            print(f"Could not update document of {candidate_key}, creating a new one")
+
+        doc_id = self.google_service.upload_to_drive(drive_service, docx_path, title, bullet_color)
+        if doc_id:
+            self.doc_registry.set(candidate_key, doc_id, content_hash, title)
+        return doc_id
+
+    def prepare_candidate(self, template_data):
+        """
+        Derives everything that does not depend on templates from candidate data
+        """
+        with self.tracer.span('prepare_candidate'):
+            return PreparedCandidate(
+                template_data,
+                self.skills_matrix_processor.get_skills_matrix_data(template_data),
+                self.template_processor.prepare_text(template_data),
+                [self.template_processor.project_texts(project) for project in template_data.get('projects', [])]
+            )
+
+    def render_docx(self, templates, template_data, work_dir, output_path, skills_formats=None):
+        """
+        Renders CV for template_data into output_path without touching the network.
+        Templates are given as file paths or .docx bytes and are never modified,
+        all intermediate files are written to work_dir.
+        Skills matrix, projects table and maininfo are independent until the splice and
+        run concurrently on section_pool when it is set.
+        Returns bullet color of responsibilities list.
+        """
+        os.makedirs(work_dir, exist_ok=True)
+        listpage_docx = os.path.join(work_dir, 'listpage.docx')
+        tracer = self.tracer
+
+        formatting_utils = self.template_processor.formatting_utils
+        # Counters of caches kept by the processor are cumulative, spans get this render's share
+        fragment_counts = (self.fragment_cache.hits, self.fragment_cache.misses) if self.fragment_cache is not None else None
+        prototype_counts = (formatting_utils.prototype_hits, formatting_utils.prototype_misses)
+
+        with self.candidate_scope(), tracer.span('render', projects=len(template_data.get('projects', []))) as render_span:
+            # Get formatting from skills template
+            if skills_formats is None:
+                skills_formats = self.load_skills_formats(templates['skills_template'])
+
+            prepared = self.prepare_candidate(template_data)
+            graph = SectionGraph(self, self.section_pool)
+            graph.add('skills_matrix', 'render_skills_matrix_section', templates, prepared, work_dir)
+            graph.add('projects_table', 'render_projects_section', templates, prepared)
+            graph.add('maininfo', 'render_maininfo_section', templates, prepared, work_dir, skills_formats)
+            # Tables are spliced into the filled maininfo in place
+            graph.add(
+                'splice', 'splice_sections', os.path.join(work_dir, 'maininfo.docx'),
+                after=('maininfo', 'projects_table', 'skills_matrix'), local=True
+            )
+            sections = graph.run()
+            maininfo_docx = sections['splice']
+            bullet_color = sections['projects_table'][1]
+
+            # Merge .docx files
+            with tracer.span('merge') as span:
+                self.materialize_template(templates['listpage'], listpage_docx)
+                if not self.merge_docx_files(listpage_docx, maininfo_docx, output_path):
+                    raise Exception("Failed to merge documents")
+                span.set(bytes=os.path.getsize(output_path))
+
+            if fragment_counts is not None:
+                render_span.set(
+                    fragment_hits=self.fragment_cache.hits - fragment_counts[0],
+                    fragment_misses=self.fragment_cache.misses - fragment_counts[1]
+                )
+            render_span.set(
+                format_prototype_hits=formatting_utils.prototype_hits - prototype_counts[0],
+                format_prototype_misses=formatting_utils.prototype_misses - prototype_counts[1],
+                parallel_sections=self.section_pool is not None
+            )
+
+        return bullet_color
+
+    def render_variants(self, templates, variants, template_data, work_dir, output_dir):
+        """
+        Renders one candidate into several template variants in one pass.
+        variants maps variant name to templates replacing those in templates (file paths or .docx bytes)
+        and, optionally, 'bullet_color' replacing the color taken from the projects template.
+        Candidate data is prepared once; sections and merges whose templates are shared by several
+        variants are rendered once, independent sections run concurrently on section_pool when it is set.
+        Returns mapping of variant name to (output path, bullet color).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        tracer = self.tracer
+
+        with self.candidate_scope(), tracer.span('render_variants', variants=len(variants)) as render_span:
+            prepared = self.prepare_candidate(template_data)
+            graph = SectionGraph(self, self.section_pool)
+            section_names = {}
+            skills_formats = {}
+            plan = {}
+
+            def add_section(key, kind, variant, method, *args, after=(), local=False):
+                # Section is named after the first variant needing it, later variants reuse its result
+                if key not in section_names:
+                    section_names[key] = f'{kind}[{variant}]'
+                    graph.add(section_names[key], method, *args, after=after, local=local)
+                return section_names[key]
+
+            for variant, overrides in variants.items():
+                variant_templates = dict(templates)
+                variant_templates.update((name, source) for name, source in overrides.items() if name in self.TEMPLATE_NAMES)
+                keys = {name: self.template_source_key(source) for name, source in variant_templates.items()}
+                variant_dir = os.path.join(work_dir, variant)
+                os.makedirs(variant_dir, exist_ok=True)
+
+                if keys['skills_template'] not in skills_formats:
+                    skills_formats[keys['skills_template']] = self.load_skills_formats(variant_templates['skills_template'])
+
+                matrix = add_section(
+                    ('skills_matrix', keys['skills_matrix_template']), 'skills_matrix', variant,
+                    'render_skills_matrix_section', variant_templates, prepared, variant_dir
+                )
+                projects = add_section(
+                    ('projects_table', keys['projects_template']), 'projects_table', variant,
+                    'render_projects_section', variant_templates, prepared
+                )
+                maininfo = add_section(
+                    ('maininfo', keys['maininfo'], keys['skills_template']), 'maininfo', variant,
+                    'render_maininfo_section', variant_templates, prepared, variant_dir,
+                    skills_formats[keys['skills_template']]
+                )
+                # Filled maininfo may be shared, so each splice writes a document of its own
+                splice = add_section(
+                    ('splice', maininfo, projects, matrix), 'splice', variant,
+                    'splice_sections', os.path.join(variant_dir, 'body.docx'),
+                    after=(maininfo, projects, matrix), local=True
+                )
+                plan[variant] = (variant_templates['listpage'], keys['listpage'], splice, projects, overrides.get('bullet_color'))
+
+            sections = graph.run()
+
+            results = {}
+            merged = {}
+            for variant, (listpage, listpage_key, splice, projects, bullet_color) in plan.items():
+                output_path = os.path.join(output_dir, f'{variant}.docx')
+                with tracer.span('merge', variant=variant) as span:
+                    # Variants differing only in bullet color share the merged document
+                    if (listpage_key, splice) in merged:
+                        shutil.copyfile(merged[(listpage_key, splice)], output_path)
+                        span.set(reused=True)
+                    else:
+                        listpage_docx = os.path.join(work_dir, variant, 'listpage.docx')
+                        self.materialize_template(listpage, listpage_docx)
+                        if not self.merge_docx_files(listpage_docx, sections[splice], output_path):
+                            raise Exception(f"Failed to merge documents of variant {variant}")
+                        merged[(listpage_key, splice)] = output_path
+                    span.set(bytes=os.path.getsize(output_path))
+                results[variant] = (output_path, bullet_color or sections[projects][1])
+
+            render_span.set(
+                sections=len(graph.sections),
+                merges=len(merged),
+                parallel_sections=self.section_pool is not None
+            )
+
+        return results
+
+    def render_skills_matrix_section(self, templates, prepared, work_dir):
+        """
+        Builds skills matrix from prepared rows, returns its table as XML fragment
+        """
+        skills_matrix_template_docx = os.path.join(work_dir, 'skills_matrix_template.docx')
+        skills_matrix_docx = os.path.join(work_dir, 'skills_matrix.docx')
+        self.materialize_template(templates['skills_matrix_template'], skills_matrix_template_docx)
+        if not self.skills_matrix_processor.create_skills_matrix(
+            skills_matrix_template_docx,
+            skills_matrix_docx,
+            prepared.template_data,
+            prepared.matrix_rows
+        ):
+            raise Exception("Failed to create skills matrix document")
+        return self.first_table_xml(Document(skills_matrix_docx))
+
+    def render_projects_section(self, templates, prepared):
+        """
+        Fills projects template with prepared project texts.
+        Returns (projects table as XML fragment, bullet color).
+        """
+        projects_doc = self.open_template(templates['projects_template'])
+        success, bullet_color = self.template_processor.process_projects_template(
+            projects_doc, prepared.template_data, prepared.projects
+        )
+        if not success:
+            raise Exception("Failed to process projects template")
+        return self.first_table_xml(projects_doc), bullet_color
+
+    def render_maininfo_section(self, templates, prepared, work_dir, skills_formats):
+        """
+        Fills maininfo placeholders with prepared texts, returns path of filled document
+        """
+        key_format, value_format = skills_formats
+        maininfo_docx = os.path.join(work_dir, 'maininfo.docx')
+        self.materialize_template(templates['maininfo'], maininfo_docx)
+        if not self.template_processor.process_document_with_template(
+            maininfo_docx, prepared.template_data, key_format, value_format, prepared.text
+        ):
+            raise Exception("Failed to process document with template")
+        return maininfo_docx
+
+    def splice_sections(self, output_path, maininfo_docx, projects_section, skills_matrix_xml):
+        """
+        Inserts rendered tables into maininfo document and saves it to output_path, returns output_path
+        """
+        maininfo_doc = Document(maininfo_docx)
+
+        # Remove Tab 1 from main document
+        for i, para in enumerate(maininfo_doc.paragraphs):
+            if para.text.strip() == 'Tab 1':
+                p = para._element
+                p.getparent().remove(p)
+                break
+
+        # Insert projects table in place of its marker
+        if not self.insert_fragment_at_marker(maininfo_doc, '{{PROJECTS_TEMPLATE}}', projects_section[0]):
+            raise Exception("Could not find {{PROJECTS_TEMPLATE}} in main_info document")
+
+        # Insert skills matrix table in place of its marker
+        if not self.insert_fragment_at_marker(maininfo_doc, '{{PROFESSIONAL_SKILLS}}', skills_matrix_xml):
+            print("Warning: Could not find {{PROFESSIONAL_SKILLS}} in main_info document")
+
+        maininfo_doc.save(output_path)
+        return output_path
+
+    def first_table_xml(self, doc):
+        """
+        Returns first table of doc serialized as XML, or None
+        """
+        for table in doc.tables:
+            return etree.tostring(table._element)
+        return None
+
+    def find_marker_paragraph(self, doc, marker):
+        """
+        Finds paragraph containing marker, first in body paragraphs, then in tables
+        """
+        for para in doc.paragraphs:
+            if marker in para.text:
+                return para
+
+        for table in doc.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    for para in cell.paragraphs:
+                        if marker in para.text:
+                            return para
+        return None
+
+    def insert_fragment_at_marker(self, doc, marker, fragment):
+        """
+        Replaces paragraph with marker by element parsed from XML fragment
+        """
+        para = self.find_marker_paragraph(doc, marker)
+        if para is None:
+            return False
+
+        if fragment is not None:
+            para._element.addnext(parse_xml(fragment))
+        para._element.getparent().remove(para._element)
+        return True
+
     def merge_docx_files(self, listpage_path, maininfo_path, output_path, template_path=None, key_format=None, value_format=None):
         """
         Merges two .docx files into one using docxcompose
@@ -239,19 +583,44 @@ class DocumentProcessor:
                 template_data = self.template_processor.load_template_data(template_path)
                 # Process only maininfo document
                 self.template_processor.process_document_with_template(maininfo_path, template_data, key_format, value_format)
-            
+
+            from docxcompose.composer import Composer
+
             # Open base document
             master = Document(listpage_path)
             composer = Composer(master)
-            
+
             # Add second document
             doc2 = Document(maininfo_path)
             composer.append(doc2)
-            
+
+            if self.slim_output:
+                with self.tracer.span('slim') as span:
+                    span.set(**DocxSlimmer().slim(master))
+
+            # Composer already reuses images of the appended document by sha1,
+            # this only drops copies the listpage template carries itself
+            with self.tracer.span('dedupe_media') as span:
+                stats, duplicates = find_duplicate_media(master.part.package)
+                if duplicates:
+                    # Size without the pass is measured only when the pass changes something
+                    buffer = io.BytesIO()
+                    composer.save(buffer)
+                    stats['docx_bytes_before'] = buffer.tell()
+                    relink_media(master.part.package, duplicates)
+                span.set(**stats)
+
             # Save result
-            composer.save(output_path)
+            with self.tracer.span('save') as span:
+                composer.save(output_path)
+                stats['docx_bytes_after'] = os.path.getsize(output_path)
+                stats.setdefault('docx_bytes_before', stats['docx_bytes_after'])
+                span.set(docx_bytes_before=stats['docx_bytes_before'], docx_bytes_after=stats['docx_bytes_after'])
+            if duplicates:
+                print(f"Removed {len(duplicates)} duplicate media parts: "
+                      f"{stats['docx_bytes_before']} -> {stats['docx_bytes_after']} bytes")
             return True
-            
+
         except Exception as e:
             print(f"An error occurred while merging: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
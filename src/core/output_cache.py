@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+# Bump when rendering output changes in a way the sources below do not capture (e.g. library upgrade)
+RENDERER_VERSION = '2'
+# Modules whose code shapes the rendered .docx, relative to src/
+RENDERER_MODULES = (
+    'core/document_processor.py',
+    'core/template_processor.py',
+    'core/skills_matrix_processor.py',
+    'core/repeat_blocks.py',
+    'utils/formatting_utils.py',
+    'utils/docx_slimmer.py',
+    'utils/media.py',
+)
+
+
+@functools.lru_cache(maxsize=None)
+def renderer_fingerprint():
+    """
+    Returns RENDERER_VERSION with a hash of the rendering modules, so entries written
+    by an older renderer stop matching as soon as its code changes
+    """
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for module in RENDERER_MODULES:
+        digest.update(module.encode('utf-8'))
+        with open(os.path.join(src_dir, module), 'rb') as f:
+            digest.update(f.read())
+    return f'{RENDERER_VERSION}-{digest.hexdigest()[:16]}'
+
+
+class OutputCache:
+    """
+    Content-addressed cache of finished CVs. Key is a hash of the normalized candidate data,
+    template revisions, output title and renderer version; entry holds the rendered .docx
+    and the resulting Google Doc ID.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def normalize(value):
+        """
+        Strips surrounding whitespace from all strings of candidate data
+        """
+        if isinstance(value, dict):
+            return {key: OutputCache.normalize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [OutputCache.normalize(item) for item in value]
+        if isinstance(value, str):
+            return value.strip()
+        return value
+
+    def make_key(self, template_data, template_revisions, output_title, slim=False):
+        """
+        Builds cache key for candidate rendered with given template revisions
+        """
+        payload = {
+            'candidate': self.normalize(template_data),
+            'templates': template_revisions,
+            'title': output_title,
+            'renderer': renderer_fingerprint()
+        }
+        if slim:
+            payload['slim'] = True
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """
+        Returns entry metadata for key or None
+        """
+        meta_path = os.path.join(self._entry_dir(key), 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if not os.path.exists(meta['docx_path']):
+            return None
+
+        meta['hits'] = meta.get('hits', 0) + 1
+        meta['last_hit'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        try:
+            # Hit counter is informational, a concurrent hit may overwrite it but never breaks the entry
+            self._write_meta(key, meta)
+        except OSError:
+            pass
+        return meta
+
+    def put(self, key, docx_path, doc_id, title):
+        """
+        Stores rendered .docx and its document ID under key
+        """
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        cached_docx = os.path.join(entry_dir, 'output.docx')
+        tmp_docx = f'{cached_docx}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        shutil.copyfile(docx_path, tmp_docx)
+        os.replace(tmp_docx, cached_docx)
+        meta = {
+            'key': key,
+            'doc_id': doc_id,
+            'title': title,
+            'docx_path': cached_docx,
+            'size': os.path.getsize(cached_docx),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'created_ts': time.time(),
+            'hits': 0
+        }
+        self._write_meta(key, meta)
+        return meta
+
+    def _write_meta(self, key, meta):
+        path = os.path.join(self._entry_dir(key), 'meta.json')
+        # Writers of one entry (hits in several workers) never share a temp file
+        tmp_path = f'{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def entries(self):
+        """
+        Returns metadata of all entries, newest first
+        """
+        result = []
+        for key in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self._entry_dir(key), 'meta.json')
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r') as f:
+                    result.append(json.load(f))
+        return sorted(result, key=lambda meta: meta.get('created_ts', 0), reverse=True)
+
+    def evict(self, key):
+        """
+        Removes entry, accepts unique key prefix. Returns True if something was removed.
+        """
+        matches = [meta['key'] for meta in self.entries() if meta['key'].startswith(key)]
+        if len(matches) != 1:
+            return False
+        shutil.rmtree(self._entry_dir(matches[0]), ignore_errors=True)
+        return True
+
+    def evict_older_than(self, days):
+        """
+        Removes entries created more than `days` days ago, returns number removed
+        """
+        cutoff = time.time() - days * 86400
+        removed = 0
+        for meta in self.entries():
+            if meta.get('created_ts', 0) < cutoff:
+                shutil.rmtree(self._entry_dir(meta['key']), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Removes all entries, returns number removed
+        """
+        removed = 0
+        for meta in self.entries():
+            shutil.rmtree(self._entry_dir(meta['key']), ignore_errors=True)
+            removed += 1
+        return removed
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+
+from src.core.batch_renderer import BatchRenderer
+
+# Marks the end of the stream in every stage queue
+_DONE = object()
+
+
+class RenderPipeline:
+    """
+    Asyncio pipeline with bounded queues between stages:
+    fetch -> render (process pool) -> upload -> bullet post-process.
+    While one candidate renders, the next one is fetched and the previous one uploads.
+    """
+
+    def __init__(self, doc_processor, listpage_url, maininfo_url, output_title, output_dir, queue_size=2, render_workers=1,
+                 profile_options=None, fragment_cache_dir=None, max_tasks_per_child=None):
+        self.doc_processor = doc_processor
+        self.google_service = doc_processor.google_service
+        self.tracer = doc_processor.tracer
+        self.listpage_url = listpage_url
+        self.maininfo_url = maininfo_url
+        self.output_title = output_title
+        self.output_dir = output_dir
+        self.queue_size = queue_size
+        self.render_workers = render_workers
+        self.profile_options = profile_options
+        self.fragment_cache_dir = fragment_cache_dir
+        self.max_tasks_per_child = max_tasks_per_child
+        self.template_paths = None
+        self.renderer = None
+        self.pool = None
+
+    def run(self, candidate_paths):
+        """
+        Runs pipeline for list of candidate template.json paths.
+        Returns list of result dicts in input order.
+        """
+        return asyncio.run(self.run_async(candidate_paths))
+
+    async def run_async(self, candidate_paths):
+        os.makedirs(self.output_dir, exist_ok=True)
+        fetch_q = asyncio.Queue(maxsize=self.queue_size)
+        render_q = asyncio.Queue(maxsize=self.queue_size)
+        upload_q = asyncio.Queue(maxsize=self.queue_size)
+        post_q = asyncio.Queue(maxsize=self.queue_size)
+        results = []
+
+        # Every network stage uses its own Drive client, httplib2 is not thread-safe
+        fetch_drive = await asyncio.to_thread(self.google_service.get_drive_service)
+        upload_drive = await asyncio.to_thread(self.google_service.get_drive_service)
+        post_drive = await asyncio.to_thread(self.google_service.get_drive_service)
+
+        async def produce():
+            for index, template_path in enumerate(candidate_paths):
+                await fetch_q.put({
+                    'index': index,
+                    'template_path': template_path,
+                    'error': None,
+                    'timings': {}
+                })
+            await fetch_q.put(_DONE)
+
+        async def fetch(item):
+            started = time.perf_counter()
+            with self.tracer.span('pipeline.fetch', 'pipeline', candidate=item['index']):
+                try:
+                    # Candidate is validated alongside the first template export, invalid ones never reach render
+                    candidate = asyncio.to_thread(self.doc_processor.load_candidate, item['template_path'])
+                    if self.template_paths is None:
+                        template_data, template_paths = await asyncio.gather(
+                            candidate, asyncio.to_thread(self._fetch_templates, fetch_drive), return_exceptions=True
+                        )
+                        if isinstance(template_paths, Exception):
+                            raise template_paths
+                        self.template_paths = template_paths
+                        if isinstance(template_data, Exception):
+                            raise template_data
+                        item['template_data'] = template_data
+                    else:
+                        item['template_data'] = await candidate
+                    item['title'] = f"{self.output_title} - {item['template_data']['personal_info']['name']}"
+                    if self.doc_processor.doc_registry is not None:
+                        item['candidate_key'] = self.doc_processor.doc_registry.candidate_key(item['template_data'])
+                except Exception as e:
+                    item['error'] = f"fetch: {str(e)}"
+            item['timings']['fetch'] = time.perf_counter() - started
+            return item
+
+        async def render(item):
+            if item['error']:
+                return item
+            started = time.perf_counter()
+            if self.renderer is None:
+                self.renderer = BatchRenderer(
+                    self.template_paths,
+                    workers=self.render_workers,
+                    tracer=self.tracer,
+                    profile_options=self.profile_options,
+                    fragment_cache_dir=self.fragment_cache_dir,
+                    max_tasks_per_child=self.max_tasks_per_child,
+                    workspace_options=self.doc_processor.workspace_options,
+                    slim_output=self.doc_processor.slim_output
+                )
+                self.pool = self.renderer.create_pool()
+            result = await asyncio.wrap_future(
+                self.renderer.submit(self.pool, item['index'], item.pop('template_data'), self.output_dir)
+            )
+            self.tracer.extend(result['spans'])
+            item['output_path'] = result['output_path']
+            item['bullet_color'] = result['bullet_color']
+            if result['error']:
+                item['error'] = f"render: {result['error']}"
+            item['timings']['render'] = time.perf_counter() - started
+            return item
+
+        async def upload(item):
+            if item['error']:
+                return item
+            started = time.perf_counter()
+            with self.tracer.span('pipeline.upload', 'pipeline', candidate=item['index']):
+                if self.doc_processor.doc_registry is not None:
+                    # Registry mode updates documents in place and applies bullets itself
+                    item['doc_id'] = await asyncio.to_thread(
+                        self.doc_processor.publish_document,
+                        upload_drive,
+                        item['output_path'],
+                        item['title'],
+                        item['bullet_color'],
+                        item['candidate_key']
+                    )
+                    item['post_processed'] = True
+                else:
+                    item['doc_id'] = await asyncio.to_thread(
+                        self.google_service.create_document, upload_drive, item['output_path'], item['title']
+                    )
+            if not item['doc_id']:
+                item['error'] = "upload: failed to upload merged document"
+            item['timings']['upload'] = time.perf_counter() - started
+            return item
+
+        async def post_process(item):
+            if not item['error']:
+                if not item.get('post_processed'):
+                    started = time.perf_counter()
+                    with self.tracer.span('pipeline.post_process', 'pipeline', candidate=item['index']):
+                        await asyncio.to_thread(
+                            self.google_service.apply_bullet_formatting, post_drive, item['doc_id'], item['bullet_color']
+                        )
+                    item['timings']['post_process'] = time.perf_counter() - started
+                item['url'] = f"https://docs.google.com/document/d/{item['doc_id']}/edit"
+            else:
+                print(f"Candidate {item['template_path']} failed at {item['error']}")
+            results.append(item)
+
+        try:
+            await asyncio.gather(
+                produce(),
+                self._run_stage(fetch_q, render_q, fetch),
+                self._run_stage(render_q, upload_q, render, self.render_workers),
+                self._run_stage(upload_q, post_q, upload),
+                self._run_stage(post_q, None, post_process)
+            )
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+        return sorted(results, key=lambda r: r['index'])
+
+    async def _run_stage(self, inbox, outbox, handler, concurrency=1):
+        """
+        Consumes inbox with `concurrency` workers and forwards results to outbox.
+        Bounded queues make a slow stage hold back the stages before it.
+        """
+        async def consume():
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    # Let sibling consumers of this stage stop as well
+                    await inbox.put(_DONE)
+                    return
+                result = await handler(item)
+                if outbox is not None:
+                    await outbox.put(result)
+
+        await asyncio.gather(*(consume() for _ in range(concurrency)))
+        if outbox is not None:
+            await outbox.put(_DONE)
+
+    def _fetch_templates(self, drive_service):
+        """
+        Exports templates once for the whole run
+        """
+        template_ids = self.doc_processor.get_template_ids(self.listpage_url, self.maininfo_url)
+        return self.doc_processor.prepare_templates(drive_service, template_ids)
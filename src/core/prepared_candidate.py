@@ -0,0 +1,12 @@
+class PreparedCandidate:
+    """
+    Data derived from one candidate that does not depend on templates: skills matrix rows,
+    maininfo texts (introduction parts, formatted lists, skills sections) and project texts.
+    Prepared once by DocumentProcessor.prepare_candidate and shared by every variant rendered for the candidate.
+    """
+
+    def __init__(self, template_data, matrix_rows, text, projects):
+        self.template_data = template_data
+        self.matrix_rows = matrix_rows
+        self.text = text
+        self.projects = projects
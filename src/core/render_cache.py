@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from docx.oxml import parse_xml
+from lxml import etree
+
+
+class FragmentCache:
+    """
+    Keeps rendered XML fragments (table rows, paragraphs) keyed by a hash of their input data
+    and of the template element they were cloned from. When one project or skill changes,
+    only its fragments are rebuilt, the rest are reused from the previous render.
+    Memory keeps the max_entries most recently used keys; the directory is pruned to max_bytes,
+    least recently used files first. Unreadable or unwritable entries count as misses.
+    """
+
+    # Directory size is checked every this many writes
+    PRUNE_EVERY = 200
+
+    def __init__(self, cache_dir=None, max_entries=5000, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(*parts):
+        """
+        Returns stable hash of JSON-serializable parts, lxml elements are hashed by their XML
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, etree._Element):
+                digest.update(etree.tostring(part))
+            else:
+                digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.pickle')
+
+    def _remember(self, key, blobs):
+        self.fragments[key] = blobs
+        self.fragments.move_to_end(key)
+        while len(self.fragments) > self.max_entries:
+            self.fragments.popitem(last=False)
+
+    def get(self, key):
+        """
+        Returns fresh copies of cached elements or None
+        """
+        blobs = self.fragments.get(key)
+        if blobs is not None:
+            self.fragments.move_to_end(key)
+        elif self.cache_dir:
+            blobs = self._load(key)
+            if blobs is not None:
+                self._remember(key, blobs)
+
+        if blobs is None:
+            self.misses += 1
+            return None
+        try:
+            elements = [parse_xml(blob) for blob in blobs]
+        except Exception:
+            self.fragments.pop(key, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return elements
+
+    def _load(self, key):
+        """
+        Returns blobs stored on disk, or None when missing or unreadable
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                blobs = pickle.load(f)
+            # Modification time orders files for pruning, reads keep an entry fresh
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable fragment {key[:12]}: {str(e)}")
+            return None
+        return blobs if isinstance(blobs, list) else None
+
+    def put(self, key, elements):
+        """
+        Stores serialized copies of elements under key
+        """
+        blobs = [etree.tostring(element) for element in elements]
+        self._remember(key, blobs)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Workers rendering the same fragment write their own temp files, the last rename wins
+            fd, tmp_path = tempfile.mkstemp(prefix=f'{key}.', suffix='.tmp', dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(blobs, f)
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except OSError as e:
+            print(f"Failed to store fragment {key[:12]}: {str(e)}")
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.writes += 1
+        if self.writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """
+        Removes least recently used files until the directory fits in max_bytes
+        """
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.pickle'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        # Pruning down to 80% of the limit keeps it from running on every check
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
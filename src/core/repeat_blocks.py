@@ -0,0 +1,378 @@
+import hashlib
+import re
+from copy import deepcopy
+
+from lxml import etree
+
+from src.utils.formatting_utils import NSMAP
+
+W = NSMAP['w']
+W_P = '{%s}p' % W
+W_T = '{%s}t' % W
+W_TR = '{%s}tr' % W
+W_TC = '{%s}tc' % W
+W_R = '{%s}r' % W
+W_COLOR = '{%s}color' % W
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+# {{#name}} opens a repeated block, {{/name}} closes it
+MARKER = re.compile(r'\{\{\s*([#/])\s*(\w+)\s*\}\}')
+# {{field}} of the current item, {{.}} is the item itself
+FIELD = re.compile(r'\{\{\s*(\.|\w+)\s*\}\}')
+PLACEHOLDER = re.compile(r'\{\{.*?\}\}')
+
+# Field not found in any context, its placeholder is left for later replacements
+_MISSING = object()
+
+
+def _enclosing(element, tag):
+    """
+    Returns nearest ancestor of element with tag, or None
+    """
+    element = element.getparent()
+    while element is not None and element.tag != tag:
+        element = element.getparent()
+    return element
+
+
+def _paragraph_texts(p):
+    """
+    Returns w:t elements of paragraph, without those of paragraphs nested in it (text boxes)
+    """
+    return [t for t in p.iter(W_T) if _enclosing(t, W_P) is p]
+
+
+def _paragraph_text(p):
+    return ''.join(t.text or '' for t in _paragraph_texts(p))
+
+
+def _set_text(t, text):
+    t.text = text
+    if text != text.strip():
+        t.set(XML_SPACE, 'preserve')
+
+
+def _join_placeholders(p):
+    """
+    Moves placeholders split over several runs into the run where they start
+    """
+    texts = _paragraph_texts(p)
+    if len(texts) < 2:
+        return
+    full = ''.join(t.text or '' for t in texts)
+    if '{{' not in full:
+        return
+
+    # Index of the w:t holding each character, placeholder characters follow their first one
+    owners = []
+    for index, t in enumerate(texts):
+        owners.extend([index] * len(t.text or ''))
+    for match in PLACEHOLDER.finditer(full):
+        for position in range(match.start() + 1, match.end()):
+            owners[position] = owners[match.start()]
+
+    parts = [[] for _ in texts]
+    for char, owner in zip(full, owners):
+        parts[owner].append(char)
+    for t, part in zip(texts, parts):
+        text = ''.join(part)
+        if text != (t.text or ''):
+            _set_text(t, text)
+
+
+def _path(root, element):
+    """
+    Returns child indices leading from root to element
+    """
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def _resolve(root, path):
+    for index in path:
+        root = root[index]
+    return root
+
+
+def _lookup(stack, name):
+    """
+    Returns value of field name, looked up from the innermost item outwards
+    """
+    if name == '.':
+        return stack[-1]
+    for context in reversed(stack):
+        if isinstance(context, dict) and name in context:
+            return context[name]
+    return _MISSING
+
+
+def _format(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+def _render(segments, stack):
+    """
+    Joins literal segments (even positions) with values of fields (odd positions)
+    """
+    parts = []
+    for index, segment in enumerate(segments):
+        if index % 2 == 0:
+            parts.append(segment)
+            continue
+        value = _lookup(stack, segment)
+        parts.append('{{%s}}' % segment if value is _MISSING else _format(value))
+    return ''.join(parts)
+
+
+def _items(value):
+    """
+    Returns items a block repeats over: lists as they are, nothing for empty values, one item otherwise
+    """
+    if isinstance(value, (list, tuple)):
+        return value
+    if value is _MISSING or value is None or value is False or value == '':
+        return ()
+    return (value,)
+
+
+def _fill(root, blocks, stack):
+    """
+    Replaces elements of each block under root by filled clones of its prototype
+    """
+    # Everything is located before the first change, so compiled paths stay valid
+    targets = []
+    for block in blocks:
+        parent = _resolve(root, block.parent_path)
+        targets.append((block, parent, parent[block.start:block.start + block.count]))
+
+    for block, parent, units in targets:
+        anchor = units[0].getprevious()
+        for unit in units:
+            parent.remove(unit)
+
+        for item in _items(_lookup(stack, block.name)):
+            clone = deepcopy(block.proto)
+            texts = [(_resolve(clone, path), segments) for path, segments in block.slots]
+            item_stack = stack + [item]
+            _fill(clone, block.children, item_stack)
+            for t, segments in texts:
+                _set_text(t, _render(segments, item_stack))
+
+            # Chaining after the previous clone keeps insertion constant-time per element
+            for element in list(clone):
+                if anchor is None:
+                    parent.insert(0, element)
+                else:
+                    anchor.addnext(element)
+                anchor = element
+
+        # Table cell must keep at least one paragraph
+        if parent.tag == W_TC and parent.find(W_P) is None:
+            etree.SubElement(parent, W_P)
+
+
+class RepeatBlock:
+    """
+    Compiled {{#name}}...{{/name}} block: position of the elements it replaces
+    and the prototype cloned and filled for every item
+    """
+    __slots__ = ('name', 'parent_path', 'start', 'count', 'proto', 'slots', 'children')
+
+    def __init__(self, name, parent_path, start, count, proto, slots, children):
+        self.name = name
+        self.parent_path = parent_path
+        self.start = start
+        self.count = count
+        self.proto = proto
+        self.slots = slots
+        self.children = children
+
+
+class RepeatProgram:
+    """
+    Compiled directives of one template element.
+    run fills an element with the same XML in one pass over the data: for every item the
+    prototype is deep-copied, field texts are set through precomputed paths, and clones are
+    chained after the previous one, so time grows linearly with the number of items.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.names = {block.name for block in blocks}
+
+    def run(self, container, context):
+        """
+        Fills blocks of container with lists from context dict
+        """
+        _fill(container, self.blocks, [context])
+
+    def find_block(self, name, blocks=None):
+        """
+        Returns block with name at any depth, or None
+        """
+        for block in self.blocks if blocks is None else blocks:
+            if block.name == name:
+                return block
+            found = self.find_block(name, block.children)
+            if found is not None:
+                return found
+        return None
+
+    def first_run_color(self, name):
+        """
+        Returns color of the first run in prototype of block name, or None
+        """
+        block = self.find_block(name)
+        if block is None:
+            return None
+        run = next(block.proto.iter(W_R), None)
+        color = run.find('.//w:color', NSMAP) if run is not None else None
+        return color.get('{%s}val' % W) if color is not None else None
+
+
+class RepeatBlockCompiler:
+    """
+    Compiles {{#name}}...{{/name}} directives into RepeatProgram.
+    When both markers are in one paragraph or in paragraphs of one container (body or cell),
+    the paragraph range repeats and paragraphs holding only a marker are dropped;
+    when they are in different cells, the table rows from the opening to the closing one repeat.
+    Inside a block {{field}} takes field of the item ({{.}} the item itself) and blocks may nest.
+    Programs are cached by the XML of the element, so a template is compiled once per revision.
+    """
+
+    def __init__(self):
+        self.programs = {}
+
+    def compile(self, container):
+        """
+        Returns program for container, container itself is not modified
+        """
+        key = hashlib.sha1(etree.tostring(container)).digest()
+        program = self.programs.get(key)
+        if program is None:
+            program = self.programs[key] = RepeatProgram(self.compile_blocks(deepcopy(container)))
+        return program
+
+    def compile_blocks(self, root):
+        """
+        Returns top-level blocks under root with paths relative to it
+        """
+        for p in root.iter(W_P):
+            _join_placeholders(p)
+
+        blocks = []
+        for name, open_p, close_p in self.find_pairs(root):
+            parent, units, delimiters, rows = self.block_units(name, open_p, close_p)
+            proto = etree.Element('repeat')
+            for unit in units:
+                if unit not in delimiters:
+                    proto.append(deepcopy(unit))
+            self.strip_markers(proto, name, rows)
+
+            children = self.compile_blocks(proto)
+            blocks.append(RepeatBlock(
+                name,
+                _path(root, parent),
+                parent.index(units[0]),
+                len(units),
+                proto,
+                self.find_slots(proto, children),
+                children
+            ))
+        return blocks
+
+    def find_pairs(self, root):
+        """
+        Returns (name, opening paragraph, closing paragraph) of top-level blocks in document order
+        """
+        stack = []
+        pairs = []
+        for p in root.iter(W_P):
+            for match in MARKER.finditer(_paragraph_text(p)):
+                kind, name = match.groups()
+                if kind == '#':
+                    stack.append((name, p))
+                    continue
+                if not stack or stack[-1][0] != name:
+                    raise ValueError(f"Unexpected {{{{/{name}}}}} in template")
+                _, open_p = stack.pop()
+                if not stack:
+                    pairs.append((name, open_p, p))
+        if stack:
+            raise ValueError(f"{{{{#{stack[-1][0]}}}}} is not closed in template")
+        return pairs
+
+    def block_units(self, name, open_p, close_p):
+        """
+        Returns (parent, repeated elements, marker-only paragraphs among them, whether rows repeat)
+        """
+        if open_p.getparent() is close_p.getparent():
+            units = self.sibling_range(open_p, close_p)
+            delimiters = set()
+            if open_p is not close_p:
+                for p in (open_p, close_p):
+                    if not MARKER.sub('', _paragraph_text(p)).strip():
+                        delimiters.add(p)
+            return open_p.getparent(), units, delimiters, False
+
+        open_tr = _enclosing(open_p, W_TR)
+        close_tr = _enclosing(close_p, W_TR)
+        if open_tr is None or close_tr is None or open_tr.getparent() is not close_tr.getparent():
+            raise ValueError(f"{{{{#{name}}}}} and {{{{/{name}}}}} must be in one paragraph range or in rows of one table")
+        return open_tr.getparent(), self.sibling_range(open_tr, close_tr), set(), True
+
+    def sibling_range(self, first, last):
+        elements = [first]
+        while elements[-1] is not last:
+            element = elements[-1].getnext()
+            if element is None:
+                raise ValueError("Block markers are out of order in template")
+            elements.append(element)
+        return elements
+
+    def strip_markers(self, proto, name, rows):
+        """
+        Removes the block's own markers from its prototype
+        """
+        opening = None
+        closing = None
+        for t in proto.iter(W_T):
+            for match in MARKER.finditer(t.text or ''):
+                if match.groups() == ('#', name) and opening is None:
+                    opening = (t, match)
+                elif match.groups() == ('/', name):
+                    closing = (t, match)
+
+        # Closing marker first, so the opening one keeps its offsets when both share a run
+        for t, match in [marker for marker in (closing, opening) if marker is not None]:
+            _set_text(t, t.text[:match.start()] + t.text[match.end():])
+            p = _enclosing(t, W_P)
+            # In repeated rows a paragraph left empty by the marker goes, unless it is the last of its cell
+            if rows and p is not None and not _paragraph_text(p).strip() and len(p.getparent().findall(W_P)) > 1:
+                p.getparent().remove(p)
+
+    def find_slots(self, proto, children):
+        """
+        Returns (path, segments) of texts with fields, skipping those of nested blocks
+        """
+        nested = set()
+        for child in children:
+            parent = _resolve(proto, child.parent_path)
+            nested.update(parent[child.start:child.start + child.count])
+
+        slots = []
+        for t in proto.iter(W_T):
+            if not t.text or not FIELD.search(t.text):
+                continue
+            if any(ancestor in nested for ancestor in t.iterancestors()):
+                continue
+            slots.append((_path(proto, t), tuple(FIELD.split(t.text))))
+        return slots
@@ -0,0 +1,187 @@
+import re
+
+# MM.YYYY, the format _parse_period and the matrix year calculation expect
+PERIOD_DATE_RE = re.compile(r'^(0[1-9]|1[0-2])\.(\d{4})$')
+# Same break TemplateProcessor.split_introduction splits on
+SENTENCE_BREAK_RE = re.compile(r'(?<!\d)\.(?!\d)')
+
+STRING_LIST = {'type': list, 'items': {'type': str}}
+
+CANDIDATE_SCHEMA = {
+    'type': dict,
+    'required': ['personal_info', 'skills', 'projects'],
+    'properties': {
+        # Optional stable ID, key of the candidate's document in the registry
+        'id': {'type': str, 'non_empty': True},
+        'personal_info': {
+            'type': dict,
+            'required': ['name', 'title'],
+            'properties': {
+                'name': {'type': str, 'non_empty': True},
+                'title': {'type': str}
+            }
+        },
+        'skills': {
+            'type': dict,
+            'required': ['basic_information', 'introduction', 'skills'],
+            'properties': {
+                'basic_information': {
+                    'type': dict,
+                    'required': ['education', 'languages', 'domains'],
+                    'properties': {
+                        'education': {'type': str},
+                        'languages': STRING_LIST,
+                        'domains': STRING_LIST
+                    }
+                },
+                'introduction': {'type': str, 'check': 'introduction'},
+                'skills': {
+                    'type': dict,
+                    'values': {'type': (list, str), 'items': {'type': str}}
+                }
+            }
+        },
+        'projects': {
+            'type': list,
+            'items': {
+                'type': dict,
+                'required': ['name', 'period'],
+                'properties': {
+                    'name': {'type': str, 'non_empty': True},
+                    'description': {'type': str},
+                    'role': {'type': str},
+                    'period': {
+                        'type': dict,
+                        'required': ['start', 'end'],
+                        'properties': {
+                            'start': {'type': str, 'check': 'period_date'},
+                            'end': {'type': str, 'check': 'period_end'}
+                        },
+                        'check': 'period_order'
+                    },
+                    'responsibilities': STRING_LIST,
+                    'environment': STRING_LIST
+                }
+            }
+        }
+    }
+}
+
+
+class CandidateValidationError(Exception):
+    """
+    Raised for candidate data that does not match template.json schema
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Invalid candidate data:\n" + "\n".join(f"  {error}" for error in errors))
+
+
+def _type_name(expected):
+    names = {dict: 'object', list: 'array', str: 'string'}
+    if isinstance(expected, tuple):
+        return ' or '.join(names[item] for item in expected)
+    return names[expected]
+
+
+def _period_key(value):
+    match = PERIOD_DATE_RE.match(value)
+    return (int(match.group(2)), int(match.group(1))) if match else None
+
+
+def _check_period_date(value, path, errors):
+    if not PERIOD_DATE_RE.match(value):
+        errors.append(f"{path}: expected MM.YYYY, got {value!r}")
+
+
+def _check_period_end(value, path, errors):
+    if value != 'present':
+        _check_period_date(value, path, errors)
+
+
+def _check_period_order(value, path, errors):
+    start = _period_key(value.get('start', '')) if isinstance(value.get('start'), str) else None
+    end = value.get('end')
+    if start is None or end == 'present' or not isinstance(end, str) or _period_key(end) is None:
+        return
+    if _period_key(end) < start:
+        errors.append(f"{path}: end {end} is before start {value['start']}")
+
+
+def _check_introduction(value, path, errors):
+    match = SENTENCE_BREAK_RE.search(value)
+    if not match or not value[match.end():].strip():
+        errors.append(f"{path}: needs at least two sentences, it is split into two blocks by the first period")
+
+
+CHECKS = {
+    'period_date': _check_period_date,
+    'period_end': _check_period_end,
+    'period_order': _check_period_order,
+    'introduction': _check_introduction
+}
+
+
+class SchemaValidator:
+    """
+    Validates candidate data against a schema compiled once into nested check functions,
+    so validating many candidates does not re-interpret the schema for each of them.
+    """
+
+    def __init__(self, schema=CANDIDATE_SCHEMA):
+        self._check = self._compile(schema)
+
+    def _compile(self, schema):
+        """
+        Turns schema node into function (value, path, errors)
+        """
+        expected = schema['type']
+        type_name = _type_name(expected)
+        non_empty = schema.get('non_empty', False)
+        required = schema.get('required', [])
+        properties = {key: self._compile(node) for key, node in schema.get('properties', {}).items()}
+        values = self._compile(schema['values']) if 'values' in schema else None
+        items = self._compile(schema['items']) if 'items' in schema else None
+        custom = CHECKS[schema['check']] if 'check' in schema else None
+
+        def check(value, path, errors):
+            if not isinstance(value, expected):
+                errors.append(f"{path or '<root>'}: expected {type_name}, got {type(value).__name__}")
+                return
+            if non_empty and not value.strip():
+                errors.append(f"{path}: must not be empty")
+            if isinstance(value, dict):
+                for key in required:
+                    if key not in value:
+                        errors.append(f"{f'{path}.{key}' if path else key}: required field is missing")
+                for key, item in value.items():
+                    item_path = f"{path}.{key}" if path else key
+                    if key in properties:
+                        properties[key](item, item_path, errors)
+                    elif values is not None:
+                        values(item, item_path, errors)
+            elif isinstance(value, list) and items is not None:
+                for index, item in enumerate(value):
+                    items(item, f"{path}[{index}]", errors)
+            if custom is not None:
+                custom(value, path, errors)
+
+        return check
+
+    def validate(self, data):
+        """
+        Returns list of errors with paths like projects[2].period.start, empty for valid data
+        """
+        errors = []
+        self._check(data, '', errors)
+        return errors
+
+    def ensure_valid(self, data):
+        """
+        Raises CandidateValidationError if data is invalid
+        """
+        errors = self.validate(data)
+        if errors:
+            raise CandidateValidationError(errors)
+        return data
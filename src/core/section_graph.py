@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from src.core.render_cache import FragmentCache
+from src.utils.tracing import Tracer
+
+# Per-process state filled once by the pool initializer
+_worker_state = {}
+
+
+def _init_section_worker(trace_enabled=False, fragment_cache_dir=None, fragment_cache=False, workspace_options=None):
+    """
+    Pool initializer: creates document processor reused by every section rendered in this worker
+    """
+    # document_processor imports this module, import it only inside the worker
+    from src.core.document_processor import DocumentProcessor
+
+    cache = FragmentCache(fragment_cache_dir) if fragment_cache else None
+    _worker_state['processor'] = DocumentProcessor(
+        Tracer(enabled=trace_enabled), cache, workspace_options=workspace_options
+    )
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_section(name, method, args):
+    """
+    Runs section method of the worker's processor.
+    Returns (result, spans), spans travel back to the parent together with the result.
+    """
+    processor = _worker_state['processor']
+    try:
+        with processor.tracer.span(name, worker=os.getpid()):
+            result = getattr(processor, method)(*args)
+    finally:
+        # Worker outlives the candidate, drop prototypes pointing into its trees
+        processor.template_processor.formatting_utils.release_prototypes()
+    return result, processor.tracer.drain()
+
+
+def create_section_pool(processor, workers=3):
+    """
+    Creates process pool rendering sections for processor, with workers already started.
+    Workers mirror its tracing and fragment cache settings (an in-memory cache stays per worker).
+    """
+    fragment_cache = processor.fragment_cache
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_section_worker,
+        initargs=(
+            processor.tracer.recording,
+            fragment_cache.cache_dir if fragment_cache is not None else None,
+            fragment_cache is not None,
+            processor.workspace_options
+        )
+    )
+    # Start workers now, before the caller spawns threads of its own
+    for future in [pool.submit(_ping) for _ in range(workers)]:
+        future.result()
+    return pool
+
+
+class SectionGraph:
+    """
+    Small dependency-graph executor for the sections of one document.
+    A section runs once all sections it depends on are done. Independent sections run
+    concurrently on the process pool; local sections, and all sections when there is
+    no pool, run in the calling process.
+    """
+
+    def __init__(self, processor, pool=None):
+        self.processor = processor
+        self.pool = pool
+        self.sections = {}
+
+    def add(self, name, method, *args, after=(), local=False):
+        """
+        Adds section computed by processor method, results of the sections in after are appended to args.
+        Arguments and results of pooled sections must be picklable.
+        """
+        self.sections[name] = (method, args, tuple(after), local)
+
+    def run(self):
+        """
+        Runs all sections, returns dict of results by section name
+        """
+        tracer = self.processor.tracer
+        results = {}
+        waiting = dict(self.sections)
+        pending = {}
+        try:
+            while waiting or pending:
+                ready = [name for name, section in waiting.items() if all(dep in results for dep in section[2])]
+                if not ready and not pending:
+                    raise ValueError(f"Sections with unknown or circular dependencies: {', '.join(waiting)}")
+
+                local = []
+                for name in ready:
+                    method, args, after, is_local = waiting.pop(name)
+                    args = args + tuple(results[dep] for dep in after)
+                    if self.pool is None or is_local:
+                        local.append((name, method, args))
+                    else:
+                        pending[self.pool.submit(_run_section, name, method, args)] = name
+
+                # Pooled sections are already running while local ones take the calling process
+                for name, method, args in local:
+                    with tracer.span(name):
+                        results[name] = getattr(self.processor, method)(*args)
+                if local:
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    results[name], spans = future.result()
+                    tracer.extend(spans)
+        finally:
+            for future in pending:
+                future.cancel()
+        return results
@@ -3,7 +3,7 @@ from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.shared import Pt
 from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import re
 from config.config import Config
 
@@ -11,9 +11,10 @@ from config.config import Config
 class SkillsMatrixProcessor:
     """Отвечает за все манипуляции с .docx файлом, включая обновление таблицы."""
 
-    def __init__(self):
+    def __init__(self, fragment_cache=None):
         self.border_color = Config.BORDER_COLOR
         self.border_size = Config.BORDER_SIZE
+        self.fragment_cache = fragment_cache
 
     def _set_cell_border(self, cell, **kwargs):
         """Устанавливает или удаляет границы ячейки."""
@@ -148,14 +149,45 @@ class SkillsMatrixProcessor:
         cat_tmpl = self.table.rows[1].cells[0].paragraphs[0]
         data_tmpls = [c.paragraphs[0] for c in self.table.rows[1].cells[1:]]
 
+        # Отпечаток шаблонной строки делает кэш недействительным при изменении шаблона
+        tmpl_fingerprint = None
+        if self.fragment_cache is not None:
+            tmpl_fingerprint = self.fragment_cache.fingerprint(self.table.rows[1]._tr, self.border_color, self.border_size)
+
         while len(self.table.rows) > 1:
             self.table._tbl.remove(self.table.rows[-1]._tr)
 
-        cat_start_row_idx = -1
-        for i, row_vals in enumerate(data):
+        for block in self._split_categories(data):
+            cache_key = None
+            if self.fragment_cache is not None:
+                cache_key = self.fragment_cache.fingerprint('matrix_category', tmpl_fingerprint, block)
+                cached = self.fragment_cache.get(cache_key)
+                if cached is not None:
+                    self.table._tbl.extend(cached)
+                    continue
+
+            rows = self._add_category_rows(block, cat_tmpl, data_tmpls)
+            if cache_key is not None:
+                self.fragment_cache.put(cache_key, [row._tr for row in rows])
+
+    @staticmethod
+    def _split_categories(data: List[List[str]]) -> List[List[List[str]]]:
+        """Разбивает строки таблицы на блоки категорий (строка с названием + продолжения)."""
+        blocks = []
+        for row_vals in data:
+            if row_vals[0] or not blocks:
+                blocks.append([])
+            blocks[-1].append(row_vals)
+        return blocks
+
+    def _add_category_rows(self, block: List[List[str]], cat_tmpl, data_tmpls):
+        """Добавляет строки одной категории, объединяет ячейку категории и рисует нижнюю границу."""
+        rows = []
+        for row_vals in block:
             is_new_category = bool(row_vals[0])
             new_row = self.table.add_row()
             self._cant_split_row(new_row)
+            rows.append(new_row)
 
             for idx, cell in enumerate(new_row.cells):
                 tmpl = cat_tmpl if idx == 0 else data_tmpls[idx-1]
@@ -180,28 +212,19 @@ class SkillsMatrixProcessor:
                 
                 self._set_cell_border(cell, top={"val": "nil"}, bottom={"val": "nil"}, left={"val": "nil"}, right={"val": "nil"})
 
-            if is_new_category:
-                if cat_start_row_idx != -1:
-                    end_row_idx = len(self.table.rows) - 2
-                    a, b = self.table.cell(cat_start_row_idx, 0), self.table.cell(end_row_idx, 0)
-                    if a != b: a.merge(b)
-                    for cell in self.table.rows[end_row_idx].cells:
-                        self._set_cell_border(cell, bottom={'sz': self.border_size, 'val': 'single', 'color': self.border_color})
-                cat_start_row_idx = len(self.table.rows) - 1
-
-        if cat_start_row_idx != -1:
-            end_row_idx = len(self.table.rows) - 1
-            a, b = self.table.cell(cat_start_row_idx, 0), self.table.cell(end_row_idx, 0)
-            if a != b: a.merge(b)
-            for cell in self.table.rows[end_row_idx].cells:
-                self._set_cell_border(cell, bottom={'sz': self.border_size, 'val': 'single', 'color': self.border_color})
-        
+        a, b = rows[0].cells[0], rows[-1].cells[0]
+        if a != b: a.merge(b)
+        for cell in rows[-1].cells:
+            self._set_cell_border(cell, bottom={'sz': self.border_size, 'val': 'single', 'color': self.border_color})
+        return rows
 
-    def create_skills_matrix(self, template_doc_path: str, output_path: str, template_data: Dict) -> bool:
+    def create_skills_matrix(self, template_doc_path: str, output_path: str, template_data: Dict,
+                             table_data: Optional[List[List[str]]] = None) -> bool:
         """Creates skills matrix document based on template"""
         try:
-            # Get data for table
-            table_data = self.get_skills_matrix_data(template_data)
+            # Строки таблицы, если они не подготовлены заранее
+            if table_data is None:
+                table_data = self.get_skills_matrix_data(template_data)
             
             # Open template document
             doc = Document(template_doc_path)
@@ -217,4 +240,8 @@ class SkillsMatrixProcessor:
 
         except Exception as e:
             print(f"Error creating skills matrix: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+
+        finally:
+            # Не держим дерево документа между кандидатами
+            self.table = None 
\ No newline at end of file
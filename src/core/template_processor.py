@@ -4,12 +4,15 @@ from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from copy import deepcopy
 from src.utils.formatting_utils import FormattingUtils
+from src.core.repeat_blocks import RepeatBlockCompiler
 import re
 from lxml import etree
 
 class TemplateProcessor:
-    def __init__(self):
+    def __init__(self, fragment_cache=None):
         self.formatting_utils = FormattingUtils()
+        self.fragment_cache = fragment_cache
+        self.repeat_blocks = RepeatBlockCompiler()
 
     def load_template_data(self, json_path):
         """
@@ -30,6 +33,89 @@ class TemplateProcessor:
             return first_part, second_part
         return intro_text, ""
 
+    def prepare_text(self, template_data):
+        """
+        Returns texts of maininfo derived from template data: introduction parts,
+        placeholder replacements and (key, values, header, value) of each skills section
+        """
+        intro_part1, intro_part2 = self.split_introduction(template_data['skills']['introduction'])
+        basic_info = template_data['skills']['basic_information']
+
+        skills_sections = []
+        for key, values_list in template_data['skills']['skills'].items():
+            if key == 'introduction':
+                continue
+
+            # Format header
+            header = key.replace('_', ' ').title()
+
+            # Format values
+            if isinstance(values_list, list):
+                value = ', '.join(str(item) for item in values_list)
+            else:
+                value = str(values_list)
+
+            # Add period at the end if not present
+            if not value.endswith('.'):
+                value = value + '.'
+            skills_sections.append((key, values_list, header, value))
+
+        return {
+            'intro': (intro_part1, intro_part2),
+            'replacements': {
+                '{{NAME}}': template_data['personal_info']['name'],
+                '{{TITLE}}': template_data['personal_info']['title'],
+                '{{EDUCATION_TEMPLATE}}': basic_info['education'],
+                '{{LANGUAGES}}': self.format_skills_list(basic_info['languages']),
+                '{{DOMAINS_TEMPLATE}}': self.format_domains_list(basic_info['domains'])
+            },
+            'skills_sections': skills_sections
+        }
+
+    def project_texts(self, project):
+        """
+        Returns texts of one project row as they are inserted into the document
+        """
+        responsibilities = project.get('responsibilities', [])
+        if not isinstance(responsibilities, list):
+            responsibilities = []
+
+        # Environment as comma-separated string with period at end
+        environment = self.format_value(project.get('environment', ''))
+        if not environment.endswith('.'):
+            environment += '.'
+
+        return {
+            'name': str(project.get('name', '')),
+            'description': str(project.get('description', '')),
+            'role': self.format_value(project.get('role', '')),
+            'period': self.format_value(project.get('period', '')),
+            # Semicolon for all items except last one, which gets a period
+            'responsibilities': [
+                str(resp) + (';' if i < len(responsibilities) - 1 else '.')
+                for i, resp in enumerate(responsibilities)
+            ],
+            'environment': environment
+        }
+
+    def block_context(self, template_data, text):
+        """
+        Returns lists and fields available to {{#name}}...{{/name}} blocks of maininfo
+        """
+        basic_info = template_data['skills']['basic_information']
+        return {
+            'name': template_data['personal_info']['name'],
+            'title': template_data['personal_info']['title'],
+            'education': basic_info['education'],
+            'languages': basic_info['languages'],
+            'domains': basic_info['domains'],
+            'skills': [
+                {'key': key, 'header': header, 'value': value}
+                for key, _, header, value in text['skills_sections']
+            ],
+            'projects': [self.project_texts(project) for project in template_data.get('projects', [])]
+        }
+
     def replace_text_preserve_format(self, paragraph, old_text, new_text):
         """
         Replaces text in paragraph while preserving formatting of each run.
@@ -37,26 +123,11 @@ class TemplateProcessor:
         if not old_text in paragraph.text:
             return False
         
-        # Collect all runs and their formatting
-        runs_with_text = []
-        current_text = ""
-        
-        for run in paragraph.runs:
-            current_text += run.text
-            runs_with_text.append({
-                'run': run,
-                'text': run.text,
-                'start': len(current_text) - len(run.text),
-                'end': len(current_text),
-                'format': {
-                    'bold': run.bold,
-                    'italic': run.italic,
-                    'underline': run.underline,
-                    'font': run.font.name if run.font.name else None,
-                    'size': run.font.size if run.font.size else None,
-                    'color': run.font.color.rgb if run.font.color and run.font.color.rgb else None
-                }
-            })
+        # Collect text of all runs with their shared format snapshots
+        runs_with_text = [
+            (run.text, self.formatting_utils.run_format(run._r))
+            for run in paragraph.runs
+        ]
         
         # Find old text position
         old_text_start = paragraph.text.index(old_text)
@@ -66,40 +137,39 @@ class TemplateProcessor:
         new_runs = []
         current_pos = 0
         
-        for run_info in runs_with_text:
+        for run_text, run_format in runs_with_text:
             if current_pos >= old_text_end:
                 # After replacement - copy as is
-                new_runs.append((run_info['text'], run_info['format']))
-            elif current_pos + len(run_info['text']) <= old_text_start:
+                new_runs.append((run_text, run_format))
+            elif current_pos + len(run_text) <= old_text_start:
                 # Before replacement - copy as is
-                new_runs.append((run_info['text'], run_info['format']))
+                new_runs.append((run_text, run_format))
             else:
                 # During replacement
                 if current_pos < old_text_start:
                     # Part before replacement
-                    prefix = run_info['text'][:old_text_start - current_pos]
+                    prefix = run_text[:old_text_start - current_pos]
                     if prefix:
-                        new_runs.append((prefix, run_info['format']))
+                        new_runs.append((prefix, run_format))
                 
                 # Replaced part
-                if current_pos <= old_text_start and current_pos + len(run_info['text']) >= old_text_end:
-                    new_runs.append((new_text, run_info['format']))
+                if current_pos <= old_text_start and current_pos + len(run_text) >= old_text_end:
+                    new_runs.append((new_text, run_format))
                 
-                if current_pos + len(run_info['text']) > old_text_end:
+                if current_pos + len(run_text) > old_text_end:
                     # Part after replacement
-                    suffix = run_info['text'][old_text_end - current_pos:]
+                    suffix = run_text[old_text_end - current_pos:]
                     if suffix:
-                        new_runs.append((suffix, run_info['format']))
+                        new_runs.append((suffix, run_format))
             
-            current_pos += len(run_info['text'])
+            current_pos += len(run_text)
         
         # Clear paragraph
         paragraph.clear()
         
         # Add new runs
-        for text, format_info in new_runs:
-            run = paragraph.add_run(text)
-            self.formatting_utils.apply_format_to_run(run, format_info)
+        for text, run_format in new_runs:
+            run_format.apply(paragraph.add_run(text)._r)
         
         return True
 
@@ -183,29 +253,11 @@ class TemplateProcessor:
             if '{{SKILLS_KEY}}' in paragraph.text:
                 key_para = paragraph
                 if paragraph.runs:
-                    key_format = {
-                        'bold': paragraph.runs[0].bold,
-                        'italic': paragraph.runs[0].italic,
-                        'underline': paragraph.runs[0].underline,
-                        'font': paragraph.runs[0].font.name if paragraph.runs[0].font.name else None,
-                        'size': paragraph.runs[0].font.size if paragraph.runs[0].font.size else None,
-                        'color': paragraph.runs[0].font.color.rgb if paragraph.runs[0].font.color and paragraph.runs[0].font.color.rgb else None,
-                        'alignment': paragraph.alignment,
-                        'style': paragraph.style
-                    }
+                    key_format = self.formatting_utils.run_format(paragraph.runs[0]._r, paragraph._p)
             elif '{{SKILLS_VALUE}}' in paragraph.text:
                 value_para = paragraph
                 if paragraph.runs:
-                    value_format = {
-                        'bold': paragraph.runs[0].bold,
-                        'italic': paragraph.runs[0].italic,
-                        'underline': paragraph.runs[0].underline,
-                        'font': paragraph.runs[0].font.name if paragraph.runs[0].font.name else None,
-                        'size': paragraph.runs[0].font.size if paragraph.runs[0].font.size else None,
-                        'color': paragraph.runs[0].font.color.rgb if paragraph.runs[0].font.color and paragraph.runs[0].font.color.rgb else None,
-                        'alignment': paragraph.alignment,
-                        'style': paragraph.style
-                    }
+                    value_format = self.formatting_utils.run_format(paragraph.runs[0]._r, paragraph._p)
         
         return key_para, value_para, key_format, value_format
 
@@ -226,9 +278,10 @@ class TemplateProcessor:
                 return deepcopy(para._element), None
         return None, None
 
-    def process_projects_template(self, doc, template_data):
+    def process_projects_template(self, doc, template_data, project_texts=None):
         """
-        Fills projects template with data from template.json
+        Fills projects template with data from template.json.
+        project_texts are texts of each project prepared by project_texts, computed here when not given.
         """
         projects = template_data.get('projects', [])
         if not projects:
@@ -241,6 +294,16 @@ class TemplateProcessor:
                 p.getparent().remove(p)
                 break
 
+        if project_texts is None:
+            project_texts = [self.project_texts(project) for project in projects]
+
+        # Table with {{#projects}}...{{/projects}} directive is filled by its compiled program
+        for table in doc.tables:
+            program = self.repeat_blocks.compile(table._tbl)
+            if 'projects' in program.names:
+                program.run(table._tbl, {'projects': project_texts})
+                return True, program.first_run_color('responsibilities')
+
         # Find table with project placeholders
         template_table = None
         template_row = None
@@ -308,130 +371,147 @@ class TemplateProcessor:
             row_element = template_table.rows[0]._element
             row_element.getparent().remove(row_element)
 
+        # Template fingerprint makes cached rows invalid once the template row changes
+        row_fingerprint = None
+        if self.fragment_cache is not None:
+            row_fingerprint = self.fragment_cache.fingerprint(template_row_element)
+
         # Add rows for each project
-        for project in projects:
+        for project, texts in zip(projects, project_texts):
+            cache_key = None
+            if self.fragment_cache is not None:
+                cache_key = self.fragment_cache.fingerprint('project_row', row_fingerprint, project)
+                cached = self.fragment_cache.get(cache_key)
+                if cached is not None:
+                    template_table._element.extend(cached)
+                    continue
+
             # Create new row from template
             new_row_element = deepcopy(template_row_element)
             template_table._element.append(new_row_element)
             new_row = template_table.rows[-1]
+            self.fill_project_row(new_row, template_formats, texts)
 
-            # Fill first cell (name and description)
-            cell = new_row.cells[0]
-            cell._element.clear_content()
-
-            # Project name
-            name_para = cell.add_paragraph()
-            if template_formats.get('name'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['name']['element'], name_para._element)
-                if template_formats['name']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['name']['element'], name_para._element)
-                name_run = name_para.add_run(str(project.get('name', '')))
-                if template_formats['name']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['name']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], name_run._element)
-
-            # Project description
-            desc_para = cell.add_paragraph()
-            if template_formats.get('description'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['description']['element'], desc_para._element)
-                if template_formats['description']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['description']['element'], desc_para._element)
-                desc_run = desc_para.add_run(str(project.get('description', '')))
-                if template_formats['description']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['description']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], desc_run._element)
-
-            # Fill second cell (details)
-            cell = new_row.cells[1]
-            cell._element.clear_content()
-
-            # Roles (header)
-            roles_header = cell.add_paragraph()
-            if template_formats.get('roles_header'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['roles_header']['element'], roles_header._element)
-                if template_formats['roles_header']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['roles_header']['element'], roles_header._element)
-                roles_header_run = roles_header.add_run("Project roles")
-                if template_formats['roles_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['roles_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], roles_header_run._element)
-
-            # Roles (value)
-            roles_value = cell.add_paragraph()
-            if template_formats.get('roles_value'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['roles_value']['element'], roles_value._element)
-                if template_formats['roles_value']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['roles_value']['element'], roles_value._element)
-                roles_run = roles_value.add_run(self.format_value(project.get('role', '')))
-                if template_formats['roles_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['roles_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], roles_run._element)
-
-            # Period (header)
-            period_header = cell.add_paragraph()
-            if template_formats.get('period_header'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['period_header']['element'], period_header._element)
-                if template_formats['period_header']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['period_header']['element'], period_header._element)
-                period_header_run = period_header.add_run("Period")
-                if template_formats['period_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['period_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], period_header_run._element)
-
-            # Period (value)
-            period_value = cell.add_paragraph()
-            if template_formats.get('period_value'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['period_value']['element'], period_value._element)
-                if template_formats['period_value']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['period_value']['element'], period_value._element)
-                period_run = period_value.add_run(self.format_value(project.get('period', '')))
-                if template_formats['period_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['period_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], period_run._element)
-
-            # Responsibilities (header)
-            resp_header = cell.add_paragraph()
-            if template_formats.get('resp_header'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['resp_header']['element'], resp_header._element)
-                if template_formats['resp_header']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['resp_header']['element'], resp_header._element)
-                resp_header_run = resp_header.add_run("Responsibilities")
-                if template_formats['resp_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['resp_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], resp_header_run._element)
-
-            # Responsibilities (values)
-            responsibilities = project.get('responsibilities', [])
-            if isinstance(responsibilities, list):
-                for i, resp in enumerate(responsibilities):
-                    resp_value = cell.add_paragraph()
-                    if template_formats.get('resp_value'):
-                        # Copy paragraph and list formatting
-                        self.formatting_utils.copy_paragraph_format_with_ns(template_formats['resp_value']['element'], resp_value._element)
-                        if template_formats['resp_value']['is_list']:
-                            self.formatting_utils.copy_list_properties(template_formats['resp_value']['element'], resp_value._element)
-                        # Add semicolon for all items except last one, which gets a period
-                        resp_text = str(resp) + (';' if i < len(responsibilities) - 1 else '.')
-                        resp_run = resp_value.add_run(resp_text)
-                        if template_formats['resp_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                            self.formatting_utils.copy_run_format_with_ns(template_formats['resp_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], resp_run._element)
-
-            # Environment (header)
-            env_header = cell.add_paragraph()
-            if template_formats.get('env_header'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['env_header']['element'], env_header._element)
-                if template_formats['env_header']['is_list']:
-                    self.formatting_utils.copy_list_properties(template_formats['env_header']['element'], env_header._element)
-                env_header_run = env_header.add_run("Environment")
-                if template_formats['env_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['env_header']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], env_header_run._element)
-
-            # Environment (value) - format as comma-separated string and add period at end
-            env_value = cell.add_paragraph()
-            if template_formats.get('env_value'):
-                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['env_value']['element'], env_value._element)
-                env_text = self.format_value(project.get('environment', ''))
-                if not env_text.endswith('.'):
-                    env_text += '.'
-                env_run = env_value.add_run(env_text)
-                if template_formats['env_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap):
-                    self.formatting_utils.copy_run_format_with_ns(template_formats['env_value']['element'].findall('.//w:r', namespaces=self.formatting_utils.nsmap)[0], env_run._element)
+            if cache_key is not None:
+                self.fragment_cache.put(cache_key, [new_row_element])
+
+        # Prototypes belong to this template, release them with it
+        self.formatting_utils.release_prototypes()
 
         return True, template_formats.get('resp_value', {}).get('bullet_color')
 
+    def fill_project_row(self, new_row, template_formats, texts):
+        """
+        Fills cloned template row with texts of one project
+        """
+        # Fill first cell (name and description)
+        cell = new_row.cells[0]
+        cell._element.clear_content()
+
+        # Project name
+        name_para = cell.add_paragraph()
+        if template_formats.get('name'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['name']['element'], name_para._element)
+            if template_formats['name']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['name']['element'], name_para._element)
+            name_run = name_para.add_run(texts['name'])
+            if self.formatting_utils.first_run(template_formats['name']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['name']['element']), name_run._element)
+
+        # Project description
+        desc_para = cell.add_paragraph()
+        if template_formats.get('description'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['description']['element'], desc_para._element)
+            if template_formats['description']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['description']['element'], desc_para._element)
+            desc_run = desc_para.add_run(texts['description'])
+            if self.formatting_utils.first_run(template_formats['description']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['description']['element']), desc_run._element)
+
+        # Fill second cell (details)
+        cell = new_row.cells[1]
+        cell._element.clear_content()
+
+        # Roles (header)
+        roles_header = cell.add_paragraph()
+        if template_formats.get('roles_header'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['roles_header']['element'], roles_header._element)
+            if template_formats['roles_header']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['roles_header']['element'], roles_header._element)
+            roles_header_run = roles_header.add_run("Project roles")
+            if self.formatting_utils.first_run(template_formats['roles_header']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['roles_header']['element']), roles_header_run._element)
+
+        # Roles (value)
+        roles_value = cell.add_paragraph()
+        if template_formats.get('roles_value'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['roles_value']['element'], roles_value._element)
+            if template_formats['roles_value']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['roles_value']['element'], roles_value._element)
+            roles_run = roles_value.add_run(texts['role'])
+            if self.formatting_utils.first_run(template_formats['roles_value']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['roles_value']['element']), roles_run._element)
+
+        # Period (header)
+        period_header = cell.add_paragraph()
+        if template_formats.get('period_header'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['period_header']['element'], period_header._element)
+            if template_formats['period_header']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['period_header']['element'], period_header._element)
+            period_header_run = period_header.add_run("Period")
+            if self.formatting_utils.first_run(template_formats['period_header']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['period_header']['element']), period_header_run._element)
+
+        # Period (value)
+        period_value = cell.add_paragraph()
+        if template_formats.get('period_value'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['period_value']['element'], period_value._element)
+            if template_formats['period_value']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['period_value']['element'], period_value._element)
+            period_run = period_value.add_run(texts['period'])
+            if self.formatting_utils.first_run(template_formats['period_value']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['period_value']['element']), period_run._element)
+
+        # Responsibilities (header)
+        resp_header = cell.add_paragraph()
+        if template_formats.get('resp_header'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['resp_header']['element'], resp_header._element)
+            if template_formats['resp_header']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['resp_header']['element'], resp_header._element)
+            resp_header_run = resp_header.add_run("Responsibilities")
+            if self.formatting_utils.first_run(template_formats['resp_header']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['resp_header']['element']), resp_header_run._element)
+
+        # Responsibilities (values)
+        for resp_text in texts['responsibilities']:
+            resp_value = cell.add_paragraph()
+            if template_formats.get('resp_value'):
+                # Copy paragraph and list formatting
+                self.formatting_utils.copy_paragraph_format_with_ns(template_formats['resp_value']['element'], resp_value._element)
+                if template_formats['resp_value']['is_list']:
+                    self.formatting_utils.copy_list_properties(template_formats['resp_value']['element'], resp_value._element)
+                resp_run = resp_value.add_run(resp_text)
+                if self.formatting_utils.first_run(template_formats['resp_value']['element']) is not None:
+                    self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['resp_value']['element']), resp_run._element)
+
+        # Environment (header)
+        env_header = cell.add_paragraph()
+        if template_formats.get('env_header'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['env_header']['element'], env_header._element)
+            if template_formats['env_header']['is_list']:
+                self.formatting_utils.copy_list_properties(template_formats['env_header']['element'], env_header._element)
+            env_header_run = env_header.add_run("Environment")
+            if self.formatting_utils.first_run(template_formats['env_header']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['env_header']['element']), env_header_run._element)
+
+        # Environment (value)
+        env_value = cell.add_paragraph()
+        if template_formats.get('env_value'):
+            self.formatting_utils.copy_paragraph_format_with_ns(template_formats['env_value']['element'], env_value._element)
+            env_run = env_value.add_run(texts['environment'])
+            if self.formatting_utils.first_run(template_formats['env_value']['element']) is not None:
+                self.formatting_utils.copy_run_format_with_ns(self.formatting_utils.first_run(template_formats['env_value']['element']), env_run._element)
+
     def format_value(self, value):
         """
         Formats value for document insertion
@@ -444,26 +524,24 @@ class TemplateProcessor:
             return ', '.join(str(item) for item in value)
         return str(value)
 
-    def process_document_with_template(self, doc_path, template_data, key_format=None, value_format=None):
+    def process_document_with_template(self, doc_path, template_data, key_format=None, value_format=None, text=None):
         """
-        Processes document, replacing placeholders with template data
+        Processes document, replacing placeholders with template data.
+        text is prepared by prepare_text, computed here when not given.
         """
         doc = Document(doc_path)
+        if text is None:
+            text = self.prepare_text(template_data)
         
-        # Get introduction parts
-        intro_part1, intro_part2 = self.split_introduction(template_data['skills']['introduction'])
+        # Repeat {{#name}}...{{/name}} blocks first, their copies then get the usual replacements
+        body = doc.element.body
+        program = self.repeat_blocks.compile(body)
+        if program.blocks:
+            program.run(body, self.block_context(template_data, text))
         
-        # Get basic information
-        basic_info = template_data['skills']['basic_information']
-        
-        # Dictionary of basic replacements with exact placeholders
-        replacements = {
-            '{{NAME}}': template_data['personal_info']['name'],
-            '{{TITLE}}': template_data['personal_info']['title'],
-            '{{EDUCATION_TEMPLATE}}': basic_info['education'],
-            '{{LANGUAGES}}': self.format_skills_list(basic_info['languages']),
-            '{{DOMAINS_TEMPLATE}}': self.format_domains_list(basic_info['domains'])
-        }
+        # Get introduction parts and basic replacements with exact placeholders
+        intro_part1, intro_part2 = text['intro']
+        replacements = text['replacements']
         
         # Process basic placeholders in paragraphs
         for paragraph in doc.paragraphs:
@@ -484,17 +562,7 @@ class TemplateProcessor:
                         if '{{INTRO_PART_1}}' in para.text:
                             intro_para = para
                             if para.runs:
-                                intro_format = {
-                                    'bold': para.runs[0].bold,
-                                    'italic': para.runs[0].italic,
-                                    'underline': para.runs[0].underline,
-                                    'font': para.runs[0].font.name if para.runs[0].font.name else None,
-                                    'size': para.runs[0].font.size if para.runs[0].font.size else None,
-                                    'color': para.runs[0].font.color.rgb if para.runs[0].font.color and para.runs[0].font.color.rgb else None,
-                                    'alignment': para.alignment,
-                                    'style': para.style,
-                                    'paragraph_format': para.paragraph_format
-                                }
+                                intro_format = self.formatting_utils.run_format(para.runs[0]._r)
                             break
                     
                     # If found INTRO_PART_1, process it and INTRO_PART_2
@@ -506,26 +574,16 @@ class TemplateProcessor:
                         for para in cell.paragraphs:
                             if '{{INTRO_PART_2}}' in para.text:
                                 # Save paragraph formatting
-                                if intro_format.get('paragraph_format'):
-                                    if hasattr(intro_format['paragraph_format'], 'left_indent'):
-                                        para.paragraph_format.left_indent = intro_format['paragraph_format'].left_indent
-                                    if hasattr(intro_format['paragraph_format'], 'first_line_indent'):
-                                        para.paragraph_format.first_line_indent = intro_format['paragraph_format'].first_line_indent
+                                para.paragraph_format.left_indent = intro_para.paragraph_format.left_indent
+                                para.paragraph_format.first_line_indent = intro_para.paragraph_format.first_line_indent
                                 
                                 # Replace text preserving formatting
                                 self.replace_text_preserve_format(para, '{{INTRO_PART_2}}', intro_part2)
                                 
                                 # Apply exact same formatting as INTRO_PART_1
                                 for run in para.runs:
+                                    intro_format.apply(run._r)
                                     run.bold = False  # Force remove bold
-                                    if intro_format.get('font'):
-                                        run.font.name = intro_format['font']
-                                    if intro_format.get('size'):
-                                        run.font.size = intro_format['size']
-                                    if intro_format.get('color'):
-                                        if not run.font.color:
-                                            run.font.color = RGBColor(0, 0, 0)  # Initialize color if none exists
-                                        run.font.color.rgb = intro_format['color']
                     
                     # Process other placeholders
                     for para in cell.paragraphs:
@@ -572,50 +630,35 @@ class TemplateProcessor:
                     skills_cell._element.append(p)
                 
                 # Insert all skills sections
-                skills = template_data['skills']['skills']
+                formats_fingerprint = None
+                if self.fragment_cache is not None:
+                    formats_fingerprint = self.fragment_cache.fingerprint(
+                        self.format_fingerprint(key_format),
+                        self.format_fingerprint(value_format)
+                    )
                 
-                for key, values_list in skills.items():
-                    if key == 'introduction':
-                        continue
+                for key, values_list, header, value in text['skills_sections']:
+                    # Reuse paragraph of unchanged skills category from previous render
+                    cache_key = None
+                    if self.fragment_cache is not None:
+                        cache_key = self.fragment_cache.fingerprint('skills_section', formats_fingerprint, key, values_list)
+                        cached = self.fragment_cache.get(cache_key)
+                        if cached is not None:
+                            skills_cell._element.extend(cached)
+                            continue
                     
                     try:
-                        # Format header
-                        header = key.replace('_', ' ').title()
-                        
-                        # Format values
-                        if isinstance(values_list, list):
-                            value = ', '.join(str(item) for item in values_list)
-                        else:
-                            value = str(values_list)
-                        
-                        # Add period at the end if not present
-                        if not value.endswith('.'):
-                            value = value + '.'
-                        
                         # Create paragraph for key and value
                         para = skills_cell.add_paragraph()
                         if key_format:
-                            # Copy paragraph formatting
-                            if key_format.get('style'):
-                                para.style = key_format['style']
-                            if key_format.get('alignment'):
-                                para.alignment = key_format['alignment']
-                            if key_format.get('paragraph_format'):
-                                if hasattr(key_format['paragraph_format'], 'left_indent'):
-                                    para.paragraph_format.left_indent = key_format['paragraph_format'].left_indent
-                                if hasattr(key_format['paragraph_format'], 'first_line_indent'):
-                                    para.paragraph_format.first_line_indent = key_format['paragraph_format'].first_line_indent
+                            # Copy paragraph style, alignment and indents
+                            key_format.apply_layout(para._p)
                         
                         # Add key (header)
                         key_run = para.add_run(header)
                         if key_format:
+                            key_format.apply(key_run._r)
                             key_run.bold = True  # Headers always bold
-                            if key_format.get('font'):
-                                key_run.font.name = key_format['font']
-                            if key_format.get('size'):
-                                key_run.font.size = key_format['size']
-                            if key_format.get('color'):
-                                key_run.font.color.rgb = key_format['color']
                         
                         # Add line break
                         para.add_run('\n')
@@ -623,19 +666,17 @@ class TemplateProcessor:
                         # Add value in same paragraph
                         value_run = para.add_run(value)
                         if value_format:
+                            value_format.apply(value_run._r)
                             value_run.bold = False  # Values should not be bold
-                            if value_format.get('font'):
-                                value_run.font.name = value_format['font']
-                            if value_format.get('size'):
-                                value_run.font.size = value_format['size']
-                            if value_format.get('color'):
-                                value_run.font.color.rgb = value_format['color']
                         
                         # Set small spacing between blocks and allow page breaks
                         para.paragraph_format.space_before = Pt(0)  # No space before
                         para.paragraph_format.space_after = Pt(9)  # Small space after
                         para.paragraph_format.keep_together = True  # Allow page breaks
                         para.paragraph_format.keep_with_next = False  # Don't keep with next paragraph
+                        
+                        if cache_key is not None:
+                            self.fragment_cache.put(cache_key, [para._p])
                     
                     except Exception as e:
                         print(f"Error adding section {key}: {str(e)}")
@@ -644,6 +685,12 @@ class TemplateProcessor:
         doc.save(doc_path)
         return True
 
+    def format_fingerprint(self, run_format):
+        """
+        Returns JSON-serializable representation of run format for cache keys
+        """
+        return run_format.key if run_format else None
+
     def format_skills_list(self, skills_list):
         """
         Formats skills list as string
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+
+
+class DocRegistry:
+    """
+    Persistent mapping candidate -> Google Doc ID, so regenerations update the same document
+    instead of creating a new one each run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def explicit_id(template_data):
+        """
+        Returns candidate's own id, or None when it has none
+        """
+        candidate_id = template_data.get('id')
+        if isinstance(candidate_id, str) and candidate_id.strip():
+            return candidate_id.strip()
+        return None
+
+    @staticmethod
+    def candidate_key(template_data):
+        """
+        Returns registry key of candidate: its explicit id, otherwise normalized name and title.
+        Both survive edits of the rest of the data, so the document link stays the same;
+        name and title are not unique though, runs reject records sharing a key.
+        """
+        candidate_id = DocRegistry.explicit_id(template_data)
+        if candidate_id is not None:
+            return f'id:{candidate_id}'
+        info = template_data.get('personal_info', {})
+        raw = f"{info.get('name', '')}-{info.get('title', '')}".lower()
+        return re.sub(r'[^a-z0-9а-яё]+', '-', raw).strip('-')
+
+    @staticmethod
+    def content_hash(docx_path):
+        """
+        Hashes contents of .docx parts, ignoring zip timestamps
+        """
+        digest = hashlib.sha256()
+        with zipfile.ZipFile(docx_path) as archive:
+            for name in sorted(archive.namelist()):
+                digest.update(name.encode('utf-8'))
+                digest.update(archive.read(name))
+        return digest.hexdigest()
+
+    def get(self, candidate_key):
+        with self._lock:
+            return self.entries.get(candidate_key)
+
+    def set(self, candidate_key, doc_id, content_hash, title):
+        """
+        Stores document for candidate and persists registry
+        """
+        with self._lock:
+            self.entries[candidate_key] = {
+                'doc_id': doc_id,
+                'content_hash': content_hash,
+                'title': title,
+                'updated': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }
+            self._save()
+
+    def remove(self, candidate_key):
+        with self._lock:
+            if self.entries.pop(candidate_key, None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,16 +1,60 @@
 import os
 import io
+import json
 import pickle
 import re
+import time
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 from docx import Document
+from config.config import Config
+from src.utils.tracing import Tracer
+
+def _content_fields(depth):
+    """
+    Partial-response mask for structural elements: indexes, paragraph text and nested tables up to depth
+    """
+    fields = 'startIndex,endIndex,paragraph/elements/textRun/content'
+    if depth:
+        fields += f',table/tableRows/tableCells/content({_content_fields(depth - 1)})'
+    return fields
+
 
 class GoogleServiceManager:
     SCOPES = ['https://www.googleapis.com/auth/documents', 'https://www.googleapis.com/auth/drive']
+    RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+    # Bullet post-pass walks only body structure and text, styles, lists and inline objects are skipped
+    BULLET_DOCUMENT_FIELDS = (
+        f'revisionId,body/content({_content_fields(3)},tableOfContents/content({_content_fields(0)}))'
+    )
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer or Tracer()
+
+    def execute_with_retries(self, call, span):
+        """
+        Runs Google API call, retrying rate limits, server errors and connection drops
+        with exponential backoff. Retries and every error response (http_<status>) are recorded on span.
+        """
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except HttpError as e:
+                span.add(f'http_{e.resp.status}', 1)
+                if e.resp.status not in self.RETRYABLE_STATUSES or attempt >= Config.API_MAX_RETRIES:
+                    raise
+            except (ConnectionError, TimeoutError):
+                span.add('connection_errors', 1)
+                if attempt >= Config.API_MAX_RETRIES:
+                    raise
+            attempt += 1
+            span.add('retries', 1)
+            time.sleep(Config.API_RETRY_BACKOFF * 2 ** (attempt - 1))
 
     def get_credentials(self):
         """
@@ -32,8 +76,9 @@ class GoogleServiceManager:
 
     def get_drive_service(self):
         """Gets authenticated Google Drive service"""
-        creds = self.get_credentials()
-        return build('drive', 'v3', credentials=creds)
+        with self.tracer.span('drive.build', 'google_api'):
+            creds = self.get_credentials()
+            return build('drive', 'v3', credentials=creds)
 
     def get_document_id_from_url(self, url):
         """
@@ -45,22 +90,61 @@ class GoogleServiceManager:
             return match.group(1)
         raise ValueError("Invalid Google Docs URL format")
 
+    def get_file_revision(self, service, doc_id):
+        """
+        Returns Drive version of file, it increases with every change
+        """
+        with self.tracer.span('drive.files.get', 'google_api', doc_id=doc_id) as span:
+            file = self.execute_with_retries(service.files().get(
+                fileId=doc_id,
+                fields='version'
+            ).execute, span)
+        return file.get('version')
+
+    def get_start_page_token(self, service):
+        """
+        Returns page token of Drive changes feed pointing at the current state
+        """
+        with self.tracer.span('drive.changes.getStartPageToken', 'google_api') as span:
+            response = self.execute_with_retries(service.changes().getStartPageToken(
+                supportsAllDrives=True
+            ).execute, span)
+        return response['startPageToken']
+
+    def list_changes(self, service, page_token):
+        """
+        Returns one page of Drive changes since page_token, with file IDs and versions only
+        """
+        with self.tracer.span('drive.changes.list', 'google_api') as span:
+            page = self.execute_with_retries(service.changes().list(
+                pageToken=page_token,
+                pageSize=1000,
+                spaces='drive',
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True,
+                fields='nextPageToken,newStartPageToken,changes(fileId,removed,file(version,trashed))'
+            ).execute, span)
+            span.set(changes=len(page.get('changes', [])))
+        return page
+
     def export_to_docx(self, service, doc_id, output_path):
         """
         Exports Google Doc to .docx format
         """
         try:
-            request = service.files().export_media(
-                fileId=doc_id,
-                mimeType='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
-            
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            
-            while not done:
-                status, done = downloader.next_chunk()
+            with self.tracer.span('drive.files.export', 'google_api', doc_id=doc_id) as span:
+                request = service.files().export_media(
+                    fileId=doc_id,
+                    mimeType='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                )
+                
+                fh = io.BytesIO()
+                downloader = MediaIoBaseDownload(fh, request)
+                done = False
+                
+                while not done:
+                    status, done = self.execute_with_retries(downloader.next_chunk, span)
+                span.set(bytes_down=fh.tell())
             
             fh.seek(0)
             with open(output_path, 'wb') as f:
@@ -79,6 +163,16 @@ class GoogleServiceManager:
         """
         Uploads file to Google Drive and converts it to Google Docs
         """
+        doc_id = self.create_document(service, file_path, title)
+        if doc_id:
+            self.apply_bullet_formatting(service, doc_id, bullet_color)
+        return doc_id
+
+    def create_document(self, service, file_path, title):
+        """
+        Uploads .docx file to Google Drive as a new Google Doc.
+        Returns ID of the created document.
+        """
         try:
             file_metadata = {
                 'name': title,
@@ -91,132 +185,248 @@ class GoogleServiceManager:
                 resumable=True
             )
             
-            file = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
+            with self.tracer.span('drive.files.create', 'google_api', bytes_up=os.path.getsize(file_path)) as span:
+                file = self.execute_with_retries(service.files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id'
+                ).execute, span)
             
-            doc_id = file.get('id')
-            if doc_id:
-                # Create service for Google Docs API
-                docs_service = build('docs', 'v1', credentials=service._http.credentials)
-                
-                # Get document for analysis
-                document = docs_service.documents().get(documentId=doc_id).execute()
-                
-                # Collect all update requests
-                requests = []
+            return file.get('id')
+        
+        except Exception as e:
+            print(f"An error occurred while uploading: {str(e)}")
+            return None
+
+    def update_document(self, service, doc_id, file_path):
+        """
+        Replaces content of existing Google Doc with .docx file, keeping its ID and URL.
+        Returns True on success.
+        """
+        try:
+            media = MediaFileUpload(
+                file_path,
+                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+                resumable=True
+            )
+            
+            with self.tracer.span('drive.files.update', 'google_api', doc_id=doc_id, bytes_up=os.path.getsize(file_path)) as span:
+                self.execute_with_retries(service.files().update(
+                    fileId=doc_id,
+                    media_body=media,
+                    fields='id'
+                ).execute, span)
+            return True
+        
+        except Exception as e:
+            print(f"An error occurred while updating document {doc_id}: {str(e)}")
+            return False
+
+    def apply_bullet_formatting(self, service, doc_id, bullet_color=None):
+        """
+        Turns Responsibilities paragraphs of uploaded document into colored bullet lists
+        """
+        try:
+            # Create service for Google Docs API
+            docs_service = build('docs', 'v1', credentials=service._http.credentials)
+            
+            # Get document for analysis
+            with self.tracer.span('docs.documents.get', 'google_api', doc_id=doc_id) as span:
+                document = self.execute_with_retries(docs_service.documents().get(
+                    documentId=doc_id,
+                    fields=self.BULLET_DOCUMENT_FIELDS
+                ).execute, span)
+                if self.tracer.recording:
+                    span.set(
+                        bytes_down=len(json.dumps(document)),
+                        elements=len(document.get('body', {}).get('content', []))
+                    )
+            
+            # Collect update requests, grouped per paragraph so a group never spans two batches
+            requests = []
+            
+            def process_structural_elements(elements, in_table=False):
+                """Recursively processes document's structural elements"""
+                in_responsibilities = False
                 
-                def process_structural_elements(elements, in_table=False):
-                    """Recursively processes document's structural elements"""
-                    in_responsibilities = False
-                    
-                    for element in elements:
-                        if 'paragraph' in element:
-                            # Check only paragraphs inside tables
-                            if not in_table:
-                                continue
-                                
-                            para = element['paragraph']
-                            text = ''
-                            # Collect all paragraph text
-                            for section in para.get('elements', []):
-                                if 'textRun' in section:
-                                    text += section['textRun'].get('content', '')
+                for element in elements:
+                    if 'paragraph' in element:
+                        # Check only paragraphs inside tables
+                        if not in_table:
+                            continue
                             
-                            text = text.strip()
-                            if not text:
-                                continue
-                                
-                            # Determine if we're in Responsibilities section
-                            if text.startswith('Responsibilities'):
-                                in_responsibilities = True
-                                continue
-                            elif text.startswith(('Project roles', 'Period', 'Environment')):
-                                in_responsibilities = False
-                                continue
-                                
-                            # Add bullet points only for elements in Responsibilities section
-                            if in_responsibilities:
-                                start_index = element.get('startIndex')
-                                end_index = element.get('endIndex')
-                                
-                                if start_index is not None and end_index is not None and start_index < end_index:
-                                    # 1) create bullets
-                                    requests.append({
-                                        'createParagraphBullets': {
+                        para = element['paragraph']
+                        text = ''
+                        # Collect all paragraph text
+                        for section in para.get('elements', []):
+                            if 'textRun' in section:
+                                text += section['textRun'].get('content', '')
+                        
+                        text = text.strip()
+                        if not text:
+                            continue
+                            
+                        # Determine if we're in Responsibilities section
+                        if text.startswith('Responsibilities'):
+                            in_responsibilities = True
+                            continue
+                        elif text.startswith(('Project roles', 'Period', 'Environment')):
+                            in_responsibilities = False
+                            continue
+                            
+                        # Add bullet points only for elements in Responsibilities section
+                        if in_responsibilities:
+                            start_index = element.get('startIndex')
+                            end_index = element.get('endIndex')
+                            
+                            if start_index is not None and end_index is not None and start_index < end_index:
+                                paragraph_requests = []
+                                requests.append(paragraph_requests)
+
+                                # 1) create bullets
+                                paragraph_requests.append({
+                                    'createParagraphBullets': {
+                                        'range': {'startIndex': start_index,
+                                                  'endIndex': end_index},
+                                        'bulletPreset': 'BULLET_DISC_CIRCLE_SQUARE'
+                                    }
+                                })
+
+                                if bullet_color:
+                                    r, g, b = (int(bullet_color[i:i+2], 16) / 255.0
+                                               for i in (0, 2, 4))
+
+                                    # 2) color TAB symbol ⇒ bullet point will be colored too
+                                    paragraph_requests.append({
+                                        'updateTextStyle': {
                                             'range': {'startIndex': start_index,
-                                                      'endIndex': end_index},
-                                            'bulletPreset': 'BULLET_DISC_CIRCLE_SQUARE'
+                                                      'endIndex': start_index + 1},
+                                            'textStyle': {
+                                                'foregroundColor': {
+                                                    'color': {'rgbColor': {'red': r, 'green': g, 'blue': b}}
+                                                }
+                                            },
+                                            'fields': 'foregroundColor'
                                         }
                                     })
 
-                                    if bullet_color:
-                                        r, g, b = (int(bullet_color[i:i+2], 16) / 255.0
-                                                   for i in (0, 2, 4))
-
-                                        # 2) color TAB symbol ⇒ bullet point will be colored too
-                                        requests.append({
-                                            'updateTextStyle': {
-                                                'range': {'startIndex': start_index,
-                                                          'endIndex': start_index + 1},
-                                                'textStyle': {
-                                                    'foregroundColor': {
-                                                        'color': {'rgbColor': {'red': r, 'green': g, 'blue': b}}
-                                                    }
-                                                },
-                                                'fields': 'foregroundColor'
-                                            }
-                                        })
-
-                                        # 3) (optional) return main text to black
-                                        requests.append({
-                                            'updateTextStyle': {
-                                                'range': {'startIndex': start_index + 1,
-                                                          'endIndex': end_index},
-                                                'textStyle': {
-                                                    'foregroundColor': {
-                                                        'color': {'rgbColor': {'red': 0, 'green': 0, 'blue': 0}}
-                                                    }
-                                                },
-                                                'fields': 'foregroundColor'
-                                            }
-                                        })
-                        
-                        elif 'table' in element:
-                            # Process table
-                            for row in element['table'].get('tableRows', []):
-                                for cell in row.get('tableCells', []):
-                                    process_structural_elements(cell.get('content', []), True)
-                        
-                        elif 'tableOfContents' in element:
-                            # Process table of contents
-                            process_structural_elements(element['tableOfContents'].get('content', []), in_table)
-                
-                # Process document content
-                process_structural_elements(document.get('body', {}).get('content', []))
-                
-                # If there are update requests, send them
-                if requests:
-                    try:
-                        for idx, req in enumerate(requests):
-                            if 'updateTextStyle' in req:
-                                style = req['updateTextStyle']
-                                color = style['textStyle']['foregroundColor']['color']['rgbColor']
-                        
-                        result = docs_service.documents().batchUpdate(
-                            documentId=doc_id,
-                            body={'requests': requests}
-                        ).execute()
-                    except Exception as e:
-                        print(f"Warning: Failed to apply updates: {str(e)}")
-                        print(f"Request that failed: {requests[-1]}")
-                
-                return doc_id
+                                    # 3) (optional) return main text to black
+                                    paragraph_requests.append({
+                                        'updateTextStyle': {
+                                            'range': {'startIndex': start_index + 1,
+                                                      'endIndex': end_index},
+                                            'textStyle': {
+                                                'foregroundColor': {
+                                                    'color': {'rgbColor': {'red': 0, 'green': 0, 'blue': 0}}
+                                                }
+                                            },
+                                            'fields': 'foregroundColor'
+                                        }
+                                    })
+                    
+                    elif 'table' in element:
+                        # Process table
+                        for row in element['table'].get('tableRows', []):
+                            for cell in row.get('tableCells', []):
+                                process_structural_elements(cell.get('content', []), True)
+                    
+                    elif 'tableOfContents' in element:
+                        # Process table of contents
+                        process_structural_elements(element['tableOfContents'].get('content', []), in_table)
             
-            return file.get('id')
+            # Process document content
+            process_structural_elements(document.get('body', {}).get('content', []))
+            
+            # If there are update requests, send them
+            if requests:
+                applied, total = self.send_batch_updates(
+                    docs_service, doc_id, requests, document.get('revisionId'), self.body_end_index(document)
+                )
+                if applied < total:
+                    print(f"Bullet formatting applied partially: {applied} of {total} chunks")
+                    return False
+            
+            return True
         
         except Exception as e:
-            print(f"An error occurred while uploading: {str(e)}")
-            return None 
\ No newline at end of file
+            print(f"An error occurred while formatting bullets: {str(e)}")
+            return False
+
+    @staticmethod
+    def body_end_index(document):
+        """
+        Returns end index of document body, indexes of its content stay valid while it is unchanged
+        """
+        content = document.get('body', {}).get('content', [])
+        return content[-1].get('endIndex') if content else None
+
+    def is_revision_mismatch(self, error):
+        """
+        True when batchUpdate was rejected because the document changed after requiredRevisionId
+        """
+        return (isinstance(error, HttpError) and error.resp.status == 400
+                and 'revision' in (error.content or b'').decode('utf-8', 'replace').lower())
+
+    def get_revision(self, docs_service, doc_id):
+        """
+        Returns (revisionId, body end index) of document
+        """
+        with self.tracer.span('docs.documents.get', 'google_api', doc_id=doc_id, fields='revision') as span:
+            document = self.execute_with_retries(docs_service.documents().get(
+                documentId=doc_id,
+                fields='revisionId,body/content(endIndex)'
+            ).execute, span)
+        return document.get('revisionId'), self.body_end_index(document)
+
+    def send_batch_updates(self, docs_service, doc_id, request_groups, revision_id=None, end_index=None):
+        """
+        Sends request groups in batchUpdate calls of at most Config.API_BATCH_UPDATE_CHUNK requests.
+        Each call is pinned to the revision the previous one produced, transient failures retry
+        only the failing chunk. When the document was changed meanwhile (e.g. by Docs itself after
+        the upload) and its body length is still end_index, the chunk is sent again on the new revision.
+        Returns (chunks applied, total chunks).
+        """
+        chunks = []
+        chunk = []
+        for group in request_groups:
+            if chunk and len(chunk) + len(group) > Config.API_BATCH_UPDATE_CHUNK:
+                chunks.append(chunk)
+                chunk = []
+            chunk.extend(group)
+        if chunk:
+            chunks.append(chunk)
+
+        for index, chunk in enumerate(chunks):
+            refreshed = False
+            while True:
+                body = {'requests': chunk}
+                if revision_id:
+                    # Indexes were read from this revision, the call fails instead of editing a changed document
+                    body['writeControl'] = {'requiredRevisionId': revision_id}
+                try:
+                    with self.tracer.span('docs.documents.batchUpdate', 'google_api', requests=len(chunk),
+                                          chunk=index, chunks=len(chunks)) as span:
+                        if self.tracer.recording:
+                            span.set(bytes_up=len(json.dumps(body)))
+                        result = self.execute_with_retries(docs_service.documents().batchUpdate(
+                            documentId=doc_id,
+                            body=body
+                        ).execute, span)
+                    break
+                except Exception as e:
+                    if revision_id and not refreshed and self.is_revision_mismatch(e):
+                        # Requests only restyle existing text, they stay valid while the body keeps its length
+                        refreshed = True
+                        try:
+                            revision_id, current_end = self.get_revision(docs_service, doc_id)
+                        except Exception as read_error:
+                            e = read_error
+                        else:
+                            if end_index is None or current_end == end_index:
+                                continue
+                            e = Exception(f"document body changed ({end_index} -> {current_end})")
+                    print(f"Warning: Failed to apply updates chunk {index + 1}/{len(chunks)} "
+                          f"({len(chunk)} requests), skipping the remaining chunks: {str(e)}")
+                    return index, len(chunks)
+            revision_id = result.get('writeControl', {}).get('requiredRevisionId', revision_id)
+        return len(chunks), len(chunks)
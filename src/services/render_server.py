@@ -0,0 +1,254 @@
+import json
+import os
+import signal
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.config import Config
+from src.core.render_cache import FragmentCache
+from src.core.schema_validator import CandidateValidationError
+from src.services.template_prefetcher import TemplatePrefetcher
+
+DOCX_MIME = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+class RenderServer:
+    """
+    Long-running renderer: keeps DocumentProcessor, templates as parsed bytes and the
+    authenticated Drive client in memory, and serves render requests over local HTTP
+    or a Unix socket. Templates are reloaded when their Drive revisions change.
+    """
+
+    def __init__(self, doc_processor, listpage_url, maininfo_url, offline=False, reload_interval=None):
+        self.doc_processor = doc_processor
+        self.listpage_url = listpage_url
+        self.maininfo_url = maininfo_url
+        self.offline = offline
+        self.reload_interval = reload_interval
+        # Template reloads and uploads hold different locks, each uses its own Drive client
+        # since httplib2 is not thread-safe
+        self.reload_drive = None
+        self.upload_drive = None
+        self.template_ids = doc_processor.get_template_ids(listpage_url, maininfo_url)
+        # One changes feed call per reload instead of a revision call per template,
+        # none at all when a separate prefetch process keeps templates current
+        self.prefetched = doc_processor.template_prefetcher is not None
+        self.prefetcher = doc_processor.template_prefetcher or TemplatePrefetcher(doc_processor, self.template_ids)
+        self.state = None
+        self.started = time.time()
+        self.renders = 0
+        # Processors keep per-render state, renders run one at a time.
+        # Uploads share one Drive client and run one at a time as well, next to renders
+        self.render_lock = threading.Lock()
+        self.upload_lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.stopped = threading.Event()
+        if doc_processor.fragment_cache is None:
+            self.enable_fragment_cache()
+
+    def enable_fragment_cache(self):
+        """
+        Warm in-memory fragment cache: repeated sections are reused across requests
+        """
+        cache = FragmentCache()
+        self.doc_processor.fragment_cache = cache
+        self.doc_processor.template_processor.fragment_cache = cache
+        self.doc_processor.skills_matrix_processor.fragment_cache = cache
+
+    def load_templates(self):
+        """
+        Loads templates into memory and swaps them in, in-flight renders keep the previous set
+        """
+        with self.reload_lock:
+            revisions = None
+            if not self.offline:
+                if self.reload_drive is None:
+                    self.reload_drive = self.doc_processor.google_service.get_drive_service()
+                if not self.prefetched:
+                    self.prefetcher.sync(self.reload_drive)
+                # Compared with loaded state, since a separate prefetch process may have synced already
+                revisions = self.prefetcher.revisions()
+                if self.state and self.state['revisions'] == revisions:
+                    return False
+                template_paths = self.prefetcher.template_paths()
+            else:
+                template_paths = self.doc_processor.find_local_templates(Config.TEMPLATES_DIR)
+
+            templates = {}
+            for name, path in template_paths.items():
+                with open(path, 'rb') as f:
+                    templates[name] = f.read()
+            self.state = {
+                'templates': templates,
+                'skills_formats': self.doc_processor.load_skills_formats(templates['skills_template']),
+                'revisions': revisions,
+                'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }
+            print(f"Templates loaded at {self.state['loaded_at']}")
+            return True
+
+    def watch_templates(self):
+        """
+        Background loop reloading templates when their Drive revisions change
+        """
+        while not self.stopped.wait(self.reload_interval):
+            try:
+                self.load_templates()
+            except Exception as e:
+                print(f"Template reload failed, keeping previous templates: {str(e)}")
+
+    def health(self):
+        return {
+            'status': 'ok' if self.state else 'loading',
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'renders': self.renders,
+            'offline': self.offline,
+            'templates_loaded_at': self.state['loaded_at'] if self.state else None,
+            'template_revisions': self.state['revisions'] if self.state else None
+        }
+
+    def render(self, request):
+        """
+        Renders candidate from request dict.
+        Returns (docx bytes, document URL or None).
+        """
+        template_data = self.doc_processor.validator.ensure_valid(request.get('candidate'))
+        upload = request.get('upload', not self.offline)
+        if upload and self.offline:
+            raise ValueError("Uploads are not available in offline mode")
+        title = request.get('title') or f"Combined Document - {template_data['personal_info']['name']}"
+
+        state = self.state
+        processor = self.doc_processor
+        with processor.create_workspace('serve_') as workspace:
+            output_path = workspace.file('merged.docx')
+            with self.render_lock:
+                bullet_color = processor.render_docx(
+                    state['templates'], template_data, workspace.path, output_path, state['skills_formats']
+                )
+                self.renders += 1
+            with open(output_path, 'rb') as f:
+                docx_bytes = f.read()
+
+            # The next request renders while this one uploads
+            url = None
+            if upload:
+                candidate_key = request.get('candidate_id')
+                if candidate_key is None and processor.doc_registry is not None:
+                    candidate_key = processor.doc_registry.candidate_key(template_data)
+                with self.upload_lock:
+                    if self.upload_drive is None:
+                        self.upload_drive = processor.google_service.get_drive_service()
+                    doc_id = processor.publish_document(self.upload_drive, output_path, title, bullet_color, candidate_key)
+                if not doc_id:
+                    raise Exception("Failed to upload rendered document")
+                url = f"https://docs.google.com/document/d/{doc_id}/edit"
+        return docx_bytes, url
+
+    def create_server(self, host='127.0.0.1', port=8765, socket_path=None):
+        handler = type('Handler', (RenderRequestHandler,), {'render_server': self})
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            return ThreadingUnixHTTPServer(socket_path, handler)
+        return ThreadingHTTPServer((host, port), handler)
+
+    def serve(self, host='127.0.0.1', port=8765, socket_path=None):
+        """
+        Loads templates and serves requests until interrupted
+        """
+        self.load_templates()
+        if not self.offline:
+            # Upload client is authenticated before the first request arrives
+            with self.upload_lock:
+                self.upload_drive = self.doc_processor.google_service.get_drive_service()
+        if self.reload_interval and not self.offline:
+            threading.Thread(target=self.watch_templates, daemon=True).start()
+        if hasattr(signal, 'SIGHUP'):
+            # kill -HUP reloads templates without dropping requests
+            signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=self.load_templates, daemon=True).start())
+
+        server = self.create_server(host, port, socket_path)
+        print(f"Serving on {socket_path or f'http://{host}:{port}'}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopped.set()
+            server.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects (host, port) client address
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /health, POST /render, POST /reload
+    """
+    render_server = None
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, self.render_server.health())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path == '/reload':
+            try:
+                changed = self.render_server.load_templates()
+                self.send_json(200, {'reloaded': changed, **self.render_server.health()})
+            except Exception as e:
+                self.send_json(500, {'error': str(e)})
+            return
+        if self.path != '/render':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            docx_bytes, url = self.render_server.render(request)
+        except CandidateValidationError as e:
+            self.send_json(400, {'error': 'invalid candidate', 'errors': e.errors})
+            return
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+
+        if request.get('format') == 'docx':
+            self.send_response(200)
+            self.send_header('Content-Type', DOCX_MIME)
+            self.send_header('Content-Length', str(len(docx_bytes)))
+            if url:
+                self.send_header('X-Document-Url', url)
+            self.end_headers()
+            self.wfile.write(docx_bytes)
+        else:
+            self.send_json(200, {'url': url, 'bytes': len(docx_bytes)})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Requests are frequent, only errors are worth printing
+        pass
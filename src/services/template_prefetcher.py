@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+from config.config import Config
+
+
+class TemplatePrefetcher:
+    """
+    Keeps exported templates current by following the Drive changes feed.
+    The page token is persisted, so after a restart only changes made since the last poll are read,
+    and a template is exported again only when a change for it arrives. Renders take the local
+    copies and their revisions without calling Drive.
+    """
+
+    def __init__(self, doc_processor, template_ids, templates_dir=None, state_path=None):
+        self.doc_processor = doc_processor
+        self.template_ids = template_ids
+        self.templates_dir = templates_dir or Config.TEMPLATES_DIR
+        self.state_path = state_path or Config.TEMPLATE_CHANGES_JSON
+        self.lock = threading.Lock()
+
+    def load_state(self):
+        """
+        Returns saved feed state, or None when templates were never synced with these IDs
+        """
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        if state.get('template_ids') != self.template_ids:
+            return None
+        return state
+
+    def save_state(self, page_token):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'page_token': page_token,
+                'template_ids': self.template_ids,
+                'synced_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+            }, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def revisions(self):
+        """
+        Returns mapping of template name to revision of its local copy
+        """
+        revisions_path = os.path.join(self.templates_dir, 'revisions.json')
+        if not os.path.exists(revisions_path):
+            return {}
+        with open(revisions_path, 'r') as f:
+            local = json.load(f)
+        return {name: local.get(name, {}).get('version') for name in self.template_ids}
+
+    def template_paths(self):
+        """
+        Returns mapping of template name to local copy, raises if a template was never exported
+        """
+        return self.doc_processor.find_local_templates(self.templates_dir)
+
+    def sync(self, drive_service):
+        """
+        Brings local templates up to date with Drive.
+        Returns names of templates exported again.
+        """
+        google_service = self.doc_processor.google_service
+        with self.lock:
+            state = self.load_state()
+            local = self.revisions()
+            missing = [name for name in self.template_ids
+                       if not os.path.exists(os.path.join(self.templates_dir, f'{name}.docx'))]
+
+            if state is None or missing:
+                # Token is taken first, so changes made during the export are seen by the next poll
+                page_token = google_service.get_start_page_token(drive_service)
+                revisions = self.doc_processor.get_template_revisions(drive_service, self.template_ids)
+            else:
+                names_by_id = {doc_id: name for name, doc_id in self.template_ids.items()}
+                page_token = state['page_token']
+                revisions = dict(local)
+                while True:
+                    page = google_service.list_changes(drive_service, page_token)
+                    for change in page.get('changes', []):
+                        name = names_by_id.get(change.get('fileId'))
+                        if name and not change.get('removed') and change.get('file', {}).get('version'):
+                            revisions[name] = change['file']['version']
+                    if 'newStartPageToken' in page:
+                        page_token = page['newStartPageToken']
+                        break
+                    page_token = page['nextPageToken']
+
+            changed = [name for name in self.template_ids if revisions.get(name) != local.get(name) or name in missing]
+            if changed:
+                # Templates whose stored revision still matches are reused by export_templates
+                self.doc_processor.export_templates(drive_service, self.template_ids, self.templates_dir, revisions)
+            self.save_state(page_token)
+            return changed
+
+    def run(self, drive_service, interval, stopped=None):
+        """
+        Polls the changes feed every interval seconds until stopped is set
+        """
+        stopped = stopped or threading.Event()
+        while True:
+            try:
+                changed = self.sync(drive_service)
+                if changed:
+                    print(f"Templates updated: {', '.join(changed)}")
+            except Exception as e:
+                print(f"Template prefetch failed, keeping previous templates: {str(e)}")
+            if stopped.wait(interval):
+                break
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+
+from src.core.output_cache import OutputCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    candidate_key TEXT,
+    data TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease TEXT,
+    lease_expires REAL,
+    doc_id TEXT,
+    output_path TEXT,
+    timings TEXT,
+    error TEXT,
+    enqueued REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, lease_expires, id);
+CREATE INDEX IF NOT EXISTS jobs_candidate ON jobs (candidate_key);
+"""
+
+
+def default_worker_id():
+    """
+    Returns worker name unique across machines: host and process ID
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Candidates of one large batch shared by workers on several machines through a SQLite file.
+    A worker claims jobs under a lease that expires after lease_seconds unless renewed, so jobs
+    of a crashed worker go back to the queue. Every claim gets a new lease token and results
+    are accepted only with the current one, so a job is finished by exactly one worker.
+    Jobs are keyed by candidate data and title, enqueuing the same candidate again is a no-op.
+    The methods are the whole interface used by workers, a server-backed queue can replace it.
+    """
+
+    def __init__(self, path, lease_seconds=600, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        # Transactions are opened explicitly, BEGIN IMMEDIATE takes the write lock before reading
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    @staticmethod
+    def job_key(template_data, title):
+        """
+        Hashes normalized candidate data and output title
+        """
+        payload = json.dumps(
+            {'candidate': OutputCache.normalize(template_data), 'title': title},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def enqueue(self, jobs):
+        """
+        Adds iterable of (template_data, title, candidate_key) jobs in one transaction.
+        Jobs whose candidate_key belongs to another queued job are not added, both would update one document.
+        Returns (added, already queued, [(title, candidate_key) of conflicting jobs]).
+        """
+        added = 0
+        duplicates = 0
+        conflicts = []
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                for template_data, title, candidate_key in jobs:
+                    key = self.job_key(template_data, title)
+                    if candidate_key and db.execute(
+                        'SELECT 1 FROM jobs WHERE candidate_key = ? AND key != ? LIMIT 1', (candidate_key, key)
+                    ).fetchone():
+                        conflicts.append((title, candidate_key))
+                        continue
+                    cursor = db.execute(
+                        'INSERT OR IGNORE INTO jobs (key, title, candidate_key, data, enqueued) VALUES (?, ?, ?, ?, ?)',
+                        (key, title, candidate_key, json.dumps(template_data, ensure_ascii=False), now)
+                    )
+                    if cursor.rowcount:
+                        added += 1
+                    else:
+                        duplicates += 1
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return added, duplicates, conflicts
+
+    def claim(self, worker, limit=1):
+        """
+        Leases up to limit pending jobs, or jobs whose lease expired, to worker.
+        Returns list of job dicts with id, lease, title, candidate_key, attempts and data.
+        """
+        now = time.time()
+        claimed = []
+        with closing(self._connect()) as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                # Job whose workers keep dying on it is given up instead of taking down the next ones
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Lease expired', lease = NULL, lease_expires = NULL, "
+                    "finished = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts)
+                )
+                rows = db.execute(
+                    "SELECT id, title, candidate_key, data, attempts FROM jobs "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY id LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                for row in rows:
+                    lease = uuid.uuid4().hex
+                    db.execute(
+                        "UPDATE jobs SET status = 'leased', worker = ?, lease = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, started = ? WHERE id = ?",
+                        (worker, lease, now + self.lease_seconds, now, row['id'])
+                    )
+                    claimed.append({
+                        'id': row['id'],
+                        'lease': lease,
+                        'title': row['title'],
+                        'candidate_key': row['candidate_key'],
+                        'attempts': row['attempts'] + 1,
+                        'data': json.loads(row['data'])
+                    })
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return claimed
+
+    def renew(self, leases):
+        """
+        Extends leases given as mapping job ID -> lease token.
+        Returns IDs of jobs still held, the others were reclaimed after their lease expired.
+        """
+        if not leases:
+            return set()
+        expires = time.time() + self.lease_seconds
+        held = set()
+        with closing(self._connect()) as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                for job_id, lease in leases.items():
+                    cursor = db.execute(
+                        "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease = ? AND status = 'leased'",
+                        (expires, job_id, lease)
+                    )
+                    if cursor.rowcount:
+                        held.add(job_id)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return held
+
+    def complete(self, job_id, lease, doc_id=None, output_path=None, timings=None):
+        """
+        Records finished job. Returns False when the lease was lost and the result is not accepted.
+        """
+        return self._finish(job_id, lease, "status = 'done', doc_id = ?, output_path = ?, error = NULL",
+                            (doc_id, output_path), timings)
+
+    def fail(self, job_id, lease, error, timings=None):
+        """
+        Records failed attempt: job goes back to the queue until it has failed max_attempts times.
+        Returns False when the lease was lost.
+        """
+        return self._finish(
+            job_id, lease,
+            "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?",
+            (self.max_attempts, error), timings
+        )
+
+    def _finish(self, job_id, lease, assignments, params, timings):
+        with closing(self._connect()) as db:
+            cursor = db.execute(
+                f"UPDATE jobs SET {assignments}, lease = NULL, lease_expires = NULL, timings = ?, finished = ? "
+                "WHERE id = ? AND lease = ? AND status = 'leased'",
+                tuple(params) + (json.dumps(timings) if timings else None, time.time(), job_id, lease)
+            )
+            return cursor.rowcount == 1
+
+    def retry_failed(self):
+        """
+        Puts failed jobs back to the queue with a fresh attempt count, returns their number
+        """
+        with closing(self._connect()) as db:
+            cursor = db.execute("UPDATE jobs SET status = 'pending', attempts = 0, error = NULL WHERE status = 'failed'")
+            return cursor.rowcount
+
+    def counts(self):
+        """
+        Returns number of jobs per status, expired leases counted separately
+        """
+        counts = {'pending': 0, 'leased': 0, 'expired': 0, 'done': 0, 'failed': 0}
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT CASE WHEN status = 'leased' AND lease_expires < ? THEN 'expired' ELSE status END AS state, "
+                "COUNT(*) AS jobs FROM jobs GROUP BY state",
+                (time.time(),)
+            ).fetchall()
+        for row in rows:
+            counts[row['state']] = row['jobs']
+        return counts
+
+    def worker_stats(self):
+        """
+        Returns finished jobs, render and upload seconds per worker
+        """
+        stats = {}
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT worker, status, timings FROM jobs WHERE status IN ('done', 'failed')").fetchall()
+        for row in rows:
+            worker = stats.setdefault(row['worker'], {'done': 0, 'failed': 0, 'render_seconds': 0.0, 'upload_seconds': 0.0})
+            worker[row['status']] += 1
+            timings = json.loads(row['timings']) if row['timings'] else {}
+            worker['render_seconds'] += timings.get('render', 0.0)
+            worker['upload_seconds'] += timings.get('upload', 0.0)
+        return stats
+
+    def jobs(self, status=None):
+        """
+        Returns finished and queued jobs without candidate data, optionally only with status
+        """
+        query = "SELECT id, title, status, attempts, worker, doc_id, output_path, timings, error FROM jobs"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with closing(self._connect()) as db:
+            rows = db.execute(query + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,201 @@
+from lxml import etree
+
+from src.utils.formatting_utils import NSMAP, element_key
+
+W = NSMAP['w']
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+STYLE_CONTENT_TYPES = (
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml',
+    'application/vnd.ms-word.stylesWithEffects+xml'
+)
+NUMBERING_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml'
+# Elements whose w:val names a style
+STYLE_REFERENCES = ('pStyle', 'rStyle', 'tblStyle', 'numStyleLink', 'styleLink', 'clickAndTypeStyle', 'defaultTableStyle')
+# Style elements linking a kept style to other styles
+STYLE_LINKS = ('basedOn', 'link', 'next')
+
+
+def _w(name):
+    return '{%s}%s' % (W, name)
+
+
+class DocxSlimmer:
+    """
+    Removes what Google export and python-docx leave behind without visible effect:
+    unreferenced styles and numbering definitions, rsid attributes, proofing marks,
+    empty runs, and adjacent runs with identical properties (merged into one).
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.modified = set()
+
+    def slim(self, document):
+        """
+        Slims python-docx document in place, returns counts of removed items
+        """
+        self.stats = {
+            'styles_removed': 0,
+            'numbering_removed': 0,
+            'rsids_removed': 0,
+            'proofing_removed': 0,
+            'runs_removed': 0
+        }
+        self.modified = set()
+        parts = []
+        for part in document.part.package.iter_parts():
+            root = self.part_root(part)
+            if root is not None:
+                parts.append((part, root))
+
+        for part, root in parts:
+            self.strip_noise(root)
+            if part.content_type not in STYLE_CONTENT_TYPES and part.content_type != NUMBERING_CONTENT_TYPE:
+                self.coalesce_runs(root)
+        self.prune_numbering(parts)
+        self.prune_styles(parts)
+
+        # Parts python-docx does not parse keep their content as bytes
+        for part, root in parts:
+            if root in self.modified and not hasattr(part, '_element'):
+                part._blob = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+        return self.stats
+
+    def part_root(self, part):
+        """
+        Returns root element of XML part, parsing parts python-docx keeps as bytes
+        """
+        if hasattr(part, '_element'):
+            return part._element
+        if part.content_type.endswith('+xml') and not part.content_type.endswith('relationships+xml'):
+            try:
+                return etree.fromstring(part.blob)
+            except etree.XMLSyntaxError:
+                return None
+        return None
+
+    def strip_noise(self, root):
+        """
+        Drops rsid attributes, rsid tables and proofing marks
+        """
+        for element in root.iter(tag=etree.Element):
+            for name in [name for name in element.attrib if name.startswith('{%s}rsid' % W)]:
+                del element.attrib[name]
+                self.stats['rsids_removed'] += 1
+                self.modified.add(root)
+
+        for element in root.findall('.//w:rsids', NSMAP) + root.findall('.//w:proofErr', NSMAP):
+            if element.tag == _w('proofErr'):
+                self.stats['proofing_removed'] += 1
+            element.getparent().remove(element)
+            self.modified.add(root)
+
+    def is_text_run(self, run):
+        """
+        Checks that run holds nothing but optional rPr and text
+        """
+        for index, child in enumerate(run):
+            if child.tag == _w('rPr') and index == 0:
+                continue
+            if child.tag != _w('t'):
+                return False
+        return True
+
+    def coalesce_runs(self, root):
+        """
+        Removes empty runs and merges adjacent text runs with identical properties
+        """
+        for run in root.findall('.//w:r', NSMAP):
+            if self.is_text_run(run) and not ''.join(t.text or '' for t in run.findall('w:t', NSMAP)):
+                run.getparent().remove(run)
+                self.stats['runs_removed'] += 1
+                self.modified.add(root)
+
+        for parent in {run.getparent() for run in root.iter(_w('r'))}:
+            previous = None
+            previous_key = None
+            for child in list(parent):
+                if child.tag != _w('r') or not self.is_text_run(child):
+                    previous = None
+                    continue
+                rpr = child.find('w:rPr', NSMAP)
+                key = element_key(rpr) if rpr is not None else None
+                if previous is not None and key == previous_key:
+                    self.append_text(previous, ''.join(t.text or '' for t in child.findall('w:t', NSMAP)))
+                    parent.remove(child)
+                    self.stats['runs_removed'] += 1
+                    self.modified.add(root)
+                else:
+                    previous = child
+                    previous_key = key
+
+    def append_text(self, run, text):
+        """
+        Appends text to run, keeping a single w:t
+        """
+        texts = run.findall('w:t', NSMAP)
+        first = texts[0]
+        first.text = ''.join(t.text or '' for t in texts) + text
+        for extra in texts[1:]:
+            run.remove(extra)
+        if first.text != first.text.strip():
+            first.set(XML_SPACE, 'preserve')
+
+    def prune_numbering(self, parts):
+        """
+        Removes numbering instances nothing refers to and abstract definitions left without instances
+        """
+        used = set()
+        numbering_roots = []
+        for part, root in parts:
+            if part.content_type == NUMBERING_CONTENT_TYPE:
+                numbering_roots.append(root)
+                continue
+            used.update(element.get(_w('val')) for element in root.iter(_w('numId')))
+
+        for root in numbering_roots:
+            for num in root.findall('w:num', NSMAP):
+                if num.get(_w('numId')) not in used:
+                    root.remove(num)
+                    self.stats['numbering_removed'] += 1
+                    self.modified.add(root)
+            used_abstract = {element.get(_w('val')) for element in root.iter(_w('abstractNumId'))}
+            for abstract in root.findall('w:abstractNum', NSMAP):
+                if abstract.get(_w('abstractNumId')) not in used_abstract:
+                    root.remove(abstract)
+                    self.stats['numbering_removed'] += 1
+                    self.modified.add(root)
+
+    def prune_styles(self, parts):
+        """
+        Removes styles not referenced by content, numbering, settings or other kept styles
+        """
+        used = set()
+        style_roots = []
+        for part, root in parts:
+            if part.content_type in STYLE_CONTENT_TYPES:
+                style_roots.append(root)
+                continue
+            for name in STYLE_REFERENCES:
+                used.update(element.get(_w('val')) for element in root.iter(_w(name)))
+
+        for root in style_roots:
+            styles = {style.get(_w('styleId')): style for style in root.findall('w:style', NSMAP)}
+            # Default styles and styles used inside kept styles (table styles, numbering links) stay too
+            pending = [style_id for style_id, style in styles.items()
+                       if style_id in used or style.get(_w('default')) in ('1', 'true')]
+            kept = set()
+            while pending:
+                style_id = pending.pop()
+                if style_id in kept or style_id not in styles:
+                    continue
+                kept.add(style_id)
+                style = styles[style_id]
+                for name in STYLE_LINKS + STYLE_REFERENCES:
+                    pending.extend(element.get(_w('val')) for element in style.iter(_w(name)))
+
+            for style_id, style in styles.items():
+                if style_id not in kept:
+                    root.remove(style)
+                    self.stats['styles_removed'] += 1
+                    self.modified.add(root)
@@ -1,13 +1,160 @@
 from copy import deepcopy as python_deepcopy
 from lxml import etree
+from docx.oxml import parse_xml
 from docx.shared import Pt
 
+NSMAP = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'w14': 'http://schemas.microsoft.com/office/word/2010/wordml'
+}
+
+# Registration is global for lxml, once per process is enough
+for _prefix, _uri in NSMAP.items():
+    etree.register_namespace(_prefix, _uri)
+
+# Cached lookup that found nothing
+_MISSING = object()
+
+RPR_TAG = '{%s}rPr' % NSMAP['w']
+# Paragraph layout a template block passes on: style, alignment and indents
+LAYOUT_NAMES = ('pStyle', 'ind', 'jc')
+LAYOUT_TAGS = tuple('{%s}%s' % (NSMAP['w'], name) for name in LAYOUT_NAMES)
+
+
+def element_key(element):
+    """
+    Returns hashable value of element with its attributes, text and children
+    """
+    return (element.tag, tuple(element.attrib.items()), element.text,
+            tuple(element_key(child) for child in element))
+
+
+class RunFormat:
+    """
+    Snapshot of run formatting taken from raw w:rPr, optionally with the paragraph layout
+    (style, alignment, indents) of the template block it came from.
+    Snapshots compare and hash by their XML, FormattingUtils keeps one per distinct rPr.
+    """
+    __slots__ = ('rpr', 'layout', 'key', '_hash')
+
+    def __init__(self, rpr, layout=(), key=None):
+        self.rpr = rpr
+        self.layout = layout
+        self.key = key if key is not None else (
+            element_key(rpr) if rpr is not None else None,
+            tuple(element_key(element) for element in layout)
+        )
+        self._hash = hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, RunFormat) and self.key == other.key
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"RunFormat({self.key!r})"
+
+    def __reduce__(self):
+        # lxml elements do not pickle, snapshots travel to section workers as XML
+        return (_run_format_from_xml, (
+            etree.tostring(self.rpr) if self.rpr is not None else None,
+            tuple(etree.tostring(element) for element in self.layout)
+        ))
+
+    def apply(self, run):
+        """
+        Replaces rPr of run element with clone of snapshot
+        """
+        existing = run.find(RPR_TAG)
+        if existing is not None:
+            run.remove(existing)
+        if self.rpr is not None:
+            run.insert(0, python_deepcopy(self.rpr))
+
+    def apply_layout(self, paragraph):
+        """
+        Copies style, alignment and indents of snapshot onto paragraph element
+        """
+        if not self.layout:
+            return
+        ppr = paragraph.get_or_add_pPr()
+        for element in self.layout:
+            name = LAYOUT_NAMES[LAYOUT_TAGS.index(element.tag)]
+            # python-docx helpers keep pPr children in schema order
+            getattr(ppr, f'_remove_{name}')()
+            getattr(ppr, f'_insert_{name}')(python_deepcopy(element))
+
+
+def _run_format_from_xml(rpr, layout):
+    return RunFormat(
+        parse_xml(rpr) if rpr is not None else None,
+        tuple(parse_xml(element) for element in layout)
+    )
+
+
 class FormattingUtils:
     def __init__(self):
-        self.nsmap = {
-            'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
-            'w14': 'http://schemas.microsoft.com/office/word/2010/wordml'
-        }
+        self.nsmap = NSMAP
+        # Template elements are copied into every project row, their pPr/rPr and first run
+        # are looked up once per source element and kept as prototypes until the candidate is rendered
+        self._prototypes = {}
+        self.prototype_hits = 0
+        self.prototype_misses = 0
+        # Run formats are shared by value, equal rPr give the same snapshot
+        self._run_formats = {}
+
+    def interned(self, source, path, copy=True):
+        """
+        Returns first element matching path under source, looked up once per source element.
+        With copy the result is a detached prototype, so later changes to source are not seen.
+        """
+        key = (source, path)
+        found = self._prototypes.get(key, _MISSING)
+        if found is _MISSING:
+            self.prototype_misses += 1
+            found = source.find(path, namespaces=self.nsmap)
+            if copy and found is not None:
+                found = python_deepcopy(found)
+            self._prototypes[key] = found
+        else:
+            self.prototype_hits += 1
+        return found
+
+    def first_run(self, paragraph):
+        """
+        Returns first run of template paragraph or None
+        """
+        return self.interned(paragraph, './/w:r', copy=False)
+
+    def run_format(self, run, paragraph=None):
+        """
+        Returns RunFormat of run element, with layout of paragraph element when given
+        """
+        rpr = run.find(RPR_TAG)
+        layout = ()
+        if paragraph is not None and paragraph.pPr is not None:
+            layout = tuple(element for element in paragraph.pPr if element.tag in LAYOUT_TAGS)
+        key = (element_key(rpr) if rpr is not None else None, tuple(element_key(element) for element in layout))
+        run_format = self._run_formats.get(key)
+        if run_format is None:
+            run_format = RunFormat(
+                python_deepcopy(rpr) if rpr is not None else None,
+                tuple(python_deepcopy(element) for element in layout),
+                key
+            )
+            self._run_formats[key] = run_format
+        return run_format
+
+    def prototype_hit_rate(self):
+        total = self.prototype_hits + self.prototype_misses
+        return self.prototype_hits / total if total else 0.0
+
+    def release_prototypes(self):
+        """
+        Drops prototypes so template trees of a finished render can be freed
+        """
+        self._prototypes.clear()
 
     def deepcopy(self, element):
         """
@@ -280,12 +427,8 @@ class FormattingUtils:
         Copies paragraph formatting with Word namespace consideration
         """
         try:
-            # Register namespaces
-            for prefix, uri in self.nsmap.items():
-                etree.register_namespace(prefix, uri)
-            
             # Copy paragraph properties (pPr)
-            source_ppr = source_para.find('.//w:pPr', namespaces=self.nsmap)
+            source_ppr = self.interned(source_para, './/w:pPr')
             if source_ppr is not None:
                 # Remove existing properties
                 target_ppr = target_para.find('.//w:pPr', namespaces=self.nsmap)
@@ -305,12 +448,8 @@ class FormattingUtils:
         Copies run formatting with Word namespace consideration
         """
         try:
-            # Register namespaces
-            for prefix, uri in self.nsmap.items():
-                etree.register_namespace(prefix, uri)
-            
             # Copy run properties (rPr)
-            source_rpr = source_run.find('.//w:rPr', namespaces=self.nsmap)
+            source_rpr = self.interned(source_run, './/w:rPr')
             if source_rpr is not None:
                 # Remove existing properties
                 target_rpr = target_run.find('.//w:rPr', namespaces=self.nsmap)
@@ -320,17 +459,3 @@ class FormattingUtils:
                 target_run.append(python_deepcopy(source_rpr))
         except Exception as e:
             print(f"Warning: Could not copy run format: {str(e)}")
-
-    def apply_format_to_run(self, run, format_info):
-        """
-        Applies formatting to run
-        """
-        run.bold = format_info['bold']
-        run.italic = format_info['italic']
-        run.underline = format_info['underline']
-        if format_info['font']:
-            run.font.name = format_info['font']
-        if format_info['size']:
-            run.font.size = format_info['size']
-        if format_info['color']:
-            run.font.color.rgb = format_info['color'] 
\ No newline at end of file
@@ -0,0 +1,50 @@
+import hashlib
+
+MEDIA_PREFIX = '/word/media/'
+
+
+def find_duplicate_media(package):
+    """
+    Groups media parts by content.
+    Returns media part counts and bytes before and after deduplication
+    and mapping of every duplicate part to the first part with the same content.
+    """
+    stats = {'media_parts_before': 0, 'media_bytes_before': 0, 'media_parts_after': 0, 'media_bytes_after': 0}
+    first_by_hash = {}
+    duplicates = {}
+    for part in package.iter_parts():
+        if not str(part.partname).startswith(MEDIA_PREFIX):
+            continue
+        blob = part.blob
+        stats['media_parts_before'] += 1
+        stats['media_bytes_before'] += len(blob)
+        first = first_by_hash.setdefault(hashlib.sha1(blob).digest(), part)
+        if first is part:
+            stats['media_parts_after'] += 1
+            stats['media_bytes_after'] += len(blob)
+        else:
+            duplicates[part] = first
+    return stats, duplicates
+
+
+def relink_media(package, duplicates):
+    """
+    Points relationships of duplicate media parts at the kept parts.
+    Duplicates become unreachable and are left out when the package is saved.
+    """
+    for part in list(package.iter_parts()):
+        for rel in list(part.rels.values()):
+            if not rel.is_external and rel.target_part in duplicates:
+                # Same rId, so the XML referencing it stays valid
+                part.rels.add_relationship(rel.reltype, duplicates[rel.target_part], rel.rId)
+
+
+def dedupe_media(package):
+    """
+    Points relationships of duplicate media parts at the first part with the same content.
+    Returns media part counts and bytes before and after.
+    """
+    stats, duplicates = find_duplicate_media(package)
+    if duplicates:
+        relink_media(package, duplicates)
+    return stats
@@ -0,0 +1,28 @@
+import os
+import resource
+import sys
+
+
+def current_rss():
+    """
+    Returns resident set size of current process in bytes
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No procfs (macOS): the peak is the best available estimate
+        return peak_rss()
+
+
+def peak_rss():
+    """
+    Returns peak resident set size of current process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def format_bytes(size):
+    return f"{size / (1024 * 1024):.1f} MB"
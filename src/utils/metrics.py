@@ -0,0 +1,284 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+QUANTILES = (0.5, 0.95, 0.99)
+# Every metric name is exported with this prefix
+PREFIX = 'cv_'
+
+
+def _labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [
+        '%s="%s"' % (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    ]
+    return '{' + ','.join(escaped) + '}'
+
+
+def _quantile(samples, q):
+    """
+    Returns q-quantile of sorted samples (nearest rank)
+    """
+    if not samples:
+        return None
+    index = min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))
+    return samples[index]
+
+
+class _Summary:
+    """
+    Count, sum and max of observed values with a bounded uniform sample for quantiles
+    """
+    __slots__ = ('count', 'total', 'maximum', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = []
+
+    def observe(self, value, limit, rng):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        if len(self.samples) < limit:
+            self.samples.append(value)
+        else:
+            # Reservoir sampling keeps every observation equally likely to stay
+            index = rng.randrange(self.count)
+            if index < limit:
+                self.samples[index] = value
+
+    def quantiles(self):
+        samples = sorted(self.samples)
+        return {q: _quantile(samples, q) for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """
+    Aggregate numbers of a run: counters and latency summaries with labels.
+    Tracer feeds it every finished span (also spans returned by worker processes), so stage
+    latencies and Google API calls, errors and bytes are counted wherever spans are recorded.
+    Exported as OpenMetrics text or JSON summary, optionally served from a local port.
+    """
+
+    def __init__(self, sample_limit=10000):
+        self.sample_limit = sample_limit
+        self.started = time.time()
+        self.counters = {}
+        self.summaries = {}
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increments counter name with labels
+        """
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Adds observation (seconds, bytes...) to summary name with labels
+        """
+        key = (name, _labels_key(labels))
+        with self._lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                summary = self.summaries[key] = _Summary()
+            summary.observe(value, self.sample_limit, self._rng)
+
+    def observe_span(self, name, category, duration, attrs):
+        """
+        Counts finished span: API call with its errors and bytes, or stage latency
+        """
+        failed = 'error' in attrs
+        if category == 'google_api':
+            self.inc('google_api_calls', endpoint=name)
+            self.observe('google_api_latency_seconds', duration, endpoint=name)
+            if attrs.get('retries'):
+                self.inc('google_api_retries', attrs['retries'], endpoint=name)
+            for attr, value in attrs.items():
+                # HTTP error responses are recorded on the span as http_<status>, retried ones included
+                if attr.startswith('http_'):
+                    self.inc('google_api_errors', value, endpoint=name, code=attr[len('http_'):])
+            if attrs.get('connection_errors'):
+                self.inc('google_api_errors', attrs['connection_errors'], endpoint=name, code='connection')
+            if failed:
+                self.inc('google_api_failures', endpoint=name)
+            for direction in ('up', 'down'):
+                if attrs.get(f'bytes_{direction}'):
+                    self.inc('google_api_bytes', attrs[f'bytes_{direction}'], endpoint=name, direction=direction)
+            return
+
+        self.observe('stage_latency_seconds', duration, stage=name)
+        if name == 'render':
+            self.inc('cvs_failed' if failed else 'cvs_rendered')
+            # Render spans carry lookups of per-process caches made during that render
+            for cache in ('fragment', 'format_prototype'):
+                for attr, result in (('hits', 'hit'), ('misses', 'miss')):
+                    if attrs.get(f'{cache}_{attr}'):
+                        self.inc('cache_requests', attrs[f'{cache}_{attr}'], cache=cache, result=result)
+
+    def summary(self):
+        """
+        Returns JSON-serializable summary of the run
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            summaries = {key: (summary.count, summary.total, summary.maximum, summary.quantiles())
+                         for key, summary in self.summaries.items()}
+
+        duration = time.time() - self.started
+        rendered = counters.get(('cvs_rendered', ()), 0)
+        result = {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'duration_seconds': round(duration, 3),
+            'cvs': {
+                'rendered': rendered,
+                'failed': counters.get(('cvs_failed', ()), 0),
+                'per_minute': round(rendered / duration * 60, 2) if duration > 0 else None
+            },
+            'stages': {},
+            'google_api': {},
+            'bytes': {'up': 0, 'down': 0},
+            'caches': {}
+        }
+
+        for (name, labels), (count, total, maximum, quantiles) in sorted(summaries.items()):
+            labels = dict(labels)
+            entry = {
+                'count': count,
+                'mean': total / count if count else None,
+                'p50': quantiles[0.5],
+                'p95': quantiles[0.95],
+                'p99': quantiles[0.99],
+                'max': maximum
+            }
+            if name == 'stage_latency_seconds':
+                result['stages'][labels['stage']] = entry
+            elif name == 'google_api_latency_seconds':
+                result['google_api'].setdefault(labels['endpoint'], {}).update(latency=entry)
+
+        for (name, labels), value in sorted(counters.items()):
+            labels = dict(labels)
+            if name.startswith('google_api_'):
+                endpoint = result['google_api'].setdefault(labels['endpoint'], {})
+                if name == 'google_api_calls':
+                    endpoint['calls'] = value
+                elif name == 'google_api_retries':
+                    endpoint['retries'] = value
+                elif name == 'google_api_failures':
+                    endpoint['failures'] = value
+                elif name == 'google_api_errors':
+                    endpoint.setdefault('errors', {})[labels['code']] = value
+                elif name == 'google_api_bytes':
+                    endpoint[f"bytes_{labels['direction']}"] = value
+                    result['bytes'][labels['direction']] += value
+            elif name == 'cache_requests':
+                cache = result['caches'].setdefault(labels['cache'], {'hits': 0, 'misses': 0})
+                cache['hits' if labels['result'] == 'hit' else 'misses'] += value
+
+        for cache in result['caches'].values():
+            total = cache['hits'] + cache['misses']
+            cache['hit_ratio'] = round(cache['hits'] / total, 4) if total else None
+        return result
+
+    def to_openmetrics(self):
+        """
+        Returns metrics in OpenMetrics text format
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            summaries = {key: (summary.count, summary.total, summary.quantiles())
+                         for key, summary in self.summaries.items()}
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE {PREFIX}{name} counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{PREFIX}{name}_total{_format_labels(labels)} {value}')
+
+        for name in sorted({name for name, _ in summaries}):
+            lines.append(f'# TYPE {PREFIX}{name} summary')
+            for (metric, labels), (count, total, quantiles) in sorted(summaries.items()):
+                if metric != name:
+                    continue
+                for q, value in quantiles.items():
+                    if value is not None:
+                        lines.append(f'{PREFIX}{name}{_format_labels(labels, [("quantile", str(q))])} {value:.6f}')
+                lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {count}')
+                lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {total:.6f}')
+
+        summary = self.summary()
+        lines.append(f'# TYPE {PREFIX}run_duration_seconds gauge')
+        lines.append(f"{PREFIX}run_duration_seconds {summary['duration_seconds']}")
+        if summary['cvs']['per_minute'] is not None:
+            lines.append(f'# TYPE {PREFIX}cvs_per_minute gauge')
+            lines.append(f"{PREFIX}cvs_per_minute {summary['cvs']['per_minute']}")
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path, fmt='openmetrics'):
+        """
+        Writes OpenMetrics text ('openmetrics') or JSON summary ('json') atomically
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            if fmt == 'json':
+                json.dump(self.summary(), f, indent=2)
+            else:
+                f.write(self.to_openmetrics())
+        os.replace(tmp_path, path)
+        return path
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Serves /metrics (OpenMetrics) and /metrics.json from a background thread
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = registry.to_openmetrics().encode('utf-8'), OPENMETRICS_CONTENT_TYPE
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(registry.summary()).encode('utf-8'), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
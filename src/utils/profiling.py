@@ -0,0 +1,181 @@
+import cProfile
+import glob
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+
+class Profiler:
+    """
+    Runs enclosed block under cProfile and/or tracemalloc and writes reports to output_dir.
+    With a tracer attached, memory is also reported per stage span.
+    """
+
+    def __init__(self, output_dir, cpu=False, memory=False, collapsed=False, top=20, tracer=None, name='profile'):
+        self.output_dir = output_dir
+        self.cpu = cpu
+        self.memory = memory
+        self.collapsed = collapsed
+        self.top = top
+        self.tracer = tracer
+        self.name = name
+        self._profile = None
+        self._snapshots = {}
+        self._stage_reports = []
+        self._tracer_enabled = None
+        # Worker profiles of this run only, so merging never picks up those of earlier runs
+        self.worker_dir = None
+        if output_dir:
+            self.worker_dir = os.path.join(output_dir, f"{name}_workers_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+
+    def options(self):
+        """
+        Returns picklable options for creating equivalent profilers in worker processes
+        """
+        return {
+            'output_dir': self.worker_dir,
+            'cpu': self.cpu,
+            'memory': self.memory,
+            'collapsed': self.collapsed,
+            'top': self.top
+        }
+
+    @property
+    def active(self):
+        return self.cpu or self.memory
+
+    def __enter__(self):
+        if not self.active:
+            return self
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if self.memory:
+            tracemalloc.start()
+            if self.tracer is not None:
+                self._tracer_enabled = self.tracer.enabled
+                self.tracer.enabled = True
+                self.tracer.add_listener(self._on_span)
+
+        if self.cpu:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profile.disable()
+            self.write_cpu_reports(pstats.Stats(self._profile), self.name)
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            if self.tracer is not None:
+                self.tracer.listeners.remove(self._on_span)
+                self.tracer.enabled = self._tracer_enabled
+            self.write_memory_report(snapshot)
+        return False
+
+    def _on_span(self, event, span):
+        """
+        Tracer listener: snapshots memory at stage boundaries
+        """
+        if span.category != 'stage' or not tracemalloc.is_tracing():
+            return
+        if event == 'start':
+            self._snapshots[id(span)] = tracemalloc.take_snapshot()
+            return
+        before = self._snapshots.pop(id(span), None)
+        if before is not None:
+            diff = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+            self._stage_reports.append((span.name, diff[:self.top]))
+
+    def write_cpu_reports(self, stats, name):
+        """
+        Writes .pstats, text summary and optional collapsed stacks for flame graphs
+        """
+        stats.dump_stats(os.path.join(self.output_dir, f'{name}.pstats'))
+
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(self.top)
+        with open(os.path.join(self.output_dir, f'{name}_cpu.txt'), 'w') as f:
+            f.write(text.getvalue())
+
+        if self.collapsed:
+            write_collapsed_stacks(stats, os.path.join(self.output_dir, f'{name}.collapsed'))
+
+    def write_memory_report(self, snapshot):
+        """
+        Writes top-N allocations per stage and for the whole run
+        """
+        with open(os.path.join(self.output_dir, f'{self.name}_memory.txt'), 'w') as f:
+            for stage, diff in self._stage_reports:
+                f.write(f"=== stage {stage}: top {self.top} allocation deltas ===\n")
+                for stat in diff:
+                    f.write(f"{stat}\n")
+                f.write("\n")
+
+            f.write(f"=== total: top {self.top} live allocations at end ===\n")
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                f.write(f"{stat}\n")
+
+    def merge_worker_profiles(self):
+        """
+        Combines .pstats written by worker processes into one batch report
+        """
+        paths = sorted(glob.glob(os.path.join(self.worker_dir, 'candidate_*.pstats')))
+        if not paths:
+            return None
+        self.write_cpu_reports(pstats.Stats(*paths), 'batch')
+        return os.path.join(self.output_dir, 'batch.pstats')
+
+
+def _label(func):
+    filename, lineno, name = func
+    return f"{os.path.basename(filename)}:{lineno}({name})".replace(' ', '_').replace(';', ',')
+
+
+def write_collapsed_stacks(stats, path, max_depth=64, min_seconds=1e-5):
+    """
+    Writes approximate collapsed stacks (flamegraph.pl / speedscope format).
+    cProfile keeps only caller->callee edges, so stacks are rebuilt from the call graph and
+    each function's own time is split between its callers proportionally to call time.
+    Paths carrying less than min_seconds are pruned to keep the walk bounded.
+    """
+    callees = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_ct))
+
+    samples = {}
+
+    def walk(func, stack, share):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        own = tt * share
+        if own > 0:
+            key = ';'.join(stack)
+            samples[key] = samples.get(key, 0) + own
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, []):
+            callee_ct = stats.stats[callee][3]
+            label = _label(callee)
+            if not callee_ct or label in stack:
+                continue
+            callee_share = share * min(edge_ct / callee_ct, 1.0)
+            if callee_share * callee_ct < min_seconds:
+                continue
+            walk(callee, stack + [label], callee_share)
+
+    roots = [func for func, value in stats.stats.items() if not value[4]]
+    for root in roots:
+        walk(root, [_label(root)], 1.0)
+
+    with open(path, 'w') as f:
+        for stack, seconds in samples.items():
+            micros = int(seconds * 1e6)
+            if micros:
+                f.write(f"{stack} {micros}\n")
+    return path
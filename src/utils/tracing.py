@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+import time
+
+
+class _NullSpan:
+    """
+    Span returned by a disabled tracer, every operation is a no-op
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Timed section of work with arbitrary attributes (bytes, element counts, retries...)
+    """
+    __slots__ = ('tracer', 'name', 'category', 'attrs', 'start', 'duration', 'pid', 'tid', '_started')
+
+    def __init__(self, tracer, name, category, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.tracer._notify('start', self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.attrs['error'] = f"{exc_type.__name__}: {exc}"
+        self.tracer._record(self)
+        return False
+
+    def set(self, **attrs):
+        """
+        Sets span attributes
+        """
+        self.attrs.update(attrs)
+
+    def add(self, name, value):
+        """
+        Increments numeric span attribute
+        """
+        self.attrs[name] = self.attrs.get(name, 0) + value
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'cat': self.category,
+            'start': self.start,
+            'duration': self.duration,
+            'pid': self.pid,
+            'tid': self.tid,
+            'attrs': self.attrs
+        }
+
+
+class Tracer:
+    """
+    Collects spans around pipeline stages and Google API calls.
+    A disabled tracer hands out a shared no-op span, so instrumentation costs almost nothing.
+    With a metrics registry every finished span is also counted there, whether or not it is kept.
+    After stream() spans go straight to the trace file instead of memory, for runs of any length.
+    """
+
+    def __init__(self, enabled=False, metrics=None):
+        self.enabled = enabled
+        self.metrics = metrics
+        self.spans = []
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._stream = None
+        self._stream_path = None
+        self._stream_format = None
+        self._streamed = 0
+
+    def span(self, name, category='stage', **attrs):
+        """
+        Returns context manager timing the enclosed block
+        """
+        if not self.enabled and self.metrics is None:
+            return _NULL_SPAN
+        return Span(self, name, category, attrs)
+
+    @property
+    def recording(self):
+        """
+        True when spans are kept or counted, worker processes then have to record theirs too
+        """
+        return self.enabled or self.metrics is not None
+
+    def count(self, name, value=1, **labels):
+        """
+        Increments counter of the metrics registry, no-op without one
+        """
+        if self.metrics is not None:
+            self.metrics.inc(name, value, **labels)
+
+    def add_listener(self, listener):
+        """
+        Registers callable listener(event, span) called on span 'start' and 'end'
+        """
+        self.listeners.append(listener)
+
+    def _notify(self, event, span):
+        for listener in self.listeners:
+            listener(event, span)
+
+    def _record(self, span):
+        if self.enabled:
+            with self._lock:
+                if self._stream is not None:
+                    self._write(span.to_dict())
+                else:
+                    self.spans.append(span.to_dict())
+        if self.metrics is not None:
+            self.metrics.observe_span(span.name, span.category, span.duration, span.attrs)
+        self._notify('end', span)
+
+    def drain(self):
+        """
+        Returns recorded spans as dicts and forgets them
+        """
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def extend(self, spans):
+        """
+        Adds spans recorded elsewhere (e.g. in worker processes)
+        """
+        if self.metrics is not None:
+            for span in spans:
+                self.metrics.observe_span(span['name'], span['cat'], span['duration'], span['attrs'])
+        if not self.enabled or not spans:
+            return
+        with self._lock:
+            if self._stream is not None:
+                for span in spans:
+                    self._write(span)
+            else:
+                self.spans.extend(spans)
+
+    @staticmethod
+    def _chrome_event(span):
+        return {
+            'name': span['name'],
+            'cat': span['cat'],
+            'ph': 'X',
+            'ts': span['start'] * 1e6,
+            'dur': span['duration'] * 1e6,
+            'pid': span['pid'],
+            'tid': span['tid'],
+            'args': span['attrs']
+        }
+
+    def stream(self, path, fmt='jsonl'):
+        """
+        Writes spans to path as they finish instead of keeping them in memory.
+        Spans are in order of completion; save(path) completes the file.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._lock:
+            self._stream = open(path, 'w')
+            self._stream_path = path
+            self._stream_format = fmt
+            self._streamed = 0
+            if fmt == 'chrome':
+                self._stream.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+            spans, self.spans = self.spans, []
+            for span in spans:
+                self._write(span)
+
+    def _write(self, span):
+        # Called with the lock held
+        if self._stream_format == 'chrome':
+            self._stream.write((',\n' if self._streamed else '') + json.dumps(self._chrome_event(span)))
+        else:
+            self._stream.write(json.dumps(span) + '\n')
+        self._streamed += 1
+
+    def save(self, path, fmt='jsonl'):
+        """
+        Writes spans as JSON lines ('jsonl') or Chrome trace-event JSON ('chrome').
+        When spans are streamed to path, the stream is closed instead.
+        """
+        with self._lock:
+            if self._stream is not None and path == self._stream_path:
+                if self._stream_format == 'chrome':
+                    self._stream.write('\n]}\n')
+                self._stream.close()
+                self._stream = None
+                return path
+            spans = sorted(self.spans, key=lambda s: s['start'])
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            if fmt == 'chrome':
+                json.dump({'traceEvents': [self._chrome_event(span) for span in spans], 'displayTimeUnit': 'ms'}, f)
+            else:
+                for span in spans:
+                    f.write(json.dumps(span) + '\n')
+        return path
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+
+# Memory-backed filesystem available on most Linux systems
+TMPFS_DIR = '/dev/shm'
+
+
+class Workspace:
+    """
+    Private directory for the intermediate files of one job, so concurrent renders
+    never write to the same paths. Removed on exit; with keep_on_failure it is left
+    in place for inspection when the job raised.
+    """
+
+    def __init__(self, root, prefix='job_', tmpfs=False, keep_on_failure=False):
+        self.root = root
+        self.prefix = prefix
+        self.tmpfs = tmpfs
+        self.keep_on_failure = keep_on_failure
+        self.path = None
+
+    def __enter__(self):
+        root = self.root
+        if self.tmpfs and os.path.isdir(TMPFS_DIR):
+            root = os.path.join(TMPFS_DIR, 'cv_jobs')
+        os.makedirs(root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=self.prefix, dir=root)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.keep_on_failure:
+            print(f"Keeping workspace of failed job: {self.path}")
+        else:
+            self.cleanup()
+        return False
+
+    def file(self, name):
+        """
+        Returns path of file inside workspace
+        """
+        return os.path.join(self.path, name)
+
+    def cleanup(self):
+        if self.path:
+            shutil.rmtree(self.path, ignore_errors=True)
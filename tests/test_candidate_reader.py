@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from src.core.candidate_reader import CandidateReader
+
+RECORDS = [
+    {'id': 'a', 'personal_info': {'name': 'Anna', 'title': 'QA'}},
+    # Structural characters, escapes and non-ASCII text inside strings
+    {'id': 'b', 'personal_info': {'name': 'Б[о]{р}ис, "\\"', 'title': 'Dev\\'}, 'projects': [[], {}]},
+    {'id': 'c', 'personal_info': {'name': 'Chen', 'title': 'PM'}, 'skills': {'x': ['1', '2']}},
+]
+
+
+def write_jsonl(path, records):
+    path.write_text(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records), encoding='utf-8')
+    return str(path)
+
+
+def write_array(path, records):
+    path.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(params=['jsonl', 'array'])
+def candidates_file(request, tmp_path):
+    writer = write_jsonl if request.param == 'jsonl' else write_array
+    return request.param, writer(tmp_path / f'candidates.{request.param}', RECORDS)
+
+
+def test_reads_jsonl_and_array_alike(candidates_file):
+    input_format, path = candidates_file
+    reader = CandidateReader(path)
+    assert reader.format == input_format
+    assert [data for _, data in reader] == RECORDS
+    assert reader.skipped == 0
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+def test_chunk_boundaries(candidates_file, chunk_size):
+    _, path = candidates_file
+    reader = CandidateReader(path)
+    reader.CHUNK_SIZE = chunk_size
+    assert [data for _, data in reader] == RECORDS
+
+
+@pytest.mark.parametrize('chunk_size', [3, CandidateReader.CHUNK_SIZE])
+def test_resume_from_every_offset(candidates_file, chunk_size):
+    _, path = candidates_file
+    offsets = [offset for offset, _ in CandidateReader(path)]
+    for done, offset in enumerate(offsets, start=1):
+        reader = CandidateReader(path, offset)
+        reader.CHUNK_SIZE = chunk_size
+        assert [data for _, data in reader] == RECORDS[done:]
+
+
+def test_offset_after_last_record_is_end_of_input(candidates_file):
+    _, path = candidates_file
+    reader = CandidateReader(path)
+    list(reader)
+    assert list(CandidateReader(path, reader.offset)) == []
+
+
+def test_malformed_records_are_skipped(tmp_path):
+    path = tmp_path / 'candidates.jsonl'
+    path.write_bytes(b'\xef\xbb\xbf' + json.dumps(RECORDS[0]).encode() + b'\n{broken\n\n[1, 2]\n' + json.dumps(RECORDS[2]).encode())
+    reader = CandidateReader(str(path))
+    assert [data for _, data in reader] == [RECORDS[0], RECORDS[2]]
+    assert reader.skipped == 2
+
+
+def test_unterminated_array_is_reported(tmp_path):
+    path = tmp_path / 'candidates.json'
+    path.write_text(json.dumps(RECORDS)[:-20], encoding='utf-8')
+    reader = CandidateReader(str(path))
+    assert [data for _, data in reader] == RECORDS[:2]
+    assert reader.skipped == 1
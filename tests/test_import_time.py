@@ -0,0 +1,16 @@
+import os
+
+from benchmarks.import_time import HEAVY_MODULES, measure
+
+# Same budget as `python -m benchmarks.import_time`
+BUDGET_SECONDS = 0.5
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_main_fits_budget(monkeypatch):
+    # The probe imports main from the working directory
+    monkeypatch.chdir(ROOT)
+    seconds, loaded = measure(None, repeat=3)
+    assert loaded == [], f"import main loads {', '.join(loaded)}"
+    assert seconds <= BUDGET_SECONDS, f"import main took {seconds * 1000:.0f} ms, budget {BUDGET_SECONDS * 1000:.0f} ms"
+
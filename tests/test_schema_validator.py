@@ -0,0 +1,82 @@
+import copy
+
+import pytest
+
+from src.core.schema_validator import CandidateValidationError, SchemaValidator
+
+VALID = {
+    'id': 'hanna-k',
+    'personal_info': {'name': 'Hanna K.', 'title': 'SOFTWARE ENGINEER'},
+    'skills': {
+        'basic_information': {'education': 'Computer Science', 'languages': ['English — B2'], 'domains': ['FinTech']},
+        'introduction': 'Software Engineer with 5.5 years of experience. Builds backends in Python.',
+        'skills': {'programming_languages': ['Python'], 'databases': 'PostgreSQL'}
+    },
+    'projects': [
+        {
+            'name': 'Payments',
+            'period': {'start': '01.2020', 'end': '06.2021'},
+            'responsibilities': ['Built the API'],
+            'environment': ['Django']
+        },
+        {'name': 'Platform', 'period': {'start': '07.2021', 'end': 'present'}}
+    ]
+}
+
+
+def candidate(*changes):
+    """
+    Returns copy of VALID with (path, value) changes applied, value None removes the field
+    """
+    data = copy.deepcopy(VALID)
+    for path, value in changes:
+        *parents, key = path
+        target = data
+        for parent in parents:
+            target = target[parent]
+        if value is None:
+            del target[key]
+        else:
+            target[key] = value
+    return data
+
+
+@pytest.mark.parametrize('data, errors', [
+    (candidate(), []),
+    # id is optional
+    (candidate((('id',), None)), []),
+    (candidate((('id',), '  ')), ["id: must not be empty"]),
+    (candidate((('id',), 42)), ["id: expected string, got int"]),
+    (candidate((('projects', 0, 'period', 'start'), '2020-01')),
+     ["projects[0].period.start: expected MM.YYYY, got '2020-01'"]),
+    (candidate((('projects', 0, 'period', 'start'), '13.2020')),
+     ["projects[0].period.start: expected MM.YYYY, got '13.2020'"]),
+    (candidate((('projects', 0, 'period', 'end'), '1.2021')),
+     ["projects[0].period.end: expected MM.YYYY, got '1.2021'"]),
+    # present is accepted as end only
+    (candidate((('projects', 0, 'period', 'start'), 'present')),
+     ["projects[0].period.start: expected MM.YYYY, got 'present'"]),
+    (candidate((('projects', 0, 'period', 'end'), '12.2019')),
+     ["projects[0].period: end 12.2019 is before start 01.2020"]),
+    (candidate((('projects', 0, 'period', 'end'), '01.2020')), []),
+    (candidate((('skills', 'introduction'), 'Software Engineer with 5.5 years of experience.')),
+     ["skills.introduction: needs at least two sentences, it is split into two blocks by the first period"]),
+    (candidate((('skills', 'introduction'), 'Software Engineer')),
+     ["skills.introduction: needs at least two sentences, it is split into two blocks by the first period"]),
+    (candidate((('personal_info', 'name'), None), (('projects', 1, 'name'), '')),
+     ["personal_info.name: required field is missing", "projects[1].name: must not be empty"]),
+])
+def test_validate(data, errors):
+    assert SchemaValidator().validate(data) == errors
+
+
+def test_root_must_be_object():
+    assert SchemaValidator().validate([]) == ["<root>: expected object, got list"]
+
+
+def test_ensure_valid_raises_with_all_errors():
+    data = candidate((('projects', 0, 'period', 'end'), '12.2019'), (('id',), ''))
+    with pytest.raises(CandidateValidationError) as error:
+        SchemaValidator().ensure_valid(data)
+    assert len(error.value.errors) == 2
+    assert SchemaValidator().ensure_valid(VALID) is VALID
@@ -0,0 +1,97 @@
+import time
+from contextlib import closing
+
+import pytest
+
+from src.services.work_queue import WorkQueue
+
+
+def candidate(name):
+    return {'personal_info': {'name': name, 'title': 'Dev'}, 'skills': {}, 'projects': []}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=60, max_attempts=2)
+
+
+def expire_leases(queue):
+    """
+    Lets every held lease run out without waiting for it
+    """
+    with closing(queue._connect()) as db:
+        db.execute("UPDATE jobs SET lease_expires = ? WHERE status = 'leased'", (time.time() - 1,))
+
+
+def test_duplicate_enqueue_is_ignored(queue):
+    jobs = [(candidate('Anna'), 'CV - Anna', 'anna'), (candidate('Boris'), 'CV - Boris', 'boris')]
+    assert queue.enqueue(jobs) == (2, 0, [])
+    assert queue.enqueue(jobs[:1]) == (0, 1, [])
+    assert queue.counts()['pending'] == 2
+
+
+def test_conflicting_candidate_key_is_rejected(queue):
+    queue.enqueue([(candidate('Anna'), 'CV - Anna', 'anna')])
+    assert queue.enqueue([(candidate('Anna B.'), 'CV - Anna B.', 'anna')]) == (0, 0, [('CV - Anna B.', 'anna')])
+    assert queue.counts()['pending'] == 1
+
+
+def test_claimed_job_is_not_claimed_again(queue):
+    queue.enqueue([(candidate('Anna'), 'CV - Anna', 'anna')])
+    [job] = queue.claim('w1')
+    assert job['data'] == candidate('Anna')
+    assert job['attempts'] == 1
+    assert queue.claim('w2') == []
+
+
+def test_expired_lease_is_reclaimed_and_fenced(queue):
+    queue.enqueue([(candidate('Anna'), 'CV - Anna', 'anna')])
+    [first] = queue.claim('w1')
+    expire_leases(queue)
+    assert queue.counts()['expired'] == 1
+
+    [second] = queue.claim('w2')
+    assert second['id'] == first['id'] and second['lease'] != first['lease']
+    assert second['attempts'] == 2
+    # The first worker lost the job, neither its renewal nor its result is accepted
+    assert queue.renew({first['id']: first['lease']}) == set()
+    assert not queue.complete(first['id'], first['lease'], doc_id='stale')
+    assert queue.renew({second['id']: second['lease']}) == {second['id']}
+    assert queue.complete(second['id'], second['lease'], doc_id='doc')
+    assert queue.jobs('done')[0]['doc_id'] == 'doc'
+
+
+def test_failures_retry_until_max_attempts(queue):
+    queue.enqueue([(candidate('Anna'), 'CV - Anna', 'anna')])
+    [job] = queue.claim('w1')
+    assert queue.fail(job['id'], job['lease'], 'render failed')
+    assert queue.counts()['pending'] == 1
+
+    [job] = queue.claim('w1')
+    assert queue.fail(job['id'], job['lease'], 'render failed again')
+    assert queue.counts()['failed'] == 1
+    assert queue.claim('w1') == []
+
+    assert queue.retry_failed() == 1
+    [job] = queue.claim('w1')
+    assert job['attempts'] == 1
+
+
+def test_expired_lease_at_max_attempts_fails_job(queue):
+    queue.enqueue([(candidate('Anna'), 'CV - Anna', 'anna')])
+    for _ in range(queue.max_attempts):
+        assert queue.claim('w1')
+        expire_leases(queue)
+    assert queue.claim('w2') == []
+    [job] = queue.jobs('failed')
+    assert job['error'] == 'Lease expired'
+    assert job['attempts'] == queue.max_attempts
+
+
+def test_worker_stats(queue):
+    queue.enqueue([(candidate(name), f'CV - {name}', name) for name in ('Anna', 'Boris')])
+    first, second = queue.claim('w1', limit=2)
+    queue.complete(first['id'], first['lease'], timings={'render': 1.5, 'upload': 0.5})
+    # Failed attempt goes back to the queue, only finished jobs are counted
+    queue.fail(second['id'], second['lease'], 'upload failed', timings={'render': 1.0})
+    assert queue.worker_stats() == {'w1': {'done': 1, 'failed': 0, 'render_seconds': 1.5, 'upload_seconds': 0.5}}